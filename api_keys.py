@@ -0,0 +1,118 @@
+import hashlib
+import math
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+KEY_PREFIX = "pk_live_"
+
+
+def generate_api_key() -> str:
+    return KEY_PREFIX + secrets.token_hex(16)
+
+
+def hash_api_key(key: str) -> str:
+    """Keys are stored and indexed only by their SHA-256 digest"""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class APIKeyError(Exception):
+    """Unknown, revoked or over-quota API key"""
+
+    def __init__(self, detail: str, status_code: int = 401, retry_after: Optional[int] = None):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class APIKeyAuth:
+    """
+    Authenticates partner API keys and meters their use.
+
+    lookup(key_hash) returns the stored key record ({"key_id", "tenant_id",
+    "status", "quota_per_minute", ...}) or None. Records are kept in an
+    in-process LRU keyed by the key's hash (raw keys are never held) for
+    cache_ttl seconds, so a busy key is looked up about once a minute rather
+    than on every request; revoke() drops a key from the cache at once. Each key has a per-minute quota (fixed window)
+    and running usage counters.
+    """
+
+    def __init__(self, lookup: Callable[[str], Optional[Dict[str, Any]]], cache_size: int = 10000,
+                 cache_ttl: float = 60.0, quota_per_minute: int = 600):
+        self.lookup = lookup
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.quota_per_minute = quota_per_minute
+        self.cache: "OrderedDict[str, tuple]" = OrderedDict()  # key hash -> (record, cached_at)
+        self.usage: Dict[str, Dict[str, Any]] = {}  # key_id -> counters
+        self.counters = {"authenticated": 0, "cache_hits": 0, "lookups": 0, "rejected": 0, "throttled": 0}
+
+    def _record(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        key_hash = hash_api_key(key)
+        cached = self.cache.get(key_hash)
+        if cached is not None and now - cached[1] < self.cache_ttl:
+            self.cache.move_to_end(key_hash)
+            self.counters["cache_hits"] += 1
+            return cached[0]
+
+        self.counters["lookups"] += 1
+        record = self.lookup(key_hash)
+        if record is None:
+            self.cache.pop(key_hash, None)
+            return None
+        self.cache[key_hash] = (record, now)
+        self.cache.move_to_end(key_hash)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return record
+
+    def peek(self, key: str) -> Optional[Dict[str, Any]]:
+        """The key's active record through the cache, without counting a request"""
+        record = self._record(key) if key else None
+        return record if record is not None and record.get("status") == "active" else None
+
+    def authenticate(self, key: str, path: Optional[str] = None) -> Dict[str, Any]:
+        """Return the key's record and count the request, or raise APIKeyError"""
+        record = self._record(key) if key else None
+        if record is None or record.get("status") != "active":
+            self.counters["rejected"] += 1
+            raise APIKeyError("Invalid API key")
+
+        now = time.time()
+        usage = self.usage.setdefault(record["key_id"], {
+            "requests": 0, "throttled": 0, "window_start": now, "window_requests": 0, "last_used_at": None, "by_path": {}
+        })
+        if now - usage["window_start"] >= 60:
+            usage["window_start"] = now
+            usage["window_requests"] = 0
+        quota = record.get("quota_per_minute") or self.quota_per_minute
+        if usage["window_requests"] >= quota:
+            usage["throttled"] += 1
+            self.counters["throttled"] += 1
+            raise APIKeyError("API key quota exceeded", status_code=429,
+                              retry_after=max(1, math.ceil(usage["window_start"] + 60 - now)))
+
+        usage["window_requests"] += 1
+        usage["requests"] += 1
+        usage["last_used_at"] = now
+        if path:
+            usage["by_path"][path] = usage["by_path"].get(path, 0) + 1
+        self.counters["authenticated"] += 1
+        return record
+
+    def revoke(self, key_id: str):
+        """Drop cached entries for a key so revocation applies immediately on this worker"""
+        for key_hash in [k for k, (record, _) in self.cache.items() if record["key_id"] == key_id]:
+            del self.cache[key_hash]
+
+    def key_usage(self, key_id: str) -> Dict[str, Any]:
+        usage = self.usage.get(key_id)
+        if usage is None:
+            return {"requests": 0, "throttled": 0, "last_used_at": None, "by_path": {}}
+        return {k: usage[k] for k in ("requests", "throttled", "last_used_at", "by_path")}
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "cached_keys": len(self.cache), "metered_keys": len(self.usage)}
@@ -1,47 +1,171 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Header, Request
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, RedirectResponse
-from pydantic import BaseModel, EmailStr
+from starlette.datastructures import Headers
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
+from pydantic import BaseModel, EmailStr, ValidationError
 from typing import Optional, List, Dict, Any
 import uuid
 import json
+import re
 import os
+import csv
+import io
 import requests
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date, timezone
 import asyncio
+import heapq
+import hashlib
+import secrets
+import copy
+import time
+import ipaddress
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 
 # Import our new modules
 from models import *
-from payout_simulator import payout_simulator
+from payout_simulator import payout_simulator, LatencyProfile, run_load as run_payout_load
 from edge_redirector import edge_redirector
-
-# JWT Dependency for Creator Authentication
-async def get_creator_tenant_id(authorization: str = Header(...)) -> str:
+from fast_json import FastJSONResponse
+from conversion_queue import ConversionQueue
+from payout_dispatcher import PayoutDispatcher, SimulatorPayoutProvider
+from split_engine import split_engine
+from webhook_dispatcher import WebhookDispatcher, DestinationError, check_destination
+from money import Money, to_paise, to_rupees
+from auth import token_auth, AuthError
+from otp_store import otp_store, OTPError
+from click_filter import click_filter
+from conversion_scoring import conversion_scorer
+from api_keys import APIKeyAuth, APIKeyError, generate_api_key, hash_api_key
+from rate_limiter import RateLimit, RateLimiter, RateLimitMiddleware, MemoryBucketStore, RedisBucketStore
+from metrics import registry as metrics, MetricsMiddleware, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from structured_logging import get_logger, log_pipeline
+from tracing import tracer, TracingMiddleware
+
+log = get_logger("app")
+
+# Unsigned "mock_jwt_creator_<tenant_id>" tokens authenticate as any tenant,
+# so they are only accepted for local development with AUTH_ALLOW_DEMO_TOKENS=1
+DEMO_TOKEN_PREFIX = "mock_jwt_creator_"
+ALLOW_DEMO_TOKENS = os.environ.get("AUTH_ALLOW_DEMO_TOKENS", "0") == "1"
+
+def creator_tenant_from_header(authorization: str) -> str:
     """
-    Extract tenant_id from JWT token for creator authentication
+    Verify the creator's signed JWT and return its tenant_id claim.
+    No DB lookup: the signature and claims are all that is checked.
     """
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid authorization header")
     
-    token = authorization.replace("Bearer ", "")
+    token = authorization[len("Bearer "):]
+    if ALLOW_DEMO_TOKENS and token.startswith(DEMO_TOKEN_PREFIX):
+        return token[len(DEMO_TOKEN_PREFIX):]
     
-    # For mock implementation, extract tenant_id from token
-    # In production, this would decode and verify the JWT
-    if token.startswith("mock_jwt_creator_"):
-        # Extract tenant_id from the token format: mock_jwt_creator_<tenant_id>
-        if "tnt_101" in token:
-            return "tnt_101"
-        elif "7fac09b7-dc03-47a7-8352-d805863f62d8" in token:
-            return "tnt_b373c646"
-        else:
-            # Try to extract from the token or use a default
-            return "tnt_101"  # Default for testing - use the actual tenant ID
-    else:
+    try:
+        claims = token_auth.verify(token)
+    except AuthError:
         raise HTTPException(status_code=401, detail="Invalid JWT token")
+    if claims.get("role") != "creator" or not claims.get("tenant_id"):
+        raise HTTPException(status_code=403, detail="Creator access required")
+    return claims["tenant_id"]
+
+# JWT Dependency for Creator Authentication
+async def get_creator_tenant_id(request: Request, authorization: str = Header(...)) -> str:
+    # The rate limiter has usually verified the token already
+    tenant_id = getattr(request.state, "creator_tenant_id", None)
+    return tenant_id or creator_tenant_from_header(authorization)
+
+# Partner API keys are optional on shared endpoints unless API_KEY_REQUIRED=1
+API_KEY_REQUIRED = os.environ.get("API_KEY_REQUIRED", "0") == "1"
+
+async def get_api_key_partner(request: Request, x_api_key: Optional[str] = Header(None)) -> Optional[Dict[str, Any]]:
+    """
+    Authenticate and meter an X-API-Key header; returns the key record,
+    or None for anonymous requests when keys are not required
+    """
+    if not x_api_key:
+        if API_KEY_REQUIRED:
+            raise HTTPException(status_code=401, detail="X-API-Key header required")
+        return None
+    try:
+        return api_key_auth.authenticate(x_api_key, path=request.url.path)
+    except APIKeyError as e:
+        headers = {"Retry-After": str(e.retry_after)} if e.retry_after else None
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=headers)
+
+# Rate limiting: token buckets per client IP, partner API key and tenant.
+# X-Forwarded-For is honoured for hops from RATE_LIMIT_TRUSTED_PROXIES (comma-separated
+# addresses or CIDRs), or from any peer with RATE_LIMIT_TRUST_FORWARDED=1
+TRUST_FORWARDED_FOR = os.environ.get("RATE_LIMIT_TRUST_FORWARDED", "0") == "1"
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(item.strip(), strict=False)
+    for item in os.environ.get("RATE_LIMIT_TRUSTED_PROXIES", "").split(",") if item.strip()
+]
+
+def is_trusted_proxy(address: str) -> bool:
+    if TRUST_FORWARDED_FOR:
+        return True
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+def client_ip(scope: Dict[str, Any], headers: Headers) -> str:
+    """
+    Client address: the peer, or, when the peer is a trusted proxy, the
+    nearest X-Forwarded-For hop that is not itself a trusted proxy
+    """
+    address = scope["client"][0] if scope.get("client") else "unknown"
+    forwarded = [hop.strip() for hop in headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    while forwarded and is_trusted_proxy(address):
+        address = forwarded.pop()
+    return address
+
+def rate_limit_keys(scope: Dict[str, Any]) -> Dict[str, str]:
+    """Bucket keys for a request: IP always, plus API key and tenant when present"""
+    headers = Headers(scope=scope)
+    keys = {"ip": client_ip(scope, headers)}
+    
+    api_key = headers.get("x-api-key")
+    if api_key:
+        record = api_key_auth.peek(api_key)
+        if record:
+            keys["api_key"] = record["key_id"]
+            keys["tenant"] = record["tenant_id"]
+    
+    # Demo tokens are unverified, so they never pick a tenant bucket
+    authorization = headers.get("authorization")
+    if authorization and "tenant" not in keys and not authorization.startswith(f"Bearer {DEMO_TOKEN_PREFIX}"):
+        try:
+            keys["tenant"] = creator_tenant_from_header(authorization)
+            scope.setdefault("state", {})["creator_tenant_id"] = keys["tenant"]
+        except HTTPException:
+            pass  # Left for the endpoint to reject
+    return keys
+
+def build_rate_limiter() -> RateLimiter:
+    url = os.environ.get("RATE_LIMIT_REDIS_URL")
+    return RateLimiter(
+        {
+            "ip": RateLimit.parse(os.environ.get("RATE_LIMIT_IP", "50:200")),
+            "api_key": RateLimit.parse(os.environ.get("RATE_LIMIT_API_KEY", "20:100")),
+            "tenant": RateLimit.parse(os.environ.get("RATE_LIMIT_TENANT", "50:200"))
+        },
+        store=RedisBucketStore(url) if url else MemoryBucketStore(int(os.environ.get("RATE_LIMIT_MAX_KEYS", "100000")))
+    )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the background workers for the lifetime of the server"""
+    await start_background_workers()
+    yield
+    await stop_background_workers()
 
 # Initialize FastAPI app
 app = FastAPI(
+    lifespan=lifespan,
     title="Hissaback Platform API",
     description="""
 # Hissaback Platform API Documentation
@@ -116,6 +240,18 @@ APIs for processing clicks, conversions, and payout events.
     ]
 )
 
+# Rate limiting sits inside CORS so 429s still carry CORS headers
+rate_limiter = build_rate_limiter()
+if os.environ.get("RATE_LIMIT_ENABLED", "1") == "1":
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter, key_func=rate_limit_keys)
+
+# Metrics wrap the rate limiter: route latency includes its bucket check, and
+# requests it refuses (before routing) are counted under route="rate_limited"
+http_requests = metrics.counter("http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status"))
+http_latency = metrics.histogram("http_request_duration_seconds", "HTTP request latency by route and method", ("route", "method"))
+if os.environ.get("METRICS_ENABLED", "1") == "1":
+    app.add_middleware(MetricsMiddleware, requests=http_requests, latency=http_latency)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -125,161 +261,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Tracing is outermost so the request ID covers every layer's logs
+if os.environ.get("TRACE_ENABLED", "1") == "1":
+    app.add_middleware(TracingMiddleware, tracer=tracer)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Demo-specific endpoints for enhanced functionality
-
-@app.get("/r/{click_id}", tags=["End-User APIs"])
-async def edge_redirect(click_id: str, request: Request):
-    """Edge redirector for smart links - simulates Cloudflare Worker"""
-    user_agent = request.headers.get("user-agent", "Demo Browser")
-    client_ip = request.client.host if request.client else "127.0.0.1"
-    
-    # For demo, we'll redirect to a demo page
-    demo_url = f"https://www.flipkart.com/?utm_source=hissaback&utm_medium=affiliate&click_id={click_id}"
-    
-    # Log the redirect
-    redirect_data = {
-        'click_id': click_id,
-        'user_agent': user_agent,
-        'ip_address': client_ip,
-        'redirect_url': demo_url,
-        'timestamp': datetime.utcnow().isoformat()
-    }
-    
-    return RedirectResponse(url=demo_url, status_code=302)
-
-@app.post("/v1/admin/run_payouts", tags=["Admin APIs"])
-async def run_payout_simulator():
-    """Run payout simulator for demo purposes"""
-    try:
-        # Simulate processing pending payouts
-        pending_amount = 1500.0  # Demo amount
-        
-        # Process GV payout
-        gv_result = payout_simulator.process_payout(500.0, 'gift_card')
-        
-        # Process UPI payout
-        upi_result = payout_simulator.process_payout(1000.0, 'upi')
-        
-        return {
-            "status": "completed",
-            "message": "Payout simulator completed successfully",
-            "processed": [
-                {
-                    "method": "gift_card",
-                    "amount": 500.0,
-                    "reference": gv_result['reference_id'],
-                    "receipt": gv_result['receipt']
-                },
-                {
-                    "method": "upi", 
-                    "amount": 1000.0,
-                    "reference": upi_result['reference_id'],
-                    "receipt": upi_result['receipt']
-                }
-            ],
-            "total_processed": 1500.0
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Payout simulation failed: {str(e)}")
-
-@app.get("/v1/admin/payout_history", tags=["Admin APIs"])
-async def get_payout_history():
-    """Get payout history for demo"""
-    return payout_simulator.get_payout_history()
-
-@app.get("/v1/admin/click_logs", tags=["Admin APIs"])
-async def get_click_logs():
-    """Get click logs for demo"""
-    return edge_redirector.get_click_logs()
-
-@app.get("/v1/admin/click/{click_id}", tags=["Admin APIs"])
-async def get_click_details(click_id: str):
-    """Get specific click details"""
-    click_data = edge_redirector.get_click_by_id(click_id)
-    if not click_data:
-        raise HTTPException(status_code=404, detail="Click not found")
-    return click_data
-
-@app.post("/v1/creator/offers/{offer_id}/reward_rate", tags=["Creator APIs"])
-async def update_offer_reward_rate(offer_id: str, reward_rate: float, tenant_id: str = Depends(get_creator_tenant_id)):
-    """Update reward rate for specific offer - demo feature"""
-    if reward_rate < 0 or reward_rate > 100:
-        raise HTTPException(status_code=400, detail="Reward rate must be between 0 and 100")
-    
-    # In real implementation, this would update the database
-    return {
-        "offer_id": offer_id,
-        "reward_rate": reward_rate,
-        "tenant_id": tenant_id,
-        "updated_at": datetime.utcnow().isoformat(),
-        "message": "Reward rate updated successfully"
-    }
-
-@app.get("/v1/creator/ledger/export", tags=["Creator APIs"])
-async def export_ledger_csv(tenant_id: str = Depends(get_creator_tenant_id)):
-    """Export ledger as CSV for demo"""
-    # Generate demo CSV data
-    csv_data = f"""Date,Type,Description,Amount,Balance
-{datetime.utcnow().strftime('%Y-%m-%d')},Commission,Flipkart Electronics Sale,₹150.00,₹150.00
-{datetime.utcnow().strftime('%Y-%m-%d')},Commission,Amazon Fashion Sale,₹200.00,₹350.00
-{datetime.utcnow().strftime('%Y-%m-%d')},Payout,Gift Card Issued,-₹500.00,-₹150.00
-"""
-    
-    return {
-        "csv_data": csv_data,
-        "filename": f"ledger_export_{tenant_id}_{datetime.utcnow().strftime('%Y%m%d')}.csv",
-        "total_rows": 3
-    }
-
-@app.post("/v1/webhooks/conversion", tags=["Events & Webhooks"])
-async def receive_conversion_webhook(request: ConversionWebhookRequest):
-    """Receive conversion webhook from Trackier - demo implementation"""
-    # Simulate webhook processing
-    webhook_data = {
-        "received_at": datetime.utcnow().isoformat(),
-        "click_id": request.click_id,
-        "offer_id": request.offer_id,
-        "sale_amount": request.sale_amount,
-        "order_id": request.order_id,
-        "status": request.status,
-        "processed": True
-    }
-    
-    return {
-        "status": "received",
-        "webhook_id": f"webhook_{uuid.uuid4().hex[:8]}",
-        "data": webhook_data
-    }
-
-@app.post("/v1/webhooks/payout_status", tags=["Events & Webhooks"])
-async def send_payout_status_webhook():
-    """Send payout status webhook - demo implementation"""
-    # Simulate sending webhook
-    webhook_data = {
-        "payout_id": f"payout_{uuid.uuid4().hex[:8]}",
-        "status": "completed",
-        "amount": 500.0,
-        "method": "gift_card",
-        "reference_id": "DEMO-GV-CODE-1234",
-        "sent_at": datetime.utcnow().isoformat()
-    }
-    
-    return {
-        "status": "sent",
-        "webhook_data": webhook_data,
-        "message": "Payout status webhook sent successfully"
-    }
-
-# Vercel compatibility - export the app for serverless deployment
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
-
-
-
 # Data Models
 class CreatorSignupRequest(BaseModel):
     name: str
@@ -294,6 +282,9 @@ class OTPVerifyRequest(BaseModel):
     request_id: str
     code: str
 
+class WebhookSubscriptionRequest(BaseModel):
+    url: str
+
 # Creator Dashboard Models
 class CreatorLoginRequest(BaseModel):
     phone: str
@@ -410,12 +401,33 @@ class EndUserOTPVerifyRequest(BaseModel):
 class ClickTrackingRequest(BaseModel):
     link_id: str
     user_id: Optional[str] = None
+    ip_address: Optional[str] = None  # As seen by the edge; enables IP checks
+    user_agent: Optional[str] = None
 
 class ClickTrackingResponse(BaseModel):
-    click_id: str
+    click_id: Optional[str]  # None when the click was filtered
     link_id: str
     user_id: Optional[str]
     timestamp: str
+    status: str = "tracked"  # tracked/duplicate/filtered
+    reason: Optional[str] = None
+
+class ClickBatchItem(ClickTrackingRequest):
+    timestamp: Optional[datetime] = None  # When the edge saw the click; defaults to ingest time
+
+class ClickBatchResult(BaseModel):
+    index: int
+    status: str  # created/duplicate/filtered/rejected
+    click_id: Optional[str] = None
+    error: Optional[str] = None
+
+class ClickBatchResponse(BaseModel):
+    received: int
+    created: int
+    rejected: int  # Invalid or filtered
+    duplicates: int = 0
+    filtered: int = 0
+    results: List[ClickBatchResult]
 
 class ConversionWebhookRequest(BaseModel):
     click_id: str
@@ -423,6 +435,30 @@ class ConversionWebhookRequest(BaseModel):
     sale_amount: float
     order_id: str
     status: str  # e.g. "approved", "pending", "rejected"
+    delivery_id: Optional[str] = None  # Postback delivery ID, used to drop replays
+
+class ConversionBatchResult(BaseModel):
+    index: int
+    status: str  # ok/duplicate/updated/queued/rejected/failed
+    ledger_id: Optional[str] = None
+    job_id: Optional[str] = None
+    error: Optional[str] = None
+
+class ConversionBatchResponse(BaseModel):
+    received: int
+    created: int
+    duplicates: int
+    rejected: int
+    queued: int = 0
+    failed: int = 0
+    results: List[ConversionBatchResult]
+
+class SplitRecalculationRequest(BaseModel):
+    campaign_id: Optional[str] = None
+    offer_id: Optional[str] = None
+    share_pct: Optional[float] = None
+    base_commission_pct: Optional[float] = None
+    include_entries: bool = False
 
 class LedgerEntry(BaseModel):
     ledger_id: str
@@ -451,19 +487,510 @@ class PayoutEntry(BaseModel):
     ts_paid: str
     ledger_ids: list
 
+# Demo-specific endpoints for enhanced functionality
+
+@app.get("/r/{click_id}", tags=["End-User APIs"])
+async def edge_redirect(click_id: str, request: Request):
+    """Edge redirector for smart links - simulates Cloudflare Worker"""
+    user_agent = request.headers.get("user-agent", "Demo Browser")
+    client_ip = request.client.host if request.client else "127.0.0.1"
+    
+    # For demo, we'll redirect to a demo page
+    demo_url = f"https://www.flipkart.com/?utm_source=hissaback&utm_medium=affiliate&click_id={click_id}"
+    
+    # Log the redirect
+    redirect_data = {
+        'click_id': click_id,
+        'user_agent': user_agent,
+        'ip_address': client_ip,
+        'redirect_url': demo_url,
+        'timestamp': datetime.utcnow().isoformat()
+    }
+    
+    return RedirectResponse(url=demo_url, status_code=302)
+
+@app.post("/v1/admin/run_payouts", tags=["Admin APIs"])
+async def run_payout_simulator():
+    """Run payout simulator for demo purposes"""
+    try:
+        # Simulate processing pending payouts
+        pending_amount = 1500.0  # Demo amount
+        
+        # Process GV and UPI payouts concurrently through the dispatcher
+        gv_result, upi_result = await payout_dispatcher.dispatch([
+            {"method": "gift_card", "amount": 500.0},
+            {"method": "upi", "amount": 1000.0}
+        ])
+        if gv_result["status"] != "completed" or upi_result["status"] != "completed":
+            raise RuntimeError(gv_result.get("error") or upi_result.get("error"))
+        
+        return {
+            "status": "completed",
+            "message": "Payout simulator completed successfully",
+            "processed": [
+                {
+                    "method": "gift_card",
+                    "amount": 500.0,
+                    "reference": gv_result['reference_id'],
+                    "receipt": gv_result['receipt']
+                },
+                {
+                    "method": "upi", 
+                    "amount": 1000.0,
+                    "reference": upi_result['reference_id'],
+                    "receipt": upi_result['receipt']
+                }
+            ],
+            "total_processed": 1500.0
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Payout simulation failed: {str(e)}")
+
+@app.post("/v1/admin/payout_load_test", tags=["Admin APIs"])
+async def payout_load_test(
+    volume: int = 1000,
+    latency: str = "lognormal:0.2:0.5",
+    failure_rate: float = 0.02,
+    rate_limit_rate: float = 0.01,
+    capacity_per_second: Optional[float] = None,
+    dispatch_rate: float = 200,
+    concurrency: int = 64
+):
+    """
+    Run a payout load test against simulated providers (separate from the
+    live dispatcher and history) and report throughput and tail latency.
+    Exercises the dispatcher and providers only; payout runs over the
+    ledger (PayoutRunService) are not part of the load.
+    """
+    if not 1 <= volume <= 20000:
+        raise HTTPException(status_code=400, detail="volume must be between 1 and 20000")
+    if concurrency <= 0:
+        raise HTTPException(status_code=400, detail="concurrency must be greater than 0")
+    if dispatch_rate <= 0:
+        raise HTTPException(status_code=400, detail="dispatch_rate must be greater than 0")
+    if capacity_per_second is not None and capacity_per_second <= 0:
+        raise HTTPException(status_code=400, detail="capacity_per_second must be greater than 0")
+    if not (0 <= failure_rate <= 1 and 0 <= rate_limit_rate <= 1):
+        raise HTTPException(status_code=400, detail="failure_rate and rate_limit_rate must be between 0 and 1")
+    try:
+        profile = LatencyProfile.parse(latency)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="latency must be fixed:A, uniform:A:B or lognormal:MEDIAN:SIGMA")
+    return await run_payout_load(
+        volume=volume,
+        latency=profile,
+        failure_rate=failure_rate,
+        rate_limit_rate=rate_limit_rate,
+        capacity_per_second=capacity_per_second,
+        dispatch_rate=dispatch_rate,
+        concurrency=concurrency
+    )
+
+@app.get("/v1/admin/payout_history", tags=["Admin APIs"])
+async def get_payout_history(
+    method: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    limit: int = 50,
+    offset: int = 0
+):
+    """Page through simulator payout history (newest first) with filters"""
+    if not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 500")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must not be negative")
+    return payout_simulator.get_payout_history(
+        method=method,
+        date_from=date_from.isoformat() if date_from else None,
+        date_to=date_to.isoformat() if date_to else None,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        limit=limit,
+        offset=offset
+    )
+
+@app.get("/v1/admin/payout_history/{reference_id}", tags=["Admin APIs"])
+async def get_payout_history_entry(reference_id: str):
+    """Look up a simulated payout by GV code or UTR"""
+    entry = payout_simulator.get_payout(reference_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Payout not found")
+    return entry
+
+@app.get("/v1/admin/click_logs", tags=["Admin APIs"])
+async def get_click_logs():
+    """Get click logs for demo"""
+    return edge_redirector.get_click_logs()
+
+@app.get("/v1/admin/click/{click_id}", tags=["Admin APIs"])
+async def get_click_details(click_id: str):
+    """Get specific click details"""
+    click_data = edge_redirector.get_click_by_id(click_id)
+    if not click_data:
+        raise HTTPException(status_code=404, detail="Click not found")
+    return click_data
+
+@app.post("/v1/creator/offers/{offer_id}/reward_rate", tags=["Creator APIs"])
+async def update_offer_reward_rate(offer_id: str, reward_rate: float, tenant_id: str = Depends(get_creator_tenant_id)):
+    """Update reward rate for specific offer - demo feature"""
+    if reward_rate < 0 or reward_rate > 100:
+        raise HTTPException(status_code=400, detail="Reward rate must be between 0 and 100")
+    
+    # In real implementation, this would update the database
+    return {
+        "offer_id": offer_id,
+        "reward_rate": reward_rate,
+        "tenant_id": tenant_id,
+        "updated_at": datetime.utcnow().isoformat(),
+        "message": "Reward rate updated successfully"
+    }
+
+LEDGER_EXPORT_CHUNK_ROWS = 500
+LEDGER_EXPORT_COLUMNS = ["date", "ledger_id", "type", "description", "order_id", "status", "amount", "balance"]
+
+def iter_ledger_export(tenant_id: str, fmt: str = "csv", start_date: Optional[date] = None, end_date: Optional[date] = None):
+    """
+    Stream a tenant's ledger as CSV or NDJSON chunks.
+    Merges archived segments and db.ledger by created_at in one pass,
+    keeping only a small row buffer and the running balance, so memory stays
+    flat no matter how long the history is. Rows before start_date still
+    count towards the opening balance and archived segments wholly before
+    it contribute their totals unread; segments kept as totals only appear
+    as one summary row.
+    """
+    tenant_campaigns = {c["campaign_id"] for c in db.campaigns if c["tenant_id"] == tenant_id}
+    brands = {o["offer_id"]: o.get("brand", "") for o in db.offers}
+    start = start_date.isoformat() if start_date else None
+    end = end_date.isoformat() if end_date else None
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer:
+        writer.writerow([col.replace("_", " ").title() for col in LEDGER_EXPORT_COLUMNS])
+
+    balance = 0  # Paise
+    sources = []
+    for segment in db.ledger_segments:
+        if start and segment["last_created_at"][:10] < start:
+            balance += db.get_balance("tenant", tenant_id, balances=segment["balances"])["balance_paise"]
+        elif segment["path"] is None:
+            sources.append([{"created_at": segment["last_created_at"], "segment": segment}])
+        else:
+            sources.append(db.iter_segment_entries(segment))
+    sources.append(db.ledger)
+
+    pending_rows = 0
+    for entry in heapq.merge(*sources, key=lambda e: e["created_at"]):
+        # ISO timestamps sort lexically, so compare the date prefix as a string
+        day = entry["created_at"][:10]
+        if end and day > end:
+            continue
+        if "segment" in entry:
+            totals = db.get_balance("tenant", tenant_id, balances=entry["segment"]["balances"])
+            count = sum(t["count"] for t in totals["by_status"].values())
+            if not count:
+                continue
+            balance += totals["balance_paise"]
+            row = {
+                "date": day,
+                "ledger_id": entry["segment"]["segment_id"],
+                "type": "Archived",
+                "description": f"{count} archived entries (totals only)",
+                "order_id": "",
+                "status": "archived",
+                "amount": to_rupees(totals["balance_paise"]),
+                "balance": to_rupees(balance)
+            }
+        else:
+            if entry["campaign_id"] not in tenant_campaigns:
+                continue
+            amount = entry["creator_amount_paise"]
+            if entry["status"] not in db.BALANCE_EXCLUDED_STATUSES["tenant"]:
+                balance += amount
+            if start and day < start:
+                continue
+            row = {
+                "date": day,
+                "ledger_id": entry["ledger_id"],
+                "type": "Commission",
+                "description": f"{brands.get(entry['offer_id'], entry['offer_id'])} Sale",
+                "order_id": entry["order_id"],
+                "status": entry["status"],
+                "amount": to_rupees(amount),
+                "balance": to_rupees(balance)
+            }
+        if writer:
+            writer.writerow([row[col] for col in LEDGER_EXPORT_COLUMNS])
+        else:
+            buffer.write(json.dumps(row, ensure_ascii=False))
+            buffer.write("\n")
+
+        pending_rows += 1
+        if pending_rows >= LEDGER_EXPORT_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending_rows = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@app.get("/v1/creator/ledger/export", tags=["Creator APIs"])
+async def export_ledger_csv(
+    tenant_id: str = Depends(get_creator_tenant_id),
+    format: str = "csv",
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+):
+    """
+    Stream the creator's ledger as CSV or NDJSON with a running balance.
+    Optional start_date/end_date (YYYY-MM-DD) bound the exported rows.
+    """
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Format must be 'csv' or 'ndjson'")
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must be on or before end_date")
+
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    filename = f"ledger_export_{tenant_id}_{datetime.utcnow().strftime('%Y%m%d')}.{'csv' if format == 'csv' else 'ndjson'}"
+
+    return StreamingResponse(
+        iter_ledger_export(tenant_id, format, start_date, end_date),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.post("/v1/webhooks/conversion", tags=["Events & Webhooks"])
+async def receive_conversion_webhook(request: ConversionWebhookRequest, response: Response, x_webhook_delivery_id: Optional[str] = Header(None)):
+    """
+    Receive conversion webhook from Trackier.
+    The postback is acknowledged (202) as soon as it is durably queued; the
+    split and ledger write happen on the conversion worker pool.
+    Redelivered postbacks (same delivery ID or same offer/order) are
+    absorbed without creating a second ledger entry.
+    """
+    # Only caller-supplied delivery IDs are remembered for dedupe; a generated one just labels the response
+    delivery_id = x_webhook_delivery_id or request.delivery_id
+    webhook_id = delivery_id or f"webhook_{uuid.uuid4().hex[:8]}"
+    job = await conversion_queue.submit(request.model_dump(), delivery_id=delivery_id)
+    
+    webhook_data = {
+        "received_at": datetime.utcnow().isoformat(),
+        "click_id": request.click_id,
+        "offer_id": request.offer_id,
+        "sale_amount": request.sale_amount,
+        "order_id": request.order_id,
+        "status": request.status,
+        "processed": job["status"] == "done"
+    }
+    
+    if job["status"] == "queued":
+        response.status_code = 202
+        return {
+            "status": "accepted",
+            "webhook_id": webhook_id,
+            "job_id": job["job_id"],
+            "queue_depth": conversion_queue.depth,
+            "data": webhook_data
+        }
+    
+    return {
+        "status": "received",
+        "webhook_id": webhook_id,
+        "ledger_id": job["result"]["ledger_id"],
+        "duplicate": job["result"]["status"] != "ok",
+        "data": webhook_data
+    }
+
+@app.post("/v1/webhooks/payout_status", tags=["Events & Webhooks"])
+async def send_payout_status_webhook(payout_id: Optional[str] = None):
+    """
+    Deliver payout status webhooks now. With payout_id, (re)publishes that
+    payout's status to its tenants' subscriptions first; buffered events
+    for every destination are then flushed.
+    """
+    if payout_id:
+        payout = db.get_payout(payout_id)
+        if not payout:
+            raise HTTPException(status_code=404, detail="Payout not found")
+        entries = [l for l in (db.get_ledger_entry(lid) for lid in payout["ledger_ids"]) if l]
+        payout_run_service.notify("payout.completed", payout["user_id"], entries, payout_status_data(payout))
+    
+    deliveries = await webhook_dispatcher.flush()
+    return {
+        "status": "sent" if all(d["status"] == "delivered" for d in deliveries) else "partial",
+        "deliveries": deliveries,
+        "message": f"{len(deliveries)} webhook batch(es) delivered or attempted"
+    }
+
+@app.get("/v1/admin/webhooks", tags=["Admin APIs"])
+async def get_webhook_stats():
+    """Outbound webhook counters, delivery latency and recent failures"""
+    return {
+        "stats": webhook_dispatcher.stats(),
+        "recent": list(webhook_dispatcher.deliveries)[-20:],
+        "dead_letters": list(webhook_dispatcher.dead_letters)[-20:]
+    }
+
+@app.get("/v1/admin/otp", tags=["Admin APIs"])
+async def get_otp_stats():
+    """OTP store counters: issued, verified, failed attempts, lockouts, rate limiting and evictions"""
+    return otp_store.stats()
+
+@app.get("/v1/admin/conversion_scoring", tags=["Admin APIs"])
+async def get_conversion_scoring_stats():
+    """Conversion fraud scoring counters and the most recently flagged conversions"""
+    return {"stats": conversion_scorer.stats(), "recent": list(conversion_scorer.flagged)[-50:]}
+
+@app.post("/v1/admin/conversions/{ledger_id}/review", tags=["Admin APIs"])
+async def review_conversion(ledger_id: str, approve: bool):
+    """Release a held conversion to the status it arrived with, or reject it"""
+    entry = db.get_ledger_entry(ledger_id)
+    if not entry or entry["status"] != "review":
+        raise HTTPException(status_code=404, detail="No held conversion with this ID")
+    status = entry.pop("held_status", "queued") if approve else "rejected"
+    entry.pop("held_status", None)
+    db.update_ledger_status(entry, status)
+    entry["reviewed_at"] = datetime.utcnow().isoformat()
+    return {"ledger_id": ledger_id, "status": status}
+
+@app.get("/v1/admin/traces/slow", tags=["Admin APIs"])
+async def get_slow_traces():
+    """Tracing counters and the slowest recent requests with their top spans"""
+    return {"stats": tracer.stats(), "slow": list(tracer.slow)[-50:]}
+
+@app.get("/v1/admin/click_filter", tags=["Admin APIs"])
+async def get_click_filter_stats():
+    """Click fraud filter counters and the most recently filtered clicks"""
+    return {"stats": click_filter.stats(), "recent": list(click_filter.filtered)[-50:]}
+
+@app.get("/v1/admin/rate_limits", tags=["Admin APIs"])
+async def get_rate_limit_stats():
+    """Rate limiter counters, configured limits and bucket count"""
+    return rate_limiter.stats()
+
+@app.get("/v1/admin/api_keys", tags=["Admin APIs"])
+async def get_api_key_stats():
+    """API key authentication counters and the busiest keys"""
+    busiest = sorted(api_key_auth.usage.items(), key=lambda kv: kv[1]["requests"], reverse=True)[:20]
+    return {
+        "stats": api_key_auth.stats(),
+        "busiest": [{"key_id": key_id, **api_key_auth.key_usage(key_id)} for key_id, _ in busiest]
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+# Vercel compatibility - export the app for serverless deployment
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8001)
+
+
+
+def normalize_phone(phone: str, default_country_code: str = "91") -> str:
+    """
+    E.164 form of a phone number ("+919876543210"). Spaces, dashes, dots and
+    brackets are dropped; "00" and a national trunk "0" are handled, and bare
+    10-digit numbers get the default country code. Raises ValueError.
+    """
+    raw = re.sub(r"[\s\-().]", "", phone or "")
+    if raw.startswith("00"):
+        raw = "+" + raw[2:]
+    if raw.startswith("+"):
+        digits = raw[1:]
+    elif len(raw) == 11 and raw.startswith("0"):
+        digits = default_country_code + raw[1:]
+    elif len(raw) == 10:
+        digits = default_country_code + raw
+    else:
+        digits = raw
+    if not digits.isdigit() or not 8 <= len(digits) <= 15 or digits.startswith("0"):
+        raise ValueError(f"Invalid phone number: {phone}")
+    return "+" + digits
+
+def phone_key(phone: str) -> str:
+    """E.164 when the number parses, else the input without separators"""
+    try:
+        return normalize_phone(phone)
+    except ValueError:
+        return re.sub(r"[\s\-().]", "", phone or "")
+
+def mask_phone(phone: str) -> str:
+    """Phone number for logs with all but the last four digits masked ("+********3210")"""
+    phone = phone_key(phone)
+    if len(phone) <= 8:
+        return "*" * len(phone)
+    return phone[0] + "*" * (len(phone) - 5) + phone[-4:]
+
+def normalize_email(email: str) -> str:
+    return (email or "").strip().lower()
+
+class DuplicateTenantError(ValueError):
+    """A tenant already holds this phone number or email"""
+
+    def __init__(self, field: str):
+        super().__init__(f"Duplicate tenant {field}")
+        self.field = field
+
 # Mock data storage (replace with real DB)
+@tracer.trace_methods("db")
 class MockDatabase:
     def __init__(self):
         self.tenants = []
+        # Tenant indexes: tenant_id, and unique normalized phone / email
+        self.tenants_by_id = {}
+        self.tenants_by_phone = {}
+        self.tenants_by_email = {}
+        # Partner API keys, stored only as SHA-256 digests
+        self.api_keys_by_hash = {}
+        self.api_keys_by_id = {}
         self.offers = []
         self.advertisers = []
         self.brands = []  # New brands table
         self.campaigns = []
         self.links = []
         self.clicks = []
+        # Primary-key indexes, kept in sync by the create/upsert methods
+        self.offers_by_id = {}
+        self.campaigns_by_id = {}
+        self.links_by_id = {}
+        self.clicks_by_id = {}
         self.ledger = []  # Block 5: ledger support
         self.payouts = []  # Block 6: payout support
-        self.otp_requests = {}
+        self.payout_runs = {}  # run_id -> chunked payout run record
+        self.payout_run_retention = int(os.environ.get("PAYOUT_RUN_RETENTION", "500"))  # Completed runs kept
+        # Idempotency indexes for conversion postbacks
+        self.ledger_by_id = {}
+        self.ledger_by_order = {}  # (offer_id, order_id) -> ledger entry
+        # Caller-supplied delivery_id -> processing result, least recently seen evicted
+        # first; (offer_id, order_id) still dedupes replays older than the window
+        self.webhook_deliveries = OrderedDict()
+        self.webhook_delivery_limit = int(os.environ.get("WEBHOOK_DELIVERY_CACHE_SIZE", "100000"))
+        # Payout eligibility index: min-heap of (cool_off_until, seq, ledger entry)
+        # over queued entries, so payout runs only touch entries that are due
+        self.payout_heap = []
+        self.payout_heap_ids = set()
+        self.payout_heap_seq = 0
+        # Running balances: (owner_type, owner_id) -> balance row, updated in
+        # the same call that writes or re-statuses a ledger entry
+        self.balances = {}
+        # Compaction: closed entries move out of self.ledger into archival
+        # segments; the snapshot holds their balance totals as of the last run
+        self.ledger_seq = 0
+        self.ledger_segments = []
+        self.ledger_snapshot = {"as_of": None, "segments": 0, "entries": 0, "balances": {}}
+        # Archived rows go to NDJSON files; LEDGER_ARCHIVE_DIR="" keeps segment totals only
+        self.ledger_archive_dir = os.environ.get("LEDGER_ARCHIVE_DIR", "Data/ledger_archive") or None
+        # How long archived orders keep an idempotency stub for replayed postbacks
+        self.ledger_order_stub_days = int(os.environ.get("LEDGER_ORDER_STUB_DAYS", "180"))
+        self.payouts_by_id = {}
+        # Outbound webhook subscriptions per tenant
+        self.webhook_subscriptions = {}  # tenant_id -> [subscription]
         self.load_mock_data()
     
     def load_mock_data(self):
@@ -604,6 +1131,14 @@ class MockDatabase:
                     "updated_at": datetime.utcnow().isoformat()
                 }
             ]
+        self.index_tenants()
+        # Demo tenants may carry a plaintext key; keep only its digest
+        self.api_keys_by_hash = {}
+        self.api_keys_by_id = {}
+        for tenant in self.tenants:
+            if tenant.get("api_key"):
+                self.register_api_key(tenant["tenant_id"], tenant.pop("api_key"))
+        
         # Add mock brands
         self.brands = [
             {"brand_id": "adv_001", "trackier_advertiser_id": "adv_001", "name": "Flipkart", "logo_url": "https://logo.clearbit.com/flipkart.com"},
@@ -625,31 +1160,140 @@ class MockDatabase:
         self.clicks = []
         self.ledger = []
         self.payouts = []
+        self.payouts_by_id = {}
+        self.offers_by_id = {o["offer_id"]: o for o in self.offers}
+        self.campaigns_by_id = {}
+        self.links_by_id = {}
+        self.clicks_by_id = {}
+        self.ledger_by_id = {}
+        self.ledger_by_order = {}
+        self.webhook_deliveries = OrderedDict()
+        self.payout_runs = {}
+        self.payout_heap = []
+        self.payout_heap_ids = set()
+        self.payout_heap_seq = 0
+        self.balances = {}
+        self.ledger_seq = 0
+        self.ledger_segments = []
+        self.ledger_snapshot = {"as_of": None, "segments": 0, "entries": 0, "balances": {}}
+    
+    def index_tenants(self):
+        """Rebuild the tenant indexes (first tenant wins on duplicate contacts)"""
+        self.tenants_by_id = {}
+        self.tenants_by_phone = {}
+        self.tenants_by_email = {}
+        for tenant in self.tenants:
+            self.tenants_by_id[tenant["tenant_id"]] = tenant
+            for field, key in self.tenant_contact_keys(tenant).items():
+                self.contact_index(field).setdefault(key, tenant)
+    
+    def contact_index(self, field: str):
+        return self.tenants_by_phone if field == "phone" else self.tenants_by_email
+    
+    def tenant_contact_keys(self, tenant, phone=None, email=None):
+        """Normalized phone and email keys for a tenant"""
+        keys = {}
+        phone = phone if phone is not None else tenant.get("phone")
+        email = email if email is not None else tenant.get("email")
+        if phone:
+            keys["phone"] = phone_key(phone)
+        if email:
+            keys["email"] = normalize_email(email)
+        return keys
+    
+    def check_tenant_contacts(self, keys, tenant_id=None):
+        for field, key in keys.items():
+            owner = self.contact_index(field).get(key)
+            if owner is not None and owner["tenant_id"] != tenant_id:
+                raise DuplicateTenantError(field)
     
     def save_tenant(self, tenant_data):
-        """Save tenant data (mock persistence)"""
+        """Save tenant data (mock persistence); phone and email must be unique"""
+        keys = self.tenant_contact_keys(tenant_data)
+        self.check_tenant_contacts(keys)
         self.tenants.append(tenant_data)
+        self.tenants_by_id[tenant_data["tenant_id"]] = tenant_data
+        for field, key in keys.items():
+            self.contact_index(field)[key] = tenant_data
         return tenant_data
     
+    def update_tenant_contact(self, tenant, phone=None, email=None):
+        """Change a tenant's phone and/or email, keeping the unique indexes in sync"""
+        old_keys = self.tenant_contact_keys(tenant)
+        new_keys = self.tenant_contact_keys(tenant, phone=phone, email=email)
+        self.check_tenant_contacts(new_keys, tenant["tenant_id"])
+        for field, key in old_keys.items():
+            if self.contact_index(field).get(key) is tenant:
+                del self.contact_index(field)[key]
+        if phone is not None:
+            tenant["phone"] = phone
+        if email is not None:
+            tenant["email"] = email
+        for field, key in new_keys.items():
+            self.contact_index(field)[key] = tenant
+    
+    def register_api_key(self, tenant_id: str, key: str, quota_per_minute: Optional[int] = None):
+        """Store a key's digest for a tenant and return the key record"""
+        key_hash = hash_api_key(key)
+        record = {
+            "key_id": f"key_{key_hash[:12]}",
+            "key_hash": key_hash,
+            "prefix": key[:12],
+            "tenant_id": tenant_id,
+            "status": "active",
+            "quota_per_minute": quota_per_minute,
+            "created_at": datetime.utcnow().isoformat()
+        }
+        self.api_keys_by_hash[key_hash] = record
+        self.api_keys_by_id[record["key_id"]] = record
+        return record
+    
+    def get_api_key(self, key_hash: str):
+        """Get key record by digest"""
+        return self.api_keys_by_hash.get(key_hash)
+    
+    def get_tenant_api_keys(self, tenant_id: str):
+        return [k for k in self.api_keys_by_id.values() if k["tenant_id"] == tenant_id]
+    
+    def revoke_api_key(self, key_id: str):
+        record = self.api_keys_by_id.get(key_id)
+        if record:
+            record["status"] = "revoked"
+            record["revoked_at"] = datetime.utcnow().isoformat()
+        return record
+    
+    def get_tenant(self, tenant_id: str):
+        """Get tenant by ID"""
+        return self.tenants_by_id.get(tenant_id)
+    
+    def find_tenant_by_phone(self, phone: str):
+        """Get the tenant holding a phone number (any format), or None"""
+        return self.tenants_by_phone.get(phone_key(phone))
+    
+    def find_tenant_by_email(self, email: str):
+        return self.tenants_by_email.get(normalize_email(email))
+    
     def upsert_offer(self, offer_data):
         """Upsert offer data"""
-        existing_idx = next(
-            (i for i, offer in enumerate(self.offers) if offer["offer_id"] == offer_data["offer_id"]), 
-            None
-        )
+        existing_offer = self.offers_by_id.get(offer_data["offer_id"])
         
-        if existing_idx is not None:
+        if existing_offer is not None:
             # Update existing
-            self.offers[existing_idx].update(offer_data)
-            self.offers[existing_idx]["updated_at"] = datetime.utcnow().isoformat()
+            existing_offer.update(offer_data)
+            existing_offer["updated_at"] = datetime.utcnow().isoformat()
             return "updated"
         else:
             # Add new
             offer_data["created_at"] = datetime.utcnow().isoformat()
             offer_data["updated_at"] = datetime.utcnow().isoformat()
             self.offers.append(offer_data)
+            self.offers_by_id[offer_data["offer_id"]] = offer_data
             return "added"
     
+    def get_offer(self, offer_id: str):
+        """Get offer by ID"""
+        return self.offers_by_id.get(offer_id)
+    
     def get_offers(self, tenant_id: Optional[str] = None, category: Optional[str] = None, active_only: bool = True):
         """Get filtered offers"""
         filtered_offers = self.offers
@@ -668,11 +1312,12 @@ class MockDatabase:
         campaign_data["created_at"] = datetime.utcnow().isoformat()
         campaign_data["status"] = "active"
         self.campaigns.append(campaign_data)
+        self.campaigns_by_id[campaign_data["campaign_id"]] = campaign_data
         return campaign_data
     
     def get_campaign(self, campaign_id: str):
         """Get campaign by ID"""
-        return next((c for c in self.campaigns if c["campaign_id"] == campaign_id), None)
+        return self.campaigns_by_id.get(campaign_id)
     
     def get_tenant_campaigns(self, tenant_id: str):
         """Get all campaigns for a tenant"""
@@ -682,8 +1327,13 @@ class MockDatabase:
         """Create new smart link"""
         link_data["created_at"] = datetime.utcnow().isoformat()
         self.links.append(link_data)
+        self.links_by_id[link_data["link_id"]] = link_data
         return link_data
     
+    def get_link(self, link_id: str):
+        """Get link by ID"""
+        return self.links_by_id.get(link_id)
+    
     def get_tenant_links(self, tenant_id: str):
         """Get all links for a tenant"""
         tenant_campaigns = [c["campaign_id"] for c in self.campaigns if c["tenant_id"] == tenant_id]
@@ -699,19 +1349,303 @@ class MockDatabase:
         click_data["click_id"] = f"click_{len(self.clicks) + 1}"
         click_data["created_at"] = datetime.utcnow().isoformat()
         self.clicks.append(click_data)
+        self.clicks_by_id[click_data["click_id"]] = click_data
         return click_data
+    
+    def get_click(self, click_id: str):
+        """Get click by ID"""
+        return self.clicks_by_id.get(click_id)
+    
+    def create_clicks(self, clicks_data):
+        """Create a batch of click records in one step (all or nothing)"""
+        now = datetime.utcnow().isoformat()
+        next_id = len(self.clicks) + 1
+        for offset, click_data in enumerate(clicks_data):
+            click_data["click_id"] = f"click_{next_id + offset}"
+            click_data["created_at"] = now
+        self.clicks.extend(clicks_data)
+        self.clicks_by_id.update((c["click_id"], c) for c in clicks_data)
+        return clicks_data
 
     def create_ledger_entry(self, ledger_data):
-        ledger_data["ledger_id"] = f"led_{len(self.ledger) + 1}"
+        # A sequence, not len(self.ledger), since compaction shrinks the list
+        self.ledger_seq += 1
+        ledger_data["ledger_id"] = f"led_{self.ledger_seq}"
         ledger_data["created_at"] = datetime.utcnow().isoformat()
+        if not ledger_data.get("tenant_id"):
+            campaign = self.campaigns_by_id.get(ledger_data["campaign_id"])
+            ledger_data["tenant_id"] = campaign["tenant_id"] if campaign else None
+        # Integer paise are the source of truth; the rupee fields are for display
+        for field in self.LEDGER_MONEY_FIELDS:
+            ledger_data.setdefault(f"{field}_paise", to_paise(ledger_data[field]))
+        # The tenant's running balance (integer paise) before and after this entry
+        ledger_data["balance_before_paise"] = self.get_balance("tenant", ledger_data["tenant_id"])["balance_paise"]
+        self.apply_ledger_balance(ledger_data, 1)
+        ledger_data["balance_after_paise"] = self.get_balance("tenant", ledger_data["tenant_id"])["balance_paise"]
         self.ledger.append(ledger_data)
+        self.ledger_by_id[ledger_data["ledger_id"]] = ledger_data
+        self.ledger_by_order[(ledger_data["offer_id"], ledger_data["order_id"])] = ledger_data
+        self.index_payout_eligibility(ledger_data)
         return ledger_data
+    
+    def update_ledger_status(self, ledger_entry, status: str):
+        """Change a ledger entry's status, keeping the payout index and balances in sync"""
+        self.apply_ledger_balance(ledger_entry, -1)
+        ledger_entry["status"] = status
+        self.apply_ledger_balance(ledger_entry, 1)
+        self.index_payout_eligibility(ledger_entry)
+        return ledger_entry
+    
+    def update_ledger_split(self, ledger_entry, split: Dict[str, float]):
+        """Replace an entry's commission split, keeping balances in sync"""
+        self.apply_ledger_balance(ledger_entry, -1)
+        for field in ("base_commission", "user_pct", "user_amount", "creator_amount",
+                      "base_commission_paise", "user_amount_paise", "creator_amount_paise"):
+            ledger_entry[field] = split[field]
+        self.apply_ledger_balance(ledger_entry, 1)
+        self.index_payout_eligibility(ledger_entry)  # May now clear MIN_PAYOUT_PAISE
+        return ledger_entry
+    
+    LEDGER_MONEY_FIELDS = ("sale_amount", "base_commission", "user_amount", "creator_amount")
+    # Which share of an entry each owner earns, and which statuses do not count towards their balance
+    # (held for review: not yet)
+    BALANCE_AMOUNT_FIELDS = {"tenant": "creator_amount_paise", "user": "user_amount_paise"}
+    BALANCE_EXCLUDED_STATUSES = {"tenant": ("rejected", "review"), "user": ("rejected", "paid", "review")}
+    PENDING_PAYOUT_STATUSES = ("queued", "confirmed")
+    
+    def apply_ledger_balance(self, ledger_entry, sign: int, balances: Optional[Dict] = None):
+        """
+        Add (sign=1) or remove (sign=-1) an entry's amounts from its tenant
+        and user balance rows, under the entry's current status.
+        Applies to self.balances unless another set of rows is given.
+        """
+        now = datetime.utcnow().isoformat()
+        status = ledger_entry["status"]
+        for owner_type, owner_id in (("tenant", ledger_entry.get("tenant_id")), ("user", ledger_entry["user_id"])):
+            if owner_id is None:
+                continue
+            row = self.get_balance(owner_type, owner_id, create=True, balances=balances)
+            totals = row["by_status"].setdefault(status, {"count": 0, "user_amount_paise": 0, "creator_amount_paise": 0})
+            totals["count"] += sign
+            totals["user_amount_paise"] += sign * ledger_entry["user_amount_paise"]
+            totals["creator_amount_paise"] += sign * ledger_entry["creator_amount_paise"]
+            if status not in self.BALANCE_EXCLUDED_STATUSES[owner_type]:
+                row["balance_paise"] += sign * ledger_entry[self.BALANCE_AMOUNT_FIELDS[owner_type]]
+            if status in self.PENDING_PAYOUT_STATUSES:
+                row["pending_payout_paise"] += sign * ledger_entry["user_amount_paise"]
+            row["version"] += 1
+            row["updated_at"] = now
+    
+    def get_balance(self, owner_type: str, owner_id: str, create: bool = False, balances: Optional[Dict] = None):
+        """
+        Get the running balance row for a tenant or user, in integer paise.
+        balance is the owner's share of non-rejected entries (for users, net
+        of paid entries); pending_payout is user_amount awaiting payout.
+        """
+        balances = self.balances if balances is None else balances
+        key = (owner_type, owner_id)
+        row = balances.get(key)
+        if row is None:
+            row = {
+                "owner_type": owner_type,
+                "owner_id": owner_id,
+                "balance_paise": 0,
+                "pending_payout_paise": 0,
+                "by_status": {},
+                "version": 0,
+                "updated_at": None
+            }
+            if create:
+                balances[key] = row
+        return row
+    
+    # Statuses that are final; entries in them can be compacted
+    CLOSED_LEDGER_STATUSES = ("paid", "rejected")
+    
+    def compact_ledger(self, before: datetime):
+        """
+        Move closed entries created before `before` into an archival segment.
+        The segment keeps per-tenant/per-user totals of what it holds and the
+        snapshot accumulates them, so live queries only scan the tail.
+        Rows are written to the archive directory, or dropped when there is
+        none. Order lookups keep a small stub so replayed postbacks stay
+        idempotent, evicted ledger_order_stub_days after the segment's last entry.
+        """
+        cutoff = before.isoformat()
+        closed, live = [], []
+        for entry in self.ledger:
+            if entry["status"] in self.CLOSED_LEDGER_STATUSES and entry["created_at"] < cutoff:
+                closed.append(entry)
+            else:
+                live.append(entry)
+        if not closed:
+            return None
+        closed.sort(key=lambda e: e["created_at"])
+        
+        segment_id = f"seg_{len(self.ledger_segments) + 1}"
+        segment = {
+            "segment_id": segment_id,
+            "created_at": datetime.utcnow().isoformat(),
+            "entries": len(closed),
+            "first_created_at": closed[0]["created_at"],
+            "last_created_at": closed[-1]["created_at"],
+            "balances": {},
+            "path": None,
+            "order_keys": []
+        }
+        for entry in closed:
+            self.apply_ledger_balance(entry, 1, balances=segment["balances"])
+            self.apply_ledger_balance(entry, 1, balances=self.ledger_snapshot["balances"])
+            self.ledger_by_id.pop(entry["ledger_id"], None)
+            segment["order_keys"].append((entry["offer_id"], entry["order_id"]))
+            self.ledger_by_order[(entry["offer_id"], entry["order_id"])] = {
+                "ledger_id": entry["ledger_id"],
+                "status": entry["status"],
+                "segment_id": segment_id,
+                "archived": True
+            }
+        
+        if self.ledger_archive_dir:
+            os.makedirs(self.ledger_archive_dir, exist_ok=True)
+            segment["path"] = os.path.join(self.ledger_archive_dir, f"{segment_id}.jsonl")
+            with open(segment["path"], "w") as f:
+                for entry in closed:
+                    f.write(json.dumps(entry) + "\n")
+        
+        self.ledger = live
+        self.ledger_segments.append(segment)
+        self.evict_order_stubs(before - timedelta(days=self.ledger_order_stub_days))
+        self.ledger_snapshot.update({
+            "as_of": cutoff,
+            "segments": len(self.ledger_segments),
+            "entries": self.ledger_snapshot["entries"] + len(closed)
+        })
+        log.info("ledger.compacted", segment_id=segment_id, compacted=len(closed), live=len(live))
+        return segment
+    
+    def evict_order_stubs(self, before: datetime):
+        """Drop the order stubs of segments whose last entry is older than `before`"""
+        cutoff = before.isoformat()
+        for segment in self.ledger_segments:
+            if not segment["order_keys"] or segment["last_created_at"] >= cutoff:
+                continue
+            for key in segment["order_keys"]:
+                stub = self.ledger_by_order.get(key)
+                if stub is not None and stub.get("segment_id") == segment["segment_id"]:
+                    del self.ledger_by_order[key]
+            segment["order_keys"] = []
+    
+    def iter_segment_entries(self, segment):
+        """Stream the entries archived in a segment (none for totals-only segments)"""
+        if segment["path"] is None:
+            return
+        with open(segment["path"]) as f:
+            for line in f:
+                yield json.loads(line)
+    
+    def rebuild_balances(self):
+        """Recompute balance rows from the snapshot plus the live tail"""
+        balances = copy.deepcopy(self.ledger_snapshot["balances"])
+        for entry in self.ledger:
+            self.apply_ledger_balance(entry, 1, balances=balances)
+        return balances
+    
+    MIN_PAYOUT_PAISE = 1000  # ₹10
+    
+    def index_payout_eligibility(self, ledger_entry):
+        """Add a queued entry to the payout heap (parsed once, on insert)"""
+        if ledger_entry["status"] != "queued" or ledger_entry["user_amount_paise"] < self.MIN_PAYOUT_PAISE:
+            return
+        if ledger_entry.get("payout_run_id"):
+            return  # Reserved by a payout run that has not finished with it
+        if ledger_entry["ledger_id"] in self.payout_heap_ids:
+            return
+        self.payout_heap_seq += 1
+        heapq.heappush(self.payout_heap, (
+            datetime.fromisoformat(ledger_entry["cool_off_until"]),
+            self.payout_heap_seq,
+            ledger_entry
+        ))
+        self.payout_heap_ids.add(ledger_entry["ledger_id"])
+    
+    def pop_eligible_ledger_entries(self, now: datetime):
+        """
+        Pop every indexed entry whose cool-off has expired.
+        Entries whose status changed since they were indexed are dropped.
+        """
+        eligible = []
+        while self.payout_heap and self.payout_heap[0][0] <= now:
+            _, _, ledger_entry = heapq.heappop(self.payout_heap)
+            self.payout_heap_ids.discard(ledger_entry["ledger_id"])
+            if (ledger_entry["status"] == "queued" and ledger_entry["user_amount_paise"] >= self.MIN_PAYOUT_PAISE
+                    and not ledger_entry.get("payout_run_id")):
+                eligible.append(ledger_entry)
+        return eligible
+    
+    def next_payout_eligible_at(self):
+        """When the next indexed entry's cool-off expires, if any"""
+        return self.payout_heap[0][0] if self.payout_heap else None
+    
+    def get_ledger_entry(self, ledger_id: str):
+        """Get ledger entry by ID"""
+        return self.ledger_by_id.get(ledger_id)
+    
+    def get_webhook_delivery(self, delivery_id: str):
+        """Result recorded for a postback delivery ID, if still remembered"""
+        result = self.webhook_deliveries.get(delivery_id)
+        if result is not None:
+            self.webhook_deliveries.move_to_end(delivery_id)
+        return result
+    
+    def record_webhook_delivery(self, delivery_id: str, result):
+        self.webhook_deliveries[delivery_id] = result
+        self.webhook_deliveries.move_to_end(delivery_id)
+        while len(self.webhook_deliveries) > self.webhook_delivery_limit:
+            self.webhook_deliveries.popitem(last=False)
+    
+    def get_ledger_entry_for_order(self, offer_id: str, order_id: str):
+        """Get the ledger entry already created for an advertiser order, if any"""
+        return self.ledger_by_order.get((offer_id, order_id))
 
     def create_payout(self, payout_data):
         payout_data["payout_id"] = f"payout_{len(self.payouts) + 1}"
         payout_data["ts_paid"] = datetime.utcnow().isoformat()
         self.payouts.append(payout_data)
+        self.payouts_by_id[payout_data["payout_id"]] = payout_data
         return payout_data
+    
+    def get_payout(self, payout_id: str):
+        """Get payout by ID"""
+        return self.payouts_by_id.get(payout_id)
+    
+    def create_webhook_subscription(self, subscription_data):
+        subscription_data["subscription_id"] = f"whs_{uuid.uuid4().hex[:8]}"
+        subscription_data["created_at"] = datetime.utcnow().isoformat()
+        self.webhook_subscriptions.setdefault(subscription_data["tenant_id"], []).append(subscription_data)
+        return subscription_data
+    
+    def get_webhook_subscriptions(self, tenant_id: str):
+        """Get a tenant's webhook subscriptions"""
+        return self.webhook_subscriptions.get(tenant_id, [])
+    
+    def save_payout_run(self, run_data):
+        """
+        Save payout run record / checkpoint (mock persistence).
+        Only the newest payout_run_retention completed runs are kept;
+        unfinished runs stay until they complete so they can be resumed.
+        """
+        run_data["updated_at"] = datetime.utcnow().isoformat()
+        self.payout_runs[run_data["run_id"]] = run_data
+        if run_data["status"] == "completed":
+            completed = [run_id for run_id, r in self.payout_runs.items() if r["status"] == "completed"]
+            for run_id in completed[:max(0, len(completed) - self.payout_run_retention)]:
+                del self.payout_runs[run_id]
+        return run_data
+    
+    def get_payout_run(self, run_id: str):
+        """Get payout run by ID"""
+        return self.payout_runs.get(run_id)
+    
     def get_user_payouts(self, user_id):
         return [p for p in self.payouts if p["user_id"] == user_id]
     
@@ -749,7 +1683,9 @@ class MockDatabase:
 
 # Global mock database instance
 db = MockDatabase()
+api_key_auth = APIKeyAuth(db.get_api_key, quota_per_minute=int(os.environ.get("API_KEY_QUOTA_PER_MINUTE", "600")))
 
+@tracer.trace_methods("trackier")
 class TrackierClient:
     """Real Trackier API client with proper endpoints"""
     
@@ -896,6 +1832,7 @@ class CatalogueService:
     
     async def sync_campaigns(self, advertiser_id: Optional[str] = None) -> Dict[str, Any]:
         """Sync campaigns (offers) from Trackier"""
+        started = time.perf_counter()
         try:
             campaigns = await self.trackier_client.get_campaigns(advertiser_id=advertiser_id)
             
@@ -917,15 +1854,23 @@ class CatalogueService:
                 result = self.db.upsert_offer(offer_data)
                 stats[result] += 1
             
+            duration = time.perf_counter() - started
+            trackier_sync_duration.observe(duration)
+            trackier_sync_offers.set(len(campaigns))
+            trackier_syncs.inc("success")
+            log.info("catalogue.synced", offers=len(campaigns), duration_seconds=round(duration, 3), **stats)
             return {
                 "status": "success",
                 "campaigns_processed": len(campaigns),
                 "added": stats["added"],
                 "updated": stats["updated"],
                 "deactivated": stats["deactivated"],
+                "duration_seconds": round(duration, 3),
                 "message": f"Synced {len(campaigns)} campaigns from Trackier"
             }
         except Exception as e:
+            trackier_syncs.inc("error")
+            log.error("catalogue.sync_failed", error=str(e), exc_info=True)
             return {
                 "status": "error", 
                 "message": f"Failed to sync campaigns: {str(e)}"
@@ -947,7 +1892,7 @@ class CampaignBuilderService:
     def create_campaign(self, tenant_id: str, name: str, share_pct: Optional[float] = None) -> CampaignResponse:
         """Create new campaign"""
         # Validate tenant exists
-        tenant = next((t for t in self.db.tenants if t["tenant_id"] == tenant_id), None)
+        tenant = self.db.get_tenant(tenant_id)
         if not tenant:
             raise HTTPException(status_code=404, detail="Tenant not found")
         
@@ -988,7 +1933,7 @@ class CampaignBuilderService:
             raise HTTPException(status_code=404, detail="Campaign not found")
         
         # Validate offer exists
-        offer = next((o for o in self.db.offers if o["offer_id"] == offer_id), None)
+        offer = self.db.get_offer(offer_id)
         if not offer:
             raise HTTPException(status_code=404, detail="Offer not found")
         
@@ -1044,9 +1989,521 @@ class CampaignBuilderService:
             period=period
         )
 
+# Block 5: Conversion Service
+class ConversionService:
+    def __init__(self, db: MockDatabase):
+        self.db = db
+    
+    def process(self, request: ConversionWebhookRequest, delivery_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Resolve click -> link -> campaign -> offer, split the commission and
+        write exactly one ledger entry per (offer_id, order_id).
+        Replayed deliveries and repeated orders return the original entry;
+        a repeated order with a new status updates the entry unless it is
+        paid or already compacted into the archive. Entries held for fraud
+        review only take a rejection; other statuses wait for the review.
+        """
+        delivery_id = delivery_id or request.delivery_id
+        seen = self.db.get_webhook_delivery(delivery_id) if delivery_id else None
+        if seen is not None:
+            conversions_total.inc("duplicate")
+            return {**seen, "status": "duplicate"}
+        
+        status = "queued" if request.status == "approved" else request.status
+        existing = self.db.get_ledger_entry_for_order(request.offer_id, request.order_id)
+        if existing:
+            result = {"status": "duplicate", "ledger_id": existing["ledger_id"]}
+            if existing["status"] == "review" and status != "rejected":
+                existing["held_status"] = status
+            elif existing["status"] not in (status, "paid") and not existing.get("archived"):
+                self.db.update_ledger_status(existing, status)
+                result["status"] = "updated"
+            log.info("conversion.replayed", order_id=request.order_id, result=result["status"], ledger_id=existing["ledger_id"])
+            conversions_total.inc(result["status"])
+        else:
+            entry = self.create_ledger_entry(request, status)
+            result = {"status": "ok", "ledger_id": entry["ledger_id"]}
+            conversions_total.inc("held" if entry["status"] == "review" else "created")
+        
+        if delivery_id:
+            self.db.record_webhook_delivery(delivery_id, result)
+        return result
+    
+    def create_ledger_entry(self, request: ConversionWebhookRequest, status: str) -> Dict[str, Any]:
+        """Calculate the commission split and create the ledger entry"""
+        # Find click
+        click = self.db.get_click(request.click_id)
+        if not click:
+            raise HTTPException(status_code=404, detail="Click not found")
+        # Find link
+        link = self.db.get_link(click["link_id"])
+        if not link:
+            raise HTTPException(status_code=404, detail="Link not found")
+        # Find campaign
+        campaign = self.db.get_campaign(link["campaign_id"])
+        if not campaign:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+        # Find offer
+        offer = self.db.get_offer(request.offer_id)
+        if not offer:
+            raise HTTPException(status_code=404, detail="Offer not found")
+        # Fraud scoring: suspicious conversions are flagged, the worst held for review
+        # (evaluated now, recorded only once the entry is committed, so a retried write is not scored against itself)
+        scored_at = datetime.utcnow()
+        with tracer.span("conversion_scorer.score"):
+            fraud = conversion_scorer.evaluate(click, link["link_id"], request.order_id, request.sale_amount,
+                                               now=scored_at, advertiser_id=offer.get("advertiser_id"))
+        held_status = None
+        if fraud["hold"] and status != "rejected":
+            held_status, status = status, "review"
+            log.warning("conversion.held", order_id=request.order_id, click_id=request.click_id,
+                        fraud_score=fraud["score"], reasons=fraud["reasons"])
+        # Calculate commission split
+        with tracer.span("split_engine.split"):
+            split = split_engine.split(request.sale_amount, offer["base_commission_pct"], campaign["share_pct"])
+        # Cool-off period
+        cool_off_days = offer.get("cool_off_days", 30)
+        cool_off_until = (datetime.utcnow() + timedelta(days=cool_off_days)).isoformat()
+        # Create ledger entry
+        ledger_data = {
+            "conv_id": f"conv_{uuid.uuid4().hex[:8]}",
+            "click_id": click["click_id"],
+            "link_id": link["link_id"],
+            "campaign_id": campaign["campaign_id"],
+            "offer_id": offer["offer_id"],
+            "tenant_id": campaign["tenant_id"],
+            "user_id": click.get("user_id", "anonymous"),
+            "order_id": request.order_id,
+            "sale_amount": request.sale_amount,
+            "base_commission": split["base_commission"],
+            "user_pct": split["user_pct"],
+            "user_amount": split["user_amount"],
+            "creator_amount": split["creator_amount"],
+            "sale_amount_paise": split["sale_amount_paise"],
+            "base_commission_paise": split["base_commission_paise"],
+            "user_amount_paise": split["user_amount_paise"],
+            "creator_amount_paise": split["creator_amount_paise"],
+            "status": status,
+            "cool_off_until": cool_off_until,
+            "fraud_score": fraud["score"],
+            "fraud_reasons": fraud["reasons"]
+        }
+        if held_status:
+            ledger_data["held_status"] = held_status
+        ledger_entry = self.db.create_ledger_entry(ledger_data)
+        conversion_scorer.record(click, link["link_id"], request.order_id, request.sale_amount, fraud,
+                                 now=scored_at, advertiser_id=offer.get("advertiser_id"))
+        log.info("conversion.created", ledger_id=ledger_entry["ledger_id"], click_id=request.click_id,
+                 order_id=request.order_id, user_amount_paise=ledger_entry["user_amount_paise"],
+                 creator_amount_paise=ledger_entry["creator_amount_paise"], fraud_score=fraud["score"])
+        return ledger_entry
+
+# Split Recalculation Service
+class SplitRecalculationService:
+    """
+    Re-derives commission splits for open ledger entries when a campaign's
+    share_pct or an offer's base_commission_pct changes, as a dry run
+    ("what-if") or applied. Splits are computed in one batch by SplitEngine.
+    """
+    # Entries that have not been paid, rejected or reserved by a payout run
+    OPEN_STATUSES = ("pending", "queued", "confirmed")
+    
+    def __init__(self, db: MockDatabase):
+        self.db = db
+    
+    def open_entries(self, tenant_id: Optional[str] = None, campaign_id: Optional[str] = None, offer_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [
+            l for l in self.db.ledger
+            if l["status"] in self.OPEN_STATUSES and not l.get("payout_run_id")
+            and (tenant_id is None or l.get("tenant_id") == tenant_id)
+            and (campaign_id is None or l["campaign_id"] == campaign_id)
+            and (offer_id is None or l["offer_id"] == offer_id)
+        ]
+    
+    def recalculate(self, request: SplitRecalculationRequest, tenant_id: Optional[str] = None, apply: bool = False) -> Dict[str, Any]:
+        """Recalculate open entries under the requested percentages"""
+        if request.share_pct is not None and not (10 <= request.share_pct <= 90):
+            raise HTTPException(status_code=400, detail="Share percentage must be between 10% and 90%")
+        if request.base_commission_pct is not None and not (0 <= request.base_commission_pct <= 100):
+            raise HTTPException(status_code=400, detail="Base commission must be between 0% and 100%")
+        if request.campaign_id:
+            campaign = self.db.get_campaign(request.campaign_id)
+            if not campaign or (tenant_id and campaign["tenant_id"] != tenant_id):
+                raise HTTPException(status_code=404, detail="Campaign not found")
+        if request.offer_id and not self.db.get_offer(request.offer_id):
+            raise HTTPException(status_code=404, detail="Offer not found")
+        
+        entries = self.open_entries(tenant_id, request.campaign_id, request.offer_id)
+        base_commission_pcts = [
+            request.base_commission_pct if request.base_commission_pct is not None
+            else self.db.get_offer(l["offer_id"])["base_commission_pct"]
+            for l in entries
+        ]
+        share_pcts = [
+            request.share_pct if request.share_pct is not None
+            else self.db.get_campaign(l["campaign_id"])["share_pct"]
+            for l in entries
+        ]
+        rows = split_engine.recalculate(entries, base_commission_pcts, share_pcts)
+        
+        if apply:
+            for entry, row in zip(entries, rows):
+                self.db.update_ledger_split(entry, row)
+            if request.campaign_id and request.share_pct is not None:
+                self.db.get_campaign(request.campaign_id)["share_pct"] = request.share_pct
+            if request.offer_id and request.base_commission_pct is not None:
+                self.db.upsert_offer({"offer_id": request.offer_id, "base_commission_pct": request.base_commission_pct})
+            log.info("splits.recalculated", entries=len(entries))
+        
+        current_user = Money.total(r["current_user_amount_paise"] for r in rows)
+        current_creator = Money.total(r["current_creator_amount_paise"] for r in rows)
+        new_user = Money.total(r["user_amount_paise"] for r in rows)
+        new_creator = Money.total(r["creator_amount_paise"] for r in rows)
+        result = {
+            "applied": apply,
+            "entries": len(rows),
+            "current": {"user_amount": current_user.rupees, "creator_amount": current_creator.rupees},
+            "recalculated": {"user_amount": new_user.rupees, "creator_amount": new_creator.rupees},
+            "delta": {"user_amount": (new_user - current_user).rupees, "creator_amount": (new_creator - current_creator).rupees}
+        }
+        if request.include_entries:
+            result["rows"] = rows
+        return result
+
+def payout_status_data(payout: Dict[str, Any]) -> Dict[str, Any]:
+    """Payout fields included in payout status webhook events"""
+    return {
+        "payout_id": payout["payout_id"],
+        "status": payout.get("status", "completed"),
+        "amount": payout["amount"],
+        "amount_paise": payout.get("amount_paise"),
+        "method": payout["method"],
+        "reference_id": payout.get("voucher_code"),
+        "paid_at": payout["ts_paid"]
+    }
+
+# Block 6: Payout Run Service
+class PayoutRunService:
+    """
+    Chunked, resumable payout runs.
+    A run pops the eligible ledger entries once, reserves them, groups them
+    by user and splits the users into fixed-size chunks. The run record is
+    checkpointed after every chunk, so a run that stops part-way can be
+    resumed and chunks can be claimed by separate workers.
+    """
+    CHUNK_LEASE_SECONDS = 300
+    
+    def __init__(self, db: MockDatabase, dispatcher: PayoutDispatcher, webhooks: Optional[WebhookDispatcher] = None):
+        self.db = db
+        self.dispatcher = dispatcher
+        self.webhooks = webhooks
+    
+    def notify(self, event_type: str, user_id: str, entries: List[Dict[str, Any]], data: Dict[str, Any]):
+        """Publish a payout status event to each subscribed tenant whose entries it covers"""
+        if not self.webhooks:
+            return
+        by_tenant = {}
+        for l in entries:
+            by_tenant.setdefault(l.get("tenant_id"), []).append(l["ledger_id"])
+        for tenant_id, ledger_ids in by_tenant.items():
+            # Batched per subscription, so tenants sharing a receiver URL never share a batch
+            for subscription in self.db.get_webhook_subscriptions(tenant_id):
+                self.webhooks.publish(subscription["url"], subscription["secret"], {
+                    "event_id": f"evt_{uuid.uuid4().hex[:12]}",
+                    "type": event_type,
+                    "tenant_id": tenant_id,
+                    "user_id": user_id,
+                    "ledger_ids": ledger_ids,
+                    "occurred_at": datetime.utcnow().isoformat(),
+                    **data
+                }, subscription_id=subscription["subscription_id"])
+    
+    def create_run(self, chunk_size: int = 100, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Plan a run over every entry whose cool-off has expired"""
+        now = now or datetime.utcnow()
+        run_id = f"run_{uuid.uuid4().hex[:8]}"
+        
+        user_groups = {}
+        eligible = self.db.pop_eligible_ledger_entries(now)
+        for l in eligible:
+            l["payout_run_id"] = run_id  # Reserve so the next run cannot pick it up
+            user_groups.setdefault(l["user_id"], []).append(l["ledger_id"])
+        
+        users = list(user_groups.items())
+        chunks = [
+            {
+                "chunk_id": f"{run_id}_{i // chunk_size + 1}",
+                "index": i // chunk_size,
+                "status": "pending",  # pending/claimed/done/failed
+                "users": dict(users[i:i + chunk_size]),
+                "payout_ids": [],
+                "failed": [],
+                "claimed_by": None,
+                "claimed_at": None,
+                "finished_at": None
+            }
+            for i in range(0, len(users), chunk_size)
+        ]
+        
+        run_data = {
+            "run_id": run_id,
+            "status": "planned" if chunks else "completed",
+            "chunk_size": chunk_size,
+            "created_at": now.isoformat(),
+            "completed_at": None if chunks else now.isoformat(),
+            "entries_total": len(eligible),
+            "users_total": len(users),
+            "chunks_total": len(chunks),
+            "chunks_done": 0,
+            "paid_count": 0,
+            "paid_amount_paise": 0,
+            "users_paid": [],
+            "failed": [],
+            "chunks": chunks
+        }
+        if not chunks:
+            return run_data  # Nothing was due; not worth a record
+        log.info("payout_run.planned", run_id=run_id, entries=len(eligible), users=len(users), chunks=len(chunks))
+        return self.db.save_payout_run(run_data)
+    
+    def claim_chunk(self, run: Dict[str, Any], worker_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Claim the next pending or failed chunk, or one whose lease has expired"""
+        now = datetime.utcnow()
+        for chunk in run["chunks"]:
+            expired = (
+                chunk["status"] == "claimed"
+                and datetime.fromisoformat(chunk["claimed_at"]) + timedelta(seconds=self.CHUNK_LEASE_SECONDS) < now
+            )
+            if chunk["status"] in ("pending", "failed") or expired:
+                chunk["status"] = "claimed"
+                chunk["claimed_by"] = worker_id
+                chunk["claimed_at"] = now.isoformat()
+                chunk["lease_id"] = uuid.uuid4().hex  # Identifies this claim, even without a worker_id
+                run["status"] = "running"
+                self.db.save_payout_run(run)
+                return chunk
+        return None
+    
+    async def process_chunk(self, run: Dict[str, Any], chunk: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Issue the chunk's payouts, then checkpoint the run. A worker whose
+        lease expired and was re-claimed records its payouts but leaves the
+        checkpoint to the current lease holder.
+        """
+        lease_id = chunk.get("lease_id")
+        groups = []
+        for user_id, ledger_ids in chunk["users"].items():
+            # Entries paid by an earlier attempt at this chunk are skipped
+            entries = [self.db.get_ledger_entry(lid) for lid in ledger_ids]
+            entries = [l for l in entries if l and l["status"] == "queued"]
+            if entries:
+                groups.append((user_id, entries))
+        
+        try:
+            # The idempotency key is derived from the ledger IDs, so a resumed
+            # chunk never issues the same voucher twice
+            results = await self.dispatcher.dispatch([
+                {
+                    "method": "gift_card",
+                    "amount": Money.total(l["user_amount_paise"] for l in entries).rupees,
+                    "idempotency_key": "payout_" + hashlib.sha1(",".join(l["ledger_id"] for l in entries).encode()).hexdigest()
+                }
+                for _, entries in groups
+            ])
+        except Exception as e:
+            if chunk.get("lease_id") != lease_id:
+                return chunk
+            chunk["status"] = "failed"
+            chunk["error"] = str(e)
+            run["status"] = "failed"
+            self.db.save_payout_run(run)
+            log.error("payout_chunk.failed", run_id=run["run_id"], chunk_id=chunk["chunk_id"], error=str(e))
+            return chunk
+        
+        for (user_id, entries), result in zip(groups, results):
+            if result["status"] != "completed":
+                # Release the entries back to the index for the next run
+                for l in entries:
+                    l.pop("payout_run_id", None)
+                    self.db.index_payout_eligibility(l)
+                failure = {"user_id": user_id, "error": result["error"]}
+                chunk["failed"].append(failure)
+                run["failed"].append(failure)
+                payouts_total.inc("failed")
+                self.notify("payout.failed", user_id, entries, {
+                    "amount": result["amount"],
+                    "method": result["method"],
+                    "error": result["error"]
+                })
+                log.warning("payout.failed", run_id=run["run_id"], user_id=user_id, error=result["error"])
+                continue
+            # Another holder of this chunk may have recorded the same (idempotent) payout meanwhile
+            entries = [l for l in entries if l["status"] == "queued"]
+            if not entries:
+                continue
+            total = Money.total(l["user_amount_paise"] for l in entries)
+            voucher_code = result["reference_id"]
+            payout = self.db.create_payout({
+                "user_id": user_id,
+                "amount": total.rupees,
+                "amount_paise": total,
+                "method": "amazon_gv",
+                "voucher_code": voucher_code,
+                "ledger_ids": [l["ledger_id"] for l in entries],
+                "run_id": run["run_id"],
+                "chunk_id": chunk["chunk_id"]
+            })
+            # Mark ledger entries as paid, linked to their payout
+            for l in entries:
+                l["payout_id"] = payout["payout_id"]
+                self.db.update_ledger_status(l, "paid")
+            self.notify("payout.completed", user_id, entries, payout_status_data(payout))
+            chunk["payout_ids"].append(payout["payout_id"])
+            run["paid_count"] += 1
+            run["paid_amount_paise"] += total
+            payouts_total.inc("completed")
+            payout_amount_paise.inc(amount=int(total))
+            run["users_paid"].append(user_id)
+            log.info("payout.completed", run_id=run["run_id"], payout_id=payout["payout_id"], user_id=user_id,
+                     amount_paise=int(total))
+            # Simulate notification
+            log.info("sms.sent", user_id=user_id, template="payout_voucher", payout_id=payout["payout_id"])
+        
+        # Checkpoint, once per chunk and only by the current lease holder
+        if chunk.get("lease_id") != lease_id or chunk["status"] == "done":
+            log.warning("payout_chunk.lease_lost", run_id=run["run_id"], chunk_id=chunk["chunk_id"])
+            return chunk
+        chunk["status"] = "done"
+        chunk["finished_at"] = datetime.utcnow().isoformat()
+        run["chunks_done"] += 1
+        if run["chunks_done"] == run["chunks_total"]:
+            run["status"] = "completed"
+            run["completed_at"] = chunk["finished_at"]
+            log.info("payout_run.completed", run_id=run["run_id"], paid=run["paid_count"],
+                     failed=len(run["failed"]), amount_paise=int(run["paid_amount_paise"]))
+        self.db.save_payout_run(run)
+        return chunk
+    
+    async def process_run(self, run: Dict[str, Any], max_chunks: Optional[int] = None, worker_id: Optional[str] = None) -> Dict[str, Any]:
+        """Process chunks until none are left (or max_chunks were done)"""
+        processed = 0
+        while max_chunks is None or processed < max_chunks:
+            chunk = self.claim_chunk(run, worker_id)
+            if not chunk:
+                break
+            await self.process_chunk(run, chunk)
+            processed += 1
+            if chunk["status"] == "failed":
+                break
+        return run
+    
+    def summary(self, run: Dict[str, Any], include_chunks: bool = True) -> Dict[str, Any]:
+        """Run progress without the per-chunk user maps"""
+        data = {k: v for k, v in run.items() if k != "chunks"}
+        data["paid_amount"] = to_rupees(run["paid_amount_paise"])
+        if include_chunks:
+            data["chunks"] = [self.chunk_summary(c) for c in run["chunks"]]
+        return data
+    
+    def chunk_summary(self, chunk: Dict[str, Any]) -> Dict[str, Any]:
+        data = {k: v for k, v in chunk.items() if k != "users"}
+        data["users"] = len(chunk["users"])
+        return data
+
 # Initialize services
 catalogue_service = CatalogueService(db)
 campaign_builder = CampaignBuilderService(db)
+conversion_service = ConversionService(db)
+
+# Payout dispatch: per-provider rate limits and concurrency caps (AGCOD / UPI)
+payout_dispatcher = PayoutDispatcher()
+payout_dispatcher.register("gift_card", SimulatorPayoutProvider(payout_simulator, "gift_card"), rate_per_second=10, burst=20, max_concurrency=8)
+payout_dispatcher.register("upi", SimulatorPayoutProvider(payout_simulator, "upi"), rate_per_second=20, burst=40, max_concurrency=16)
+# Webhook URLs must be public https endpoints; WEBHOOK_ALLOW_PRIVATE_URLS=1 lifts
+# that for local development (http, localhost and private networks)
+WEBHOOK_ALLOW_PRIVATE_URLS = os.environ.get("WEBHOOK_ALLOW_PRIVATE_URLS", "0") == "1"
+webhook_dispatcher = WebhookDispatcher(allow_private=WEBHOOK_ALLOW_PRIVATE_URLS)
+payout_run_service = PayoutRunService(db, payout_dispatcher, webhook_dispatcher)
+split_service = SplitRecalculationService(db)
+
+def handle_conversion_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Conversion queue handler: idempotent on the job's delivery ID"""
+    return conversion_service.process(ConversionWebhookRequest(**job["payload"]), delivery_id=job["delivery_id"])
+
+# Postbacks are only acknowledged with 202 once journaled; set CONVERSION_QUEUE_JOURNAL=""
+# to disable the journal, which processes every postback inline instead
+conversion_queue = ConversionQueue(
+    handle_conversion_job,
+    journal_path=os.environ.get("CONVERSION_QUEUE_JOURNAL", "Data/conversion_queue.journal.jsonl") or None,
+    drain_timeout=float(os.environ.get("CONVERSION_QUEUE_DRAIN_SECONDS", "10")),
+    compact_after=int(os.environ.get("CONVERSION_QUEUE_COMPACT_AFTER", "10000"))
+)
+
+def hit_ratio(hits: int, misses: int) -> Optional[float]:
+    return round(hits / (hits + misses), 4) if hits + misses else None
+
+# Business metrics. Counts components already keep are read at scrape time,
+# so the click and redirect paths do no extra work for them.
+conversions_total = metrics.counter("conversions_total", "Conversion postbacks by result", ("result",))
+payouts_total = metrics.counter("payouts_total", "Payouts attempted in payout runs by status", ("status",))
+payout_amount_paise = metrics.counter("payout_amount_paise_total", "Amount paid out in payout runs, in paise")
+trackier_syncs = metrics.counter("trackier_syncs_total", "Trackier catalogue syncs by status", ("status",))
+trackier_sync_duration = metrics.histogram(
+    "trackier_sync_duration_seconds", "Trackier catalogue sync duration",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+)
+trackier_sync_offers = metrics.gauge("trackier_sync_offers_count", "Offers received in the last Trackier catalogue sync")
+metrics.counter("clicks_total", "Clicks by click filter verdict", ("result",), collect=lambda: {
+    ("tracked",): click_filter.stats_counters["accepted"],
+    ("duplicate",): click_filter.stats_counters["duplicate"],
+    ("filtered",): click_filter.stats_counters["rejected"]
+})
+metrics.counter("conversions_flagged_total", "Conversions flagged by fraud scoring", collect=lambda: conversion_scorer.counters["flagged"])
+metrics.gauge("queue_depth", "Items waiting in in-process queues", ("queue",), collect=lambda: {
+    ("conversions",): conversion_queue.depth,
+    ("webhook_events",): webhook_dispatcher.pending,
+    ("payout_eligible",): len(db.payout_heap)
+})
+metrics.gauge("store_size", "Rows held in the in-memory store", ("table",), collect=lambda: {
+    ("clicks",): len(db.clicks),
+    ("ledger",): len(db.ledger),
+    ("offers",): len(db.offers)
+})
+metrics.gauge("cache_hit_ratio", "Hit ratio of in-process caches since start", ("cache",), collect=lambda: {
+    ("jwt_claims",): hit_ratio(token_auth.counters["cache_hits"], token_auth.counters["verified"] + token_auth.counters["rejected"]),
+    ("api_keys",): hit_ratio(api_key_auth.counters["cache_hits"], api_key_auth.counters["lookups"])
+})
+metrics.counter("log_records_dropped_total", "Log records dropped because the log queue was full",
+                collect=lambda: log_pipeline.handler.dropped)
+metrics.counter("log_records_sampled_out_total", "Log records skipped by event sampling",
+                collect=lambda: log_pipeline.counters["sampled_out"])
+metrics.counter("slow_requests_total", "Requests slower than TRACE_SLOW_MS", collect=lambda: tracer.counters["slow"])
+metrics.counter("rate_limited_total", "Requests rejected by the rate limiter", ("scope",), collect=lambda: {
+    (scope,): count for scope, count in rate_limiter.limited_by_scope.items()
+})
+
+async def compact_ledger_periodically(interval_seconds: float, older_than_days: int):
+    """Compact closed ledger entries older than the retention window on a timer"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        db.compact_ledger(datetime.utcnow() - timedelta(days=older_than_days))
+
+ledger_compaction_task = None
+
+async def start_background_workers():
+    global ledger_compaction_task
+    await conversion_queue.start()
+    await webhook_dispatcher.start()
+    interval = os.environ.get("LEDGER_COMPACT_INTERVAL_SECONDS")
+    if interval:
+        older_than_days = int(os.environ.get("LEDGER_COMPACT_OLDER_THAN_DAYS", "90"))
+        ledger_compaction_task = asyncio.create_task(compact_ledger_periodically(float(interval), older_than_days))
+
+async def stop_background_workers():
+    await conversion_queue.stop()
+    await webhook_dispatcher.stop()
+    if ledger_compaction_task:
+        ledger_compaction_task.cancel()
 
 # Frontend Routes
 @app.get("/")
@@ -1080,49 +2537,46 @@ async def serve_api_docs():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
 
+def otp_http_error(error: OTPError) -> HTTPException:
+    headers = {"Retry-After": str(error.retry_after)} if error.retry_after else None
+    return HTTPException(status_code=error.status_code, detail=error.detail, headers=headers)
+
 @app.post("/v1/auth/otp/request", tags=["Authentication"])
-async def request_otp(request: OTPRequest):
+async def request_otp(request: OTPRequest, http_request: Request):
     """
     Step 3 from onboarding.flow.md: Verify Phone
     Call /otp/request; on success, /otp/verify
     """
     # Mock OTP generation (replace with real SMS service)
-    request_id = str(uuid.uuid4())
     mock_otp = "123456"  # In production, generate random OTP
     
-    # Store OTP request (mock storage)
-    db.otp_requests[request_id] = {
-        "phone": request.phone,
-        "otp": mock_otp,
-        "created_at": datetime.utcnow().isoformat(),
-        "verified": False
-    }
+    # Store OTP request (expires after otp_store.ttl_seconds)
+    try:
+        otp_data = await otp_store.create(
+            phone_key(request.phone), mock_otp, purpose="signup",
+            ip=http_request.client.host if http_request.client else None
+        )
+    except OTPError as e:
+        raise otp_http_error(e)
     
     # In production: Send SMS via provider (Twilio, etc.)
-    print(f"Mock SMS to {request.phone}: Your OTP is {mock_otp}")
+    log.info("otp.sent", purpose="signup", phone=mask_phone(request.phone), request_id=otp_data["request_id"])
     
-    return {"request_id": request_id, "message": "OTP sent successfully"}
+    return {"request_id": otp_data["request_id"], "message": "OTP sent successfully"}
 
 @app.post("/v1/auth/otp/verify", tags=["Authentication"])
 async def verify_otp(request: OTPVerifyRequest):
     """
     Step 3 continuation: Verify the OTP code
     """
-    # Check if request_id exists
-    if request.request_id not in db.otp_requests:
-        raise HTTPException(status_code=400, detail="Invalid request ID")
-    
-    otp_data = db.otp_requests[request.request_id]
-    
-    # Verify OTP code
-    if otp_data["otp"] != request.code:
-        raise HTTPException(status_code=400, detail="Invalid OTP code")
-    
-    # Mark as verified
-    otp_data["verified"] = True
+    # Verify OTP code (single use; limited attempts)
+    try:
+        otp_data = await otp_store.verify(request.request_id, request.code, purpose="signup")
+    except OTPError as e:
+        raise otp_http_error(e)
     
-    # Generate JWT token (mock implementation)
-    jwt_token = f"mock_jwt_{request.request_id}"
+    # Short-lived token proving the phone was verified; signup checks it against the phone
+    jwt_token = token_auth.issue(otp_data["phone"], role="phone_verified", ttl_seconds=1800)
     
     return {
         "jwt": jwt_token,
@@ -1132,15 +2586,13 @@ async def verify_otp(request: OTPVerifyRequest):
 
 # Creator Authentication Endpoints
 @app.post("/v1/auth/creator/login", tags=["Authentication"])
-async def creator_login(request: CreatorLoginRequest):
+async def creator_login(request: CreatorLoginRequest, http_request: Request):
     """
     Creator login: Request OTP for existing creator
     """
     # Check if creator exists
-    creator = next(
-        (t for t in db.tenants if t.get("phone") == request.phone), 
-        None
-    )
+    phone = phone_key(request.phone)
+    creator = db.find_tenant_by_phone(phone)
     if not creator:
         raise HTTPException(
             status_code=404, 
@@ -1148,50 +2600,39 @@ async def creator_login(request: CreatorLoginRequest):
         )
     
     # Generate OTP request
-    request_id = str(uuid.uuid4())
     mock_otp = "123456"  # In production, generate random OTP
     
     # Store OTP request with creator context
-    db.otp_requests[request_id] = {
-        "phone": request.phone,
-        "otp": mock_otp,
-        "created_at": datetime.utcnow().isoformat(),
-        "verified": False,
-        "role": "creator",
-        "tenant_id": creator["tenant_id"]
-    }
+    try:
+        otp_data = await otp_store.create(
+            phone, mock_otp, purpose="creator_login",
+            ip=http_request.client.host if http_request.client else None,
+            tenant_id=creator["tenant_id"]
+        )
+    except OTPError as e:
+        raise otp_http_error(e)
     
     # In production: Send SMS via provider
-    print(f"📱 Creator login OTP to {request.phone}: {mock_otp}")
+    log.info("otp.sent", purpose="creator_login", phone=mask_phone(request.phone), request_id=otp_data["request_id"])
     
-    return {"request_id": request_id, "message": "OTP sent successfully"}
+    return {"request_id": otp_data["request_id"], "message": "OTP sent successfully"}
 
 @app.post("/v1/auth/creator/verify", tags=["Authentication"])
 async def creator_login_verify(request: CreatorLoginVerifyRequest):
     """
     Creator login: Verify OTP and return JWT with creator role
     """
-    # Check if request_id exists
-    if request.request_id not in db.otp_requests:
-        raise HTTPException(status_code=400, detail="Invalid request ID")
-    
-    otp_data = db.otp_requests[request.request_id]
-    
-    # Verify OTP code
-    if otp_data["otp"] != request.code:
-        raise HTTPException(status_code=400, detail="Invalid OTP code")
-    
-    # Mark as verified
-    otp_data["verified"] = True
+    # Verify OTP code (single use; limited attempts)
+    try:
+        otp_data = await otp_store.verify(request.request_id, request.code, purpose="creator_login")
+    except OTPError as e:
+        raise otp_http_error(e)
     
-    # Generate JWT token with creator role
-    jwt_token = f"mock_jwt_creator_{request.request_id}"
+    # Get creator details (the login request recorded which tenant it is for)
+    creator = db.get_tenant(otp_data["tenant_id"])
     
-    # Get creator details
-    creator = next(
-        (t for t in db.tenants if t.get("phone") == otp_data["phone"]), 
-        None
-    )
+    # Signed JWT with creator role and tenant
+    jwt_token = token_auth.issue(otp_data["phone"], role="creator", tenant_id=creator["tenant_id"])
     
     return {
         "jwt": jwt_token,
@@ -1202,8 +2643,27 @@ async def creator_login_verify(request: CreatorLoginVerifyRequest):
         "message": "Creator login successful"
     }
 
+# Signup takes the phone_verified token from /v1/auth/otp/verify as a Bearer token;
+# it is checked whenever sent and required with SIGNUP_PHONE_VERIFICATION_REQUIRED=1
+SIGNUP_PHONE_VERIFICATION_REQUIRED = os.environ.get("SIGNUP_PHONE_VERIFICATION_REQUIRED", "0") == "1"
+
+def verify_signup_phone(authorization: Optional[str], phone: str):
+    """Reject a signup whose phone_verified token is missing (when required), invalid or for another phone"""
+    if not authorization:
+        if SIGNUP_PHONE_VERIFICATION_REQUIRED:
+            raise HTTPException(status_code=401, detail="Phone verification required")
+        return
+    if not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Invalid authorization header")
+    try:
+        claims = token_auth.verify(authorization[len("Bearer "):])
+    except AuthError:
+        raise HTTPException(status_code=401, detail="Invalid JWT token")
+    if claims.get("role") != "phone_verified" or claims.get("sub") != phone:
+        raise HTTPException(status_code=403, detail="Phone verification does not match this phone number")
+
 @app.post("/v1/creators/signup", response_model=TenantResponse, tags=["Creator APIs"])
-async def creator_signup(signup_data: CreatorSignupRequest):
+async def creator_signup(signup_data: CreatorSignupRequest, authorization: Optional[str] = Header(None)):
     """
     Steps 4-6 from onboarding.flow.md:
     - Create Tenant → return tenant_id
@@ -1211,41 +2671,42 @@ async def creator_signup(signup_data: CreatorSignupRequest):
     - Pick Default Share % → Store on tenant
     """
     
-    # Check for duplicate phone (Scenario: Duplicate phone test)
-    existing_tenant = next(
-        (t for t in db.tenants if t.get("phone") == signup_data.phone), 
-        None
-    )
-    if existing_tenant:
-        raise HTTPException(
-            status_code=400, 
-            detail="Account already exists with this phone number"
-        )
+    phone = phone_key(signup_data.phone)
+    verify_signup_phone(authorization, phone)
     
     # Generate new tenant
     tenant_id = f"tnt_{uuid.uuid4().hex[:8]}"
     trackier_pid = str(len(db.tenants) + 10000)  # Auto-increment from 10000
-    api_key = f"pk_live_{uuid.uuid4().hex}"
     
     # Create tenant record
     tenant_data = {
         "tenant_id": tenant_id,
         "name": signup_data.name,
-        "email": signup_data.email,
-        "phone": signup_data.phone,
+        "email": normalize_email(signup_data.email),
+        "phone": phone,
         "brand_name": signup_data.brand_name or signup_data.name,
         "trackier_pid": trackier_pid,
         "default_share_pct": 40.0,  # Default from business rules
-        "api_key": api_key,
         "created_at": datetime.utcnow().isoformat(),
         "status": "active"
     }
     
-    # Save to mock database
-    saved_tenant = db.save_tenant(tenant_data)
+    # Save to mock database; the unique phone/email indexes reject duplicates
+    # (Scenario: Duplicate phone test)
+    try:
+        db.save_tenant(tenant_data)
+    except DuplicateTenantError as e:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Account already exists with this {'phone number' if e.field == 'phone' else 'email'}"
+        )
+    
+    # API key is returned once; only its digest is kept
+    api_key = generate_api_key()
+    db.register_api_key(tenant_id, api_key)
     
     # Emit event: creator.onboarded (mock Slack webhook)
-    print(f"🚀 New Creator Onboarded: {signup_data.name} (tenant_id: {tenant_id})")
+    log.info("creator.onboarded", tenant_id=tenant_id, name=signup_data.name)
     
     # Return success response
     return TenantResponse(
@@ -1258,18 +2719,22 @@ async def creator_signup(signup_data: CreatorSignupRequest):
 
 # NEW BLOCK 2 ENDPOINTS
 
-@app.get("/v1/offers", response_model=List[OfferResponse], tags=["Admin APIs"])
+@app.get("/v1/offers", response_model=List[OfferResponse], response_class=FastJSONResponse, tags=["Admin APIs"])
 async def get_offers(
     tenant_id: Optional[str] = None,
     brand_id: Optional[str] = None,
     category: Optional[str] = None,
     q: Optional[str] = None,
     min_commission: Optional[float] = None,
-    limit: int = 50
+    limit: int = 50,
+    partner: Optional[Dict[str, Any]] = Depends(get_api_key_partner)
 ):
     """
-    Get available offers for campaign creation with enhanced filtering for API-only partners
+    Get available offers for campaign creation with enhanced filtering for API-only partners.
+    Requests with an X-API-Key are scoped to the key's tenant and metered.
     """
+    if partner:
+        tenant_id = partner["tenant_id"]
     offers = db.get_offers(tenant_id=tenant_id, category=category, active_only=True)
     
     # Apply additional filters
@@ -1304,7 +2769,8 @@ async def get_offers(
         for offer in offers
     ]
     
-    return response_offers
+    # Models were validated above, skip FastAPI's response_model pass
+    return FastJSONResponse(response_offers)
 
 @app.post("/v1/sync/offers", response_model=SyncResponse, tags=["Trackier Integration"])
 async def sync_offers_manual(background_tasks: BackgroundTasks):
@@ -1312,21 +2778,16 @@ async def sync_offers_manual(background_tasks: BackgroundTasks):
     Manual trigger for Trackier catalogue sync
     Based on catalogue-sync.flow.md
     """
-    print("🔄 Manual catalogue sync triggered")
-    
     # Run sync
     result = await catalogue_service.sync_campaigns()
     
-    # Log results
-    print(f"📊 Sync Results: {result['added']} added, {result['updated']} updated, {result['deactivated']} deactivated")
-    
     return SyncResponse(
         status=result['status'],
         offers_processed=result['campaigns_processed'],
         added=result['added'],
         updated=result['updated'],
         deactivated=result['deactivated'],
-        duration_seconds=0
+        duration_seconds=result['duration_seconds']
     )
 
 @app.post("/v1/sync/advertisers", tags=["Trackier Integration"])
@@ -1417,15 +2878,13 @@ async def create_campaign(request: CampaignCreateRequest):
     Create new campaign
     Endpoint #4 from technical specifications
     """
-    print(f"🎯 Creating campaign '{request.name}' for tenant {request.tenant_id}")
-    
     campaign = campaign_builder.create_campaign(
         tenant_id=request.tenant_id,
         name=request.name,
         share_pct=request.share_pct
     )
     
-    print(f"✅ Campaign created: {campaign.campaign_id}")
+    log.info("campaign.created", campaign_id=campaign.campaign_id, tenant_id=request.tenant_id, name=request.name)
     return campaign
 
 @app.post("/v1/links", response_model=LinkResponse, tags=["Admin APIs"])
@@ -1434,14 +2893,12 @@ async def create_smart_link(request: LinkCreateRequest):
     Generate smart link for campaign + offer
     Endpoint #5 from technical specifications
     """
-    print(f"🔗 Generating smart link for campaign {request.campaign_id} + offer {request.offer_id}")
-    
     link = campaign_builder.generate_smart_link(
         campaign_id=request.campaign_id,
         offer_id=request.offer_id
     )
     
-    print(f"✅ Smart link generated: {link.smart_link}")
+    log.info("smart_link.created", link_id=link.link_id, campaign_id=request.campaign_id, offer_id=request.offer_id)
     return link
 
 @app.get("/v1/analytics/creator", response_model=AnalyticsResponse, tags=["Analytics"])
@@ -1453,8 +2910,6 @@ async def get_creator_analytics(
     Get creator analytics dashboard
     Endpoint #6 from technical specifications
     """
-    print(f"📊 Fetching analytics for tenant {tenant_id} (period: {period})")
-    
     analytics = campaign_builder.get_tenant_analytics(tenant_id, period)
     
     return analytics
@@ -1484,18 +2939,13 @@ async def get_creator_stats(tenant_id: str = Depends(get_creator_tenant_id), ran
                 for camp in db.campaigns if camp["campaign_id"] == l["campaign_id"])
     ])
     
-    # Calculate pending payout
-    pending_payout = sum([
-        l["user_amount"] for l in db.ledger 
-        if l["status"] in ["queued", "confirmed"]
-        and any(camp["tenant_id"] == tenant_id 
-                for camp in db.campaigns if camp["campaign_id"] == l["campaign_id"])
-    ])
+    # Pending payout is maintained on the tenant's balance row
+    pending_payout = db.get_balance("tenant", tenant_id)["pending_payout_paise"]
     
     return CreatorStatsResponse(
         clicks_today=today_clicks,
         conversions_today=today_conversions,
-        pending_payout=pending_payout,
+        pending_payout=to_rupees(pending_payout),
         period=range
     )
 
@@ -1553,13 +3003,107 @@ async def get_creator_payouts(tenant_id: str = Depends(get_creator_tenant_id), s
     
     return creator_payouts
 
+def balance_response(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a balance row's paise totals to rupees for display"""
+    return {
+        "owner_type": row["owner_type"],
+        "owner_id": row["owner_id"],
+        "balance": to_rupees(row["balance_paise"]),
+        "pending_payout": to_rupees(row["pending_payout_paise"]),
+        "by_status": {
+            status: {
+                "count": totals["count"],
+                "user_amount": to_rupees(totals["user_amount_paise"]),
+                "creator_amount": to_rupees(totals["creator_amount_paise"])
+            }
+            for status, totals in row["by_status"].items()
+        },
+        "version": row["version"],
+        "updated_at": row["updated_at"]
+    }
+
+@app.post("/v1/creator/splits/what_if", tags=["Creator APIs"])
+async def what_if_splits(request: SplitRecalculationRequest, tenant_id: str = Depends(get_creator_tenant_id)):
+    """Preview how open ledger entries would split under a different share or commission"""
+    return split_service.recalculate(request, tenant_id=tenant_id)
+
+@app.post("/v1/creator/splits/recalculate", tags=["Creator APIs"])
+async def recalculate_splits(request: SplitRecalculationRequest, tenant_id: str = Depends(get_creator_tenant_id)):
+    """Change a campaign's share_pct and re-derive its open ledger entries"""
+    if not request.campaign_id or request.share_pct is None or request.base_commission_pct is not None:
+        raise HTTPException(status_code=400, detail="Creators can only change a campaign's share_pct")
+    return split_service.recalculate(request, tenant_id=tenant_id, apply=True)
+
+@app.post("/v1/admin/splits/recalculate", tags=["Admin APIs"])
+async def admin_recalculate_splits(request: SplitRecalculationRequest):
+    """Apply a revised offer commission or campaign share to open ledger entries"""
+    if request.share_pct is not None and not request.campaign_id:
+        raise HTTPException(status_code=400, detail="share_pct changes need a campaign_id")
+    if request.base_commission_pct is not None and not request.offer_id:
+        raise HTTPException(status_code=400, detail="base_commission_pct changes need an offer_id")
+    return split_service.recalculate(request, apply=True)
+
+@app.post("/v1/creator/webhooks", tags=["Creator APIs"])
+async def create_webhook_subscription(request: WebhookSubscriptionRequest, tenant_id: str = Depends(get_creator_tenant_id)):
+    """Subscribe an endpoint to payout status events; the signing secret is only returned here"""
+    try:
+        await check_destination(request.url, allow_private=WEBHOOK_ALLOW_PRIVATE_URLS)
+    except DestinationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    subscription = db.create_webhook_subscription({
+        "tenant_id": tenant_id,
+        "url": request.url,
+        "secret": f"whsec_{secrets.token_hex(16)}",
+        "events": ["payout.completed", "payout.failed"]
+    })
+    return subscription
+
+@app.get("/v1/creator/webhooks", tags=["Creator APIs"])
+async def list_webhook_subscriptions(tenant_id: str = Depends(get_creator_tenant_id)):
+    """List the creator's webhook subscriptions (without secrets)"""
+    subscriptions = [{k: v for k, v in s.items() if k != "secret"} for s in db.get_webhook_subscriptions(tenant_id)]
+    return {"subscriptions": subscriptions, "count": len(subscriptions)}
+
+def api_key_summary(record: Dict[str, Any]) -> Dict[str, Any]:
+    summary = {k: v for k, v in record.items() if k != "key_hash"}
+    summary["usage"] = api_key_auth.key_usage(record["key_id"])
+    return summary
+
+@app.post("/v1/creator/api_keys", tags=["Creator APIs"])
+async def create_api_key(tenant_id: str = Depends(get_creator_tenant_id)):
+    """Issue an additional partner API key; the key itself is only returned here"""
+    api_key = generate_api_key()
+    record = db.register_api_key(tenant_id, api_key)
+    return {**api_key_summary(record), "api_key": api_key}
+
+@app.get("/v1/creator/api_keys", tags=["Creator APIs"])
+async def list_api_keys(tenant_id: str = Depends(get_creator_tenant_id)):
+    """The creator's API keys (prefix only) with usage counters"""
+    keys = [api_key_summary(k) for k in db.get_tenant_api_keys(tenant_id)]
+    return {"api_keys": keys, "count": len(keys)}
+
+@app.delete("/v1/creator/api_keys/{key_id}", tags=["Creator APIs"])
+async def revoke_api_key(key_id: str, tenant_id: str = Depends(get_creator_tenant_id)):
+    """Revoke one of the creator's API keys"""
+    record = db.api_keys_by_id.get(key_id)
+    if not record or record["tenant_id"] != tenant_id:
+        raise HTTPException(status_code=404, detail="API key not found")
+    db.revoke_api_key(key_id)
+    api_key_auth.revoke(key_id)
+    return api_key_summary(record)
+
+@app.get("/v1/creator/balance", tags=["Creator APIs"])
+async def get_creator_balance(tenant_id: str = Depends(get_creator_tenant_id)):
+    """Creator's running balance and pending payout (single-row read)"""
+    return balance_response(db.get_balance("tenant", tenant_id))
+
 @app.get("/v1/creator/profile", tags=["Creator APIs"])
 async def get_creator_profile(tenant_id: str = Depends(get_creator_tenant_id)):
     """
     Get creator profile information
     """
     # Find creator
-    creator = next((t for t in db.tenants if t["tenant_id"] == tenant_id), None)
+    creator = db.get_tenant(tenant_id)
     if not creator:
         raise HTTPException(status_code=404, detail="Creator not found")
     
@@ -1577,23 +3121,28 @@ async def update_creator_profile(request: CreatorProfileUpdateRequest, tenant_id
     Update creator profile settings
     """
     # Find creator
-    creator = next((t for t in db.tenants if t["tenant_id"] == tenant_id), None)
+    creator = db.get_tenant(tenant_id)
     if not creator:
         raise HTTPException(status_code=404, detail="Creator not found")
     
     # Update fields
     if request.display_name:
         creator["name"] = request.display_name
-    if request.phone:
-        creator["phone"] = request.phone
-    if request.email:
-        creator["email"] = request.email
+    if request.phone or request.email:
+        try:
+            db.update_tenant_contact(
+                creator,
+                phone=phone_key(request.phone) if request.phone else None,
+                email=normalize_email(request.email) if request.email else None
+            )
+        except DuplicateTenantError as e:
+            raise HTTPException(status_code=400, detail=f"Another account already uses this {e.field}")
     if request.theme_hex:
         creator["theme_hex"] = request.theme_hex
     
     return {"message": "Profile updated successfully", "creator": creator}
 
-@app.get("/v1/campaigns", tags=["Admin APIs"])
+@app.get("/v1/campaigns", response_class=FastJSONResponse, tags=["Admin APIs"])
 async def list_campaigns(tenant_id: Optional[str] = None):
     """Debug endpoint to list campaigns"""
     if tenant_id:
@@ -1601,9 +3150,9 @@ async def list_campaigns(tenant_id: Optional[str] = None):
     else:
         campaigns = db.campaigns
     
-    return {"campaigns": campaigns, "count": len(campaigns)}
+    return FastJSONResponse({"campaigns": campaigns, "count": len(campaigns)})
 
-@app.get("/v1/links", tags=["Admin APIs"])
+@app.get("/v1/links", response_class=FastJSONResponse, tags=["Admin APIs"])
 async def list_links(tenant_id: Optional[str] = None):
     """Debug endpoint to list smart links"""
     if tenant_id:
@@ -1611,7 +3160,7 @@ async def list_links(tenant_id: Optional[str] = None):
     else:
         links = db.links
     
-    return {"links": links, "count": len(links)}
+    return FastJSONResponse({"links": links, "count": len(links)})
 
 # Existing debug endpoints
 @app.get("/v1/tenants", tags=["Admin APIs"])
@@ -1622,7 +3171,7 @@ async def list_tenants():
 @app.get("/v1/tenants/{tenant_id}", tags=["Admin APIs"])
 async def get_tenant(tenant_id: str):
     """Get specific tenant details"""
-    tenant = next((t for t in db.tenants if t["tenant_id"] == tenant_id), None)
+    tenant = db.get_tenant(tenant_id)
     if not tenant:
         raise HTTPException(status_code=404, detail="Tenant not found")
     return tenant
@@ -1635,8 +3184,6 @@ async def handle_smart_link(slug: str):
     Handle smart link clicks - serves end-user landing page
     This is the entry point for users clicking creator's shared links
     """
-    print(f"🔗 Smart link accessed: {slug}")
-    
     # Find the link by slug
     link = db.get_link_by_slug(slug)
     if not link:
@@ -1644,7 +3191,7 @@ async def handle_smart_link(slug: str):
     
     # Get campaign and offer details for display
     campaign = db.get_campaign(link["campaign_id"])
-    offer = next((o for o in db.offers if o["offer_id"] == link["offer_id"]), None)
+    offer = db.get_offer(link["offer_id"])
     
     if not campaign or not offer:
         raise HTTPException(status_code=404, detail="Campaign or offer not found")
@@ -1652,7 +3199,7 @@ async def handle_smart_link(slug: str):
     # Calculate potential cashback
     potential_cashback = offer["base_commission_pct"] * (campaign["share_pct"] / 100)
     
-    print(f"📄 Serving landing page for {offer['brand']} (potential cashback: {potential_cashback}%)")
+    log.info("landing.served", slug=slug, link_id=link["link_id"], offer_id=offer["offer_id"], potential_cashback_pct=potential_cashback)
     
     # Serve the end-user landing page HTML
     return FileResponse('static/landing.html')
@@ -1663,23 +3210,48 @@ async def track_click(request: ClickTrackingRequest):
     Track user clicks for analytics
     Endpoint #7 from technical specifications
     """
-    print(f"📊 Tracking click for link {request.link_id}")
-    
     # Verify link exists
-    link = next((l for l in db.links if l["link_id"] == request.link_id), None)
+    link = db.get_link(request.link_id)
     if not link:
         raise HTTPException(status_code=404, detail="Link not found")
     
+    # Fraud filter: bots, velocity and repeats never become clicks
+    verdict = click_filter.check(request.link_id, request.user_id, request.ip_address, request.user_agent)
+    if verdict["action"] == "duplicate":
+        original = db.get_click(verdict["click_id"])
+        return ClickTrackingResponse(
+            click_id=original["click_id"],
+            link_id=original["link_id"],
+            user_id=original.get("user_id"),
+            timestamp=original["timestamp"],
+            status="duplicate"
+        )
+    if verdict["action"] == "reject":
+        log.info("click.filtered", link_id=request.link_id, reason=verdict["reason"], ip=request.ip_address)
+        return ClickTrackingResponse(
+            click_id=None,
+            link_id=request.link_id,
+            user_id=request.user_id,
+            timestamp=datetime.utcnow().isoformat(),
+            status="filtered",
+            reason=verdict["reason"]
+        )
+    
     # Create click record
     click_data = {
         "link_id": request.link_id,
         "user_id": request.user_id,
         "timestamp": datetime.utcnow().isoformat()
     }
+    if request.ip_address:
+        click_data["ip_address"] = request.ip_address
+    if request.user_agent:
+        click_data["user_agent"] = request.user_agent
     
     click = db.create_click(click_data)
+    click_filter.accepted(verdict, click["click_id"])
     
-    print(f"✅ Click tracked: {click['click_id']}")
+    log.info("click.tracked", click_id=click["click_id"], link_id=click["link_id"], user_id=click.get("user_id"))
     
     return ClickTrackingResponse(
         click_id=click["click_id"],
@@ -1688,65 +3260,160 @@ async def track_click(request: ClickTrackingRequest):
         timestamp=click["timestamp"]
     )
 
+MAX_CLICK_BATCH = 10000
+MAX_CONVERSION_BATCH = 5000
+
+def parse_batch_body(body: bytes, content_type: str) -> List[Any]:
+    """Split a batch request body into raw items: NDJSON lines or a JSON array"""
+    if "ndjson" in content_type:
+        items = []
+        for line in body.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(None)  # Reported as a per-item rejection
+        return items
+    
+    try:
+        items = json.loads(body or b"[]")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    return items
+
+@app.post("/v1/events/clicks:batch", response_model=ClickBatchResponse, tags=["Events & Webhooks"])
+async def track_clicks_batch(request: Request):
+    """
+    Bulk click ingestion for the edge tier.
+    Accepts a JSON array or NDJSON (Content-Type: application/x-ndjson) of
+    clicks, validates link IDs against the link index and inserts all valid
+    clicks in one step. Returns a result per item, in input order.
+    """
+    items = parse_batch_body(await request.body(), request.headers.get("content-type", ""))
+    if len(items) > MAX_CLICK_BATCH:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_CLICK_BATCH} clicks")
+    
+    now = datetime.utcnow().isoformat()
+    results = []
+    valid = []
+    pending = {}  # dedupe key -> (result, click time), for repeats within this batch
+    duplicates = []
+    filtered = 0
+    for index, raw in enumerate(items):
+        try:
+            item = ClickBatchItem.model_validate(raw)
+        except ValidationError:
+            results.append(ClickBatchResult(index=index, status="rejected", error="Invalid click payload"))
+            continue
+        if item.link_id not in db.links_by_id:
+            results.append(ClickBatchResult(index=index, status="rejected", error="Link not found"))
+            continue
+        
+        timestamp = now
+        clicked_at = None
+        if item.timestamp:
+            ts = item.timestamp
+            if ts.tzinfo:
+                ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+            timestamp = ts.isoformat()
+            clicked_at = ts.replace(tzinfo=timezone.utc).timestamp()
+        
+        # Backfilled clicks are checked at their own time, not at arrival
+        verdict = click_filter.check(item.link_id, item.user_id, item.ip_address, item.user_agent, at=clicked_at)
+        if verdict["action"] == "reject":
+            filtered += 1
+            results.append(ClickBatchResult(index=index, status="filtered", error=verdict["reason"]))
+            continue
+        if verdict["action"] == "duplicate":
+            results.append(ClickBatchResult(index=index, status="duplicate", click_id=verdict["click_id"]))
+            continue
+        earlier = pending.get(verdict["dedupe_key"])
+        if earlier is not None and abs(verdict["seen_at"] - earlier[1]) < click_filter.dedupe_window:
+            result = ClickBatchResult(index=index, status="duplicate")
+            duplicates.append((result, earlier[0]))
+            results.append(result)
+            continue
+        
+        result = ClickBatchResult(index=index, status="created")
+        results.append(result)
+        if verdict["dedupe_key"] is not None:
+            pending[verdict["dedupe_key"]] = (result, verdict["seen_at"])
+        click_data = {"link_id": item.link_id, "user_id": item.user_id, "timestamp": timestamp}
+        if item.ip_address:
+            click_data["ip_address"] = item.ip_address
+        if item.user_agent:
+            click_data["user_agent"] = item.user_agent
+        valid.append((result, verdict, click_data))
+    
+    clicks = db.create_clicks([click_data for _, _, click_data in valid])
+    for (result, verdict, _), click in zip(valid, clicks):
+        result.click_id = click["click_id"]
+        click_filter.accepted(verdict, click["click_id"])
+    for result, original in duplicates:
+        result.click_id = original.click_id
+    
+    duplicate_count = sum(1 for r in results if r.status == "duplicate")
+    rejected = len(items) - len(clicks) - duplicate_count
+    log.info("click_batch.ingested", received=len(items), created=len(clicks), duplicates=duplicate_count,
+             filtered=filtered, rejected=rejected)
+    
+    return ClickBatchResponse(
+        received=len(items),
+        created=len(clicks),
+        rejected=rejected,
+        duplicates=duplicate_count,
+        filtered=filtered,
+        results=results
+    )
+
 @app.post("/v1/auth/enduser/otp/request", tags=["End-User APIs"])
-async def request_enduser_otp(request: EndUserOTPRequest):
+async def request_enduser_otp(request: EndUserOTPRequest, http_request: Request):
     """
     Request OTP for end-user verification (specific to a link)
     """
-    print(f"📱 End-user OTP requested for {request.phone} (link: {request.link_id})")
-    
     # Verify link exists
-    link = next((l for l in db.links if l["link_id"] == request.link_id), None)
+    link = db.get_link(request.link_id)
     if not link:
         raise HTTPException(status_code=404, detail="Link not found")
     
-    # Generate request ID
-    request_id = f"req_{uuid.uuid4().hex[:8]}"
-    
     # Store OTP request (in real app, would send SMS)
-    db.otp_requests[request_id] = {
-        "phone": request.phone,
-        "link_id": request.link_id,
-        "code": "123456",  # Mock OTP
-        "expires_at": datetime.utcnow() + timedelta(minutes=5),
-        "verified": False
-    }
+    try:
+        otp_data = await otp_store.create(
+            phone_key(request.phone), "123456", purpose="enduser",  # Mock OTP
+            ip=http_request.client.host if http_request.client else None,
+            request_id=f"req_{uuid.uuid4().hex[:8]}",
+            link_id=request.link_id
+        )
+    except OTPError as e:
+        raise otp_http_error(e)
     
-    print(f"📨 Mock OTP sent: 123456 (request_id: {request_id})")
+    log.info("otp.sent", purpose="enduser", phone=mask_phone(request.phone), link_id=request.link_id,
+             request_id=otp_data["request_id"])
     
-    return {"request_id": request_id, "message": "OTP sent successfully"}
+    return {"request_id": otp_data["request_id"], "message": "OTP sent successfully"}
 
 @app.post("/v1/auth/enduser/otp/verify", tags=["End-User APIs"])
 async def verify_enduser_otp(request: EndUserOTPVerifyRequest):
     """
     Verify OTP for end-user and return redirect info
     """
-    print(f"🔐 Verifying end-user OTP for request {request.request_id}")
-    
-    # Check OTP request exists
-    otp_data = db.otp_requests.get(request.request_id)
-    if not otp_data:
-        raise HTTPException(status_code=400, detail="Invalid request ID")
-    
-    # Check expiry
-    if datetime.utcnow() > otp_data["expires_at"]:
-        raise HTTPException(status_code=400, detail="OTP expired")
-    
-    # Verify code
-    if otp_data["code"] != request.code:
-        raise HTTPException(status_code=400, detail="Invalid OTP")
-    
-    # Mark as verified
-    otp_data["verified"] = True
+    # Verify code (expired requests have already been evicted)
+    try:
+        await otp_store.verify(request.request_id, request.code, purpose="enduser")
+    except OTPError as e:
+        raise otp_http_error(e)
     
     # Get link and offer details for redirect
-    link = next((l for l in db.links if l["link_id"] == request.link_id), None)
-    offer = next((o for o in db.offers if o["offer_id"] == link["offer_id"]), None)
+    link = db.get_link(request.link_id)
+    offer = db.get_offer(link["offer_id"])
     
     # Mock merchant redirect URL (in real app, would be trackable URL)
     merchant_url = f"https://dl.flipkart.com/dl/home-decor?utm_source=hissaback&click_id={uuid.uuid4().hex[:8]}"
     
-    print(f"✅ OTP verified! Redirecting to: {merchant_url}")
+    log.info("otp.verified", purpose="enduser", request_id=request.request_id, redirect_url=merchant_url)
     
     return {
         "verified": True,
@@ -1755,104 +3422,206 @@ async def verify_enduser_otp(request: EndUserOTPVerifyRequest):
     }
 
 @app.post("/v1/events/conversion", tags=["Events & Webhooks"])
-async def process_conversion(request: ConversionWebhookRequest):
+async def process_conversion(request: ConversionWebhookRequest, response: Response, x_webhook_delivery_id: Optional[str] = Header(None)):
     """
-    Trackier webhook: process conversion, calculate split, create ledger entry
+    Trackier webhook: process conversion, calculate split, create ledger entry.
+    Returns 202 with a job_id once queued; when the worker pool is not
+    running the conversion is processed inline and the ledger_id returned.
     """
-    print(f"🎯 Processing conversion for click {request.click_id}, order {request.order_id}")
-    # Find click
-    click = next((c for c in db.clicks if c["click_id"] == request.click_id), None)
-    if not click:
-        raise HTTPException(status_code=404, detail="Click not found")
-    # Find link
-    link = next((l for l in db.links if l["link_id"] == click["link_id"]), None)
-    if not link:
-        raise HTTPException(status_code=404, detail="Link not found")
-    # Find campaign
-    campaign = db.get_campaign(link["campaign_id"])
-    if not campaign:
-        raise HTTPException(status_code=404, detail="Campaign not found")
-    # Find offer
-    offer = next((o for o in db.offers if o["offer_id"] == request.offer_id), None)
-    if not offer:
-        raise HTTPException(status_code=404, detail="Offer not found")
-    # Calculate commission split
-    base_commission = offer["base_commission_pct"] * request.sale_amount / 100.0
-    user_pct = 100.0 - campaign["share_pct"]
-    user_amount = base_commission * (user_pct / 100.0)
-    creator_amount = base_commission - user_amount
-    # Cool-off period
-    cool_off_days = offer.get("cool_off_days", 30)
-    cool_off_until = (datetime.utcnow() + timedelta(days=cool_off_days)).isoformat()
-    # Create ledger entry
-    ledger_data = {
-        "conv_id": f"conv_{uuid.uuid4().hex[:8]}",
-        "click_id": click["click_id"],
-        "link_id": link["link_id"],
-        "campaign_id": campaign["campaign_id"],
-        "offer_id": offer["offer_id"],
-        "user_id": click.get("user_id", "anonymous"),
-        "order_id": request.order_id,
-        "sale_amount": request.sale_amount,
-        "base_commission": base_commission,
-        "user_pct": user_pct,
-        "user_amount": user_amount,
-        "creator_amount": creator_amount,
-        "status": "queued" if request.status == "approved" else request.status,
-        "cool_off_until": cool_off_until
+    job = await conversion_queue.submit(request.model_dump(), delivery_id=x_webhook_delivery_id or request.delivery_id)
+    if job["status"] == "queued":
+        response.status_code = 202
+        return {"status": "accepted", "job_id": job["job_id"], "queue_depth": conversion_queue.depth}
+    
+    result = job["result"]
+    return {"status": "ok", "ledger_id": result["ledger_id"], "duplicate": result["status"] != "ok"}
+
+@app.post("/v1/events/conversions:batch", response_model=ConversionBatchResponse, tags=["Events & Webhooks"])
+async def process_conversions_batch(request: Request):
+    """
+    Bulk conversion postback ingestion.
+    Accepts a JSON array or NDJSON of conversions and submits each one to the
+    conversion queue, like /v1/events/conversion: items come back "queued"
+    with a job_id when the worker pool is running, and processed otherwise.
+    Each item is deduplicated on its delivery_id and on (offer_id, order_id),
+    so replaying a batch has no further ledger effect. An item that fails is
+    reported in its own result without affecting the others. Returns a result
+    per item, in input order.
+    """
+    items = parse_batch_body(await request.body(), request.headers.get("content-type", ""))
+    if len(items) > MAX_CONVERSION_BATCH:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_CONVERSION_BATCH} conversions")
+    
+    async def submit(index: int, raw: Any) -> ConversionBatchResult:
+        try:
+            conversion = ConversionWebhookRequest.model_validate(raw)
+        except ValidationError:
+            return ConversionBatchResult(index=index, status="rejected", error="Invalid conversion payload")
+        try:
+            job = await conversion_queue.submit(conversion.model_dump(), delivery_id=conversion.delivery_id)
+        except HTTPException as e:
+            return ConversionBatchResult(index=index, status="rejected", error=e.detail)
+        except Exception as e:
+            log.error("conversion_batch.item_failed", exc_info=True, index=index, order_id=conversion.order_id)
+            return ConversionBatchResult(index=index, status="failed", error=str(e) or type(e).__name__)
+        if job["status"] == "queued":
+            return ConversionBatchResult(index=index, status="queued", job_id=job["job_id"])
+        return ConversionBatchResult(index=index, status=job["result"]["status"], ledger_id=job["result"]["ledger_id"])
+    
+    # Submitted together, so queued items share the journal's group commits
+    results = list(await asyncio.gather(*(submit(index, raw) for index, raw in enumerate(items))))
+    
+    counts = {status: sum(1 for r in results if r.status == status) for status in ("ok", "rejected", "queued", "failed")}
+    duplicates = len(items) - sum(counts.values())
+    log.info("conversion_batch.processed", received=len(items), created=counts["ok"], duplicates=duplicates,
+             rejected=counts["rejected"], queued=counts["queued"], failed=counts["failed"])
+    
+    return ConversionBatchResponse(
+        received=len(items),
+        created=counts["ok"],
+        duplicates=duplicates,
+        rejected=counts["rejected"],
+        queued=counts["queued"],
+        failed=counts["failed"],
+        results=results
+    )
+
+@app.get("/v1/admin/conversion_queue", tags=["Admin APIs"])
+async def get_conversion_queue():
+    """Conversion queue depth, worker and retry metrics, plus dead letters"""
+    return {
+        "stats": conversion_queue.stats(),
+        "dead_letters": [
+            {k: v for k, v in job.items() if not k.startswith("_")}
+            for job in conversion_queue.dead_letters
+        ]
     }
-    ledger_entry = db.create_ledger_entry(ledger_data)
-    print(f"✅ Ledger entry created: {ledger_entry['ledger_id']} (user: {ledger_entry['user_amount']}, creator: {ledger_entry['creator_amount']})")
-    return {"status": "ok", "ledger_id": ledger_entry["ledger_id"]}
 
-@app.get("/v1/ledger", tags=["Admin APIs"])
+@app.post("/v1/admin/conversion_queue/requeue", tags=["Admin APIs"])
+async def requeue_conversion_dead_letters():
+    """Put every dead-lettered conversion job back on the queue"""
+    return {"requeued": conversion_queue.requeue_dead_letters()}
+
+@app.get("/v1/ledger", response_class=FastJSONResponse, tags=["Admin APIs"])
 async def list_ledger():
     """Debug endpoint to list ledger entries"""
-    return {"ledger": db.ledger, "count": len(db.ledger)}
+    return FastJSONResponse({"ledger": db.ledger, "count": len(db.ledger)})
+
+def ledger_snapshot_summary() -> Dict[str, Any]:
+    """Snapshot checkpoint and segment metadata, without the archived rows"""
+    return {
+        "as_of": db.ledger_snapshot["as_of"],
+        "archived_entries": db.ledger_snapshot["entries"],
+        "live_entries": len(db.ledger),
+        "segments": [
+            {k: v for k, v in segment.items() if k not in ("balances", "order_keys")}
+            for segment in db.ledger_segments
+        ]
+    }
+
+@app.post("/v1/admin/ledger/compact", tags=["Admin APIs"])
+async def compact_ledger(older_than_days: int = 90):
+    """Archive paid/rejected entries older than the given age"""
+    if older_than_days < 0:
+        raise HTTPException(status_code=400, detail="older_than_days must not be negative")
+    segment = db.compact_ledger(datetime.utcnow() - timedelta(days=older_than_days))
+    return {
+        "compacted": segment["entries"] if segment else 0,
+        "segment_id": segment["segment_id"] if segment else None,
+        **ledger_snapshot_summary()
+    }
+
+@app.get("/v1/admin/ledger/snapshot", tags=["Admin APIs"])
+async def get_ledger_snapshot(verify: bool = False):
+    """
+    Ledger snapshot summary. With verify=true, rebuilds balances from the
+    snapshot plus the live tail and reports rows that disagree.
+    """
+    summary = ledger_snapshot_summary()
+    if verify:
+        rebuilt = db.rebuild_balances()
+        mismatched = [
+            f"{owner_type}:{owner_id}"
+            for (owner_type, owner_id), row in db.balances.items()
+            if row["balance_paise"] != db.get_balance(owner_type, owner_id, balances=rebuilt)["balance_paise"]
+            or row["pending_payout_paise"] != db.get_balance(owner_type, owner_id, balances=rebuilt)["pending_payout_paise"]
+        ]
+        summary["verified"] = not mismatched
+        summary["mismatched"] = mismatched
+    return summary
+
+def deliver_webhooks_after_response(background_tasks: BackgroundTasks):
+    """Without the background flusher (serverless), deliver buffered webhooks once the response is sent"""
+    if not webhook_dispatcher.running:
+        background_tasks.add_task(webhook_dispatcher.flush)
 
 @app.post("/v1/rewards/payout/run", tags=["Events & Webhooks"])
-async def run_payouts():
-    """
-    Process eligible ledger entries and create payouts (simulate AGCOD)
-    """
-    print("💸 Running payout job...")
-    # Find eligible ledger entries: status='queued', cool_off expired, user_amount >= 10
-    now = datetime.utcnow()
-    eligible = [
-        l for l in db.ledger
-        if l["status"] == "queued"
-        and l["user_amount"] >= 10
-        and datetime.fromisoformat(l["cool_off_until"]) <= now
-    ]
-    # Group by user_id
-    user_groups = {}
-    for l in eligible:
-        user_id = l["user_id"]
-        if user_id not in user_groups:
-            user_groups[user_id] = []
-        user_groups[user_id].append(l)
-    payout_count = 0
-    for user_id, entries in user_groups.items():
-        total = sum(l["user_amount"] for l in entries)
-        ledger_ids = [l["ledger_id"] for l in entries]
-        # Simulate AGCOD voucher code
-        voucher_code = f"AGC-{uuid.uuid4().hex[:8].upper()}"
-        payout_data = {
-            "user_id": user_id,
-            "amount": total,
-            "method": "amazon_gv",
-            "voucher_code": voucher_code,
-            "ledger_ids": ledger_ids
-        }
-        payout = db.create_payout(payout_data)
-        # Mark ledger entries as paid
-        for l in entries:
-            l["status"] = "paid"
-        payout_count += 1
-        print(f"✅ Payout {payout['payout_id']} for user {user_id}: ₹{total} (voucher: {voucher_code})")
-        # Simulate notification
-        print(f"📲 SMS to {user_id}: Your Amazon voucher {voucher_code} for ₹{total} is ready!")
-    return {"paid_count": payout_count, "users_paid": list(user_groups.keys())}
+async def run_payouts(background_tasks: BackgroundTasks, chunk_size: int = 100, max_chunks: Optional[int] = None):
+    """
+    Process eligible ledger entries and create payouts (simulate AGCOD).
+    The run is split into chunks of chunk_size users and checkpointed after
+    each chunk; pass max_chunks to process only part of it now and finish
+    later via /v1/rewards/payout/runs/{run_id}/resume.
+    """
+    if chunk_size < 1:
+        raise HTTPException(status_code=400, detail="chunk_size must be at least 1")
+    run = payout_run_service.create_run(chunk_size=chunk_size)
+    await payout_run_service.process_run(run, max_chunks=max_chunks)
+    deliver_webhooks_after_response(background_tasks)
+    
+    next_eligible_at = db.next_payout_eligible_at()
+    return {
+        "run_id": run["run_id"],
+        "status": run["status"],
+        "chunks_total": run["chunks_total"],
+        "chunks_done": run["chunks_done"],
+        "paid_count": run["paid_count"],
+        "users_paid": run["users_paid"],
+        "failed": run["failed"],
+        "next_eligible_at": next_eligible_at.isoformat() if next_eligible_at else None
+    }
+
+@app.get("/v1/rewards/payout/runs", tags=["Events & Webhooks"])
+async def list_payout_runs():
+    """List payout runs with their progress"""
+    runs = [payout_run_service.summary(r, include_chunks=False) for r in db.payout_runs.values()]
+    return {"runs": runs, "count": len(runs)}
+
+@app.get("/v1/rewards/payout/runs/{run_id}", tags=["Events & Webhooks"])
+async def get_payout_run(run_id: str):
+    """Payout run progress, including per-chunk checkpoints"""
+    run = db.get_payout_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Payout run not found")
+    return payout_run_service.summary(run)
+
+@app.post("/v1/rewards/payout/runs/{run_id}/resume", tags=["Events & Webhooks"])
+async def resume_payout_run(run_id: str, background_tasks: BackgroundTasks, max_chunks: Optional[int] = None):
+    """Continue a run from its last checkpoint (pending, failed or expired chunks)"""
+    run = db.get_payout_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Payout run not found")
+    await payout_run_service.process_run(run, max_chunks=max_chunks)
+    deliver_webhooks_after_response(background_tasks)
+    return payout_run_service.summary(run, include_chunks=False)
+
+@app.post("/v1/rewards/payout/runs/{run_id}/chunks/next", tags=["Events & Webhooks"])
+async def process_next_payout_chunk(run_id: str, background_tasks: BackgroundTasks, worker_id: Optional[str] = None):
+    """Claim and process one chunk; lets several workers share a large run"""
+    run = db.get_payout_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Payout run not found")
+    chunk = payout_run_service.claim_chunk(run, worker_id)
+    if not chunk:
+        return {"status": run["status"], "chunk": None}
+    await payout_run_service.process_chunk(run, chunk)
+    deliver_webhooks_after_response(background_tasks)
+    return {"status": run["status"], "chunk": payout_run_service.chunk_summary(chunk)}
+
+@app.get("/v1/rewards/balance", tags=["End-User APIs"])
+async def get_user_balance(user_id: str):
+    """User's wallet balance and pending payout (single-row read)"""
+    return balance_response(db.get_balance("user", user_id))
 
 @app.get("/v1/rewards/user", tags=["End-User APIs"])
 async def get_user_payouts(user_id: str):
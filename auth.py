@@ -0,0 +1,102 @@
+import json
+import os
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from jose import JWTError, jwt
+
+from structured_logging import get_logger
+
+log = get_logger("auth")
+
+ISSUER = "hissaback"
+ALGORITHM = "HS256"
+
+
+class AuthError(Exception):
+    """Token missing, malformed, expired or signed with an unknown key"""
+
+
+class TokenAuth:
+    """
+    Issues and verifies signed JWTs carrying tenant_id and role.
+
+    Signing keys are read once and cached by key ID (kid), so rotation is
+    a matter of adding a key and switching the active kid. Keys come from
+    JWT_SIGNING_KEYS ({"kid": "secret", ...}) with JWT_ACTIVE_KID, or a
+    single JWT_SECRET. Every worker sharing the keys can verify any token,
+    with no DB lookup. Recently verified tokens are kept in a small LRU so
+    repeat requests skip the signature check until the token expires.
+    """
+
+    def __init__(self, keys: Optional[Dict[str, str]] = None, active_kid: Optional[str] = None,
+                 ttl_seconds: int = 12 * 3600, cache_size: int = 10000):
+        if keys is None:
+            keys, active_kid = self._keys_from_env()
+        self.keys = dict(keys)
+        self.active_kid = active_kid or next(iter(self.keys))
+        self.ttl_seconds = ttl_seconds
+        self.cache_size = cache_size
+        self.verified: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.counters = {"issued": 0, "verified": 0, "cache_hits": 0, "rejected": 0}
+
+    @staticmethod
+    def _keys_from_env():
+        if os.environ.get("JWT_SIGNING_KEYS"):
+            keys = json.loads(os.environ["JWT_SIGNING_KEYS"])
+            return keys, os.environ.get("JWT_ACTIVE_KID")
+        if os.environ.get("JWT_SECRET"):
+            return {"default": os.environ["JWT_SECRET"]}, "default"
+        log.warning("auth.ephemeral_signing_key", detail="JWT_SECRET not set; tokens won't verify on other workers")
+        return {"dev": secrets.token_urlsafe(32)}, "dev"
+
+    def issue(self, subject: str, role: str, tenant_id: Optional[str] = None, ttl_seconds: Optional[int] = None, **claims) -> str:
+        """Sign a token for a subject with a role (and tenant for creators)"""
+        now = int(time.time())
+        payload = {
+            "iss": ISSUER,
+            "sub": subject,
+            "role": role,
+            "iat": now,
+            "exp": now + (ttl_seconds or self.ttl_seconds),
+            **claims
+        }
+        if tenant_id:
+            payload["tenant_id"] = tenant_id
+        self.counters["issued"] += 1
+        return jwt.encode(payload, self.keys[self.active_kid], algorithm=ALGORITHM, headers={"kid": self.active_kid})
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Return the token's claims, or raise AuthError"""
+        cached = self.verified.get(token)
+        if cached is not None:
+            if cached["exp"] > time.time():
+                self.verified.move_to_end(token)
+                self.counters["cache_hits"] += 1
+                return cached
+            del self.verified[token]
+
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+            key = self.keys.get(kid)
+            if key is None:
+                raise AuthError("Unknown signing key")
+            claims = jwt.decode(token, key, algorithms=[ALGORITHM], issuer=ISSUER)
+        except JWTError as e:
+            self.counters["rejected"] += 1
+            raise AuthError(str(e))
+        except AuthError:
+            self.counters["rejected"] += 1
+            raise
+
+        self.counters["verified"] += 1
+        self.verified[token] = claims
+        if len(self.verified) > self.cache_size:
+            self.verified.popitem(last=False)
+        return claims
+
+
+# Global instance
+token_auth = TokenAuth()
@@ -0,0 +1,109 @@
+"""
+Serialization benchmark for the large list endpoints.
+
+Compares FastAPI's default path (jsonable_encoder + json.dumps) with the
+FastJSONResponse path used by /v1/ledger, /v1/links, /v1/campaigns and
+/v1/offers. Reports milliseconds per 10k rows.
+
+Usage: python bench_serialization.py [rows] [repeats]
+"""
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from fast_json import FastJSONResponse, orjson
+
+
+def make_ledger_rows(n: int) -> list:
+    """Build ledger rows shaped like process_conversion output"""
+    now = datetime.utcnow()
+    return [
+        {
+            "ledger_id": f"led_{i}",
+            "conv_id": f"conv_{uuid.uuid4().hex[:8]}",
+            "click_id": f"click_{i}",
+            "link_id": f"lnk_{i % 500:08d}",
+            "campaign_id": f"camp_{i % 50:08d}",
+            "offer_id": "camp_1234",
+            "user_id": f"user_{i % 2000}",
+            "order_id": f"ORD{i}",
+            "sale_amount": 1999.0 + i,
+            "base_commission": 119.94,
+            "user_pct": 60.0,
+            "user_amount": 71.96,
+            "creator_amount": 47.98,
+            "status": "queued",
+            "created_at": now.isoformat(),
+            "cool_off_until": (now + timedelta(days=30)).isoformat()
+        }
+        for i in range(n)
+    ]
+
+
+def make_offer_models(n: int) -> list:
+    """Build validated OfferResponse models like GET /v1/offers"""
+    from app import OfferResponse
+
+    return [
+        OfferResponse(
+            offer_id=f"camp_{i}",
+            trackier_campaign_id=f"camp_{i}",
+            advertiser_id=f"adv_{i % 40:03d}",
+            brand="Flipkart",
+            category="Electronics",
+            base_commission_pct=6.0,
+            cool_off_days=30,
+            status="active",
+            exposed_via_api=True
+        )
+        for i in range(n)
+    ]
+
+
+def time_it(fn, repeats: int) -> float:
+    """Best-of-N wall time in seconds"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(rows: int = 10000, repeats: int = 5) -> list:
+    ledger = {"ledger": make_ledger_rows(rows), "count": rows}
+    offers = make_offer_models(rows)
+
+    cases = [
+        ("ledger dicts", ledger),
+        ("offer models", offers),
+    ]
+
+    results = []
+    for name, payload in cases:
+        default = time_it(lambda: JSONResponse(jsonable_encoder(payload)), repeats)
+        fast = time_it(lambda: FastJSONResponse(payload), repeats)
+        scale = 10000 / rows
+        results.append({
+            "case": name,
+            "default_ms_per_10k": round(default * 1000 * scale, 2),
+            "fast_ms_per_10k": round(fast * 1000 * scale, 2),
+            "speedup": round(default / fast, 1) if fast else None
+        })
+    return results
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    print(f"📊 Serialization benchmark: {rows} rows, best of {repeats} (orjson: {'yes' if orjson else 'no'})")
+    for result in run(rows, repeats):
+        print(
+            f"  {result['case']:<14} default {result['default_ms_per_10k']:>8.2f} ms/10k"
+            f"   fast {result['fast_ms_per_10k']:>8.2f} ms/10k   x{result['speedup']}"
+        )
@@ -0,0 +1,46 @@
+"""
+Commission split recalculation benchmark.
+
+Compares the old per-conversion float loop with SplitEngine over columns,
+on the pure-Python path and (when installed) the NumPy path.
+
+Usage: python bench_splits.py [entries]
+"""
+import random
+import sys
+import time
+
+from split_engine import SplitEngine, np
+
+
+def per_entry(sales, pcts, shares):
+    rows = []
+    for sale, pct, share in zip(sales, pcts, shares):
+        base_commission = pct * sale / 100.0
+        user_amount = base_commission * ((100.0 - share) / 100.0)
+        rows.append((base_commission, user_amount, base_commission - user_amount))
+    return rows
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main(count: int):
+    sales = [round(random.uniform(100, 50000), 2) for _ in range(count)]
+    pcts = [random.choice([2.5, 4.0, 6.5, 8.0]) for _ in range(count)]
+    shares = [random.choice([20.0, 40.0, 60.0]) for _ in range(count)]
+
+    print(f"🧮 Split recalculation benchmark: {count} entries")
+    print(f"  per-entry floats   {timed(per_entry, sales, pcts, shares) * 1000:8.1f} ms (unrounded)")
+    print(f"  engine, python     {timed(SplitEngine(use_numpy=False).split_batch, sales, pcts, shares) * 1000:8.1f} ms")
+    if np is not None:
+        print(f"  engine, numpy      {timed(SplitEngine(use_numpy=True).split_batch, sales, pcts, shares) * 1000:8.1f} ms")
+    else:
+        print("  engine, numpy      (numpy not installed)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
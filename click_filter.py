@@ -0,0 +1,174 @@
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional
+
+# One compiled alternation, so a user agent is scanned once
+BOT_USER_AGENT = re.compile(
+    r"bot\b|crawl|spider|slurp|bingpreview|facebookexternalhit|headless|phantomjs|selenium|puppeteer|playwright"
+    r"|curl/|wget/|python-requests|python-urllib|aiohttp|httpx|go-http-client|java/|libwww|scrapy",
+    re.IGNORECASE
+)
+
+
+class WindowCounters:
+    """
+    Approximate sliding-window counts per key: the current fixed window's
+    count plus the previous window's, weighted by how much of it still
+    overlaps. O(1) per hit and three numbers per key; at most max_keys keys
+    are kept, dropping the least recently hit.
+    """
+
+    def __init__(self, window: float, max_keys: int = 100000):
+        self.window = window
+        self.max_keys = max_keys
+        self.counts: "OrderedDict[str, list]" = OrderedDict()  # key -> [window_index, current, previous]
+
+    def peek(self, key: str, now: float) -> float:
+        """The key's count over the last window if a hit were counted now, without counting it"""
+        index = int(now // self.window)
+        state = self.counts.get(key)
+        current, previous = 0, 0
+        if state is not None:
+            if state[0] == index:
+                current, previous = state[1], state[2]
+            elif state[0] == index - 1:
+                previous = state[1]
+        overlap = 1 - (now % self.window) / self.window
+        return current + 1 + previous * overlap
+
+    def hit(self, key: str, now: float) -> float:
+        """Count a hit and return the key's count over the last window"""
+        index = int(now // self.window)
+        state = self.counts.get(key)
+        if state is None:
+            state = [index, 0, 0]
+            self.counts[key] = state
+        else:
+            self.counts.move_to_end(key)
+            if state[0] != index:
+                state[2] = state[1] if state[0] == index - 1 else 0
+                state[1] = 0
+                state[0] = index
+        state[1] += 1
+        if len(self.counts) > self.max_keys:
+            self.counts.popitem(last=False)
+        overlap = 1 - (now % self.window) / self.window
+        return state[1] + state[2] * overlap
+
+    def __len__(self):
+        return len(self.counts)
+
+
+class ClickFilter:
+    """
+    Streaming fraud filter run on every click before it is stored.
+
+    Clicks are rejected when the user agent matches a known bot or tool, or
+    when an IP, user or link goes over its click limit for the window.
+    A repeat of the same click (same link and user, or link, IP and user
+    agent) within dedupe_window is reported as a duplicate of the first.
+    Everything is O(1) per click and memory is bounded by max_keys.
+
+    Historical clicks (batch backfills whose own time is more than a window
+    old) are deduped against their own time and skip the velocity limits,
+    which only make sense for live traffic.
+    """
+
+    def __init__(
+        self,
+        window: float = 60.0,
+        ip_limit: int = 60,
+        user_limit: int = 30,
+        link_limit: int = 6000,
+        dedupe_window: float = 30.0,
+        max_keys: int = 100000,
+        history_limit: int = 1000
+    ):
+        self.window = window
+        self.limits = {"ip": ip_limit, "user": user_limit, "link": link_limit}
+        self.counters = {scope: WindowCounters(window, max_keys) for scope in self.limits}
+        self.dedupe_window = dedupe_window
+        self.max_keys = max_keys
+        self.recent: "OrderedDict[tuple, tuple]" = OrderedDict()  # dedupe key -> (click_id, seen_at, arrived_at)
+        self.filtered = deque(maxlen=history_limit)
+        self.stats_counters = {"checked": 0, "accepted": 0, "duplicate": 0, "rejected": 0}
+        self.rejected_by_reason: Dict[str, int] = {}
+
+    def _dedupe_key(self, link_id: str, user_id: Optional[str], ip: Optional[str], user_agent: Optional[str]):
+        if user_id:
+            return (link_id, "user", user_id)
+        if ip:
+            return (link_id, "ip", ip, user_agent or "")
+        return None  # Anonymous clicks without an address cannot be told apart
+
+    def check(self, link_id: str, user_id: Optional[str] = None, ip: Optional[str] = None,
+              user_agent: Optional[str] = None, now: Optional[float] = None,
+              at: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Verdict for a click: {"action": "accept" | "duplicate" | "reject",
+        "reason", "click_id" (the original, for duplicates)}. `at` is when
+        the click happened if not now. Pass accepted verdicts to accepted()
+        once the click is stored.
+        """
+        now = time.time() if now is None else now
+        at = now if at is None else at
+        historical = now - at > self.window
+        self.stats_counters["checked"] += 1
+
+        if user_agent is not None and (not user_agent.strip() or BOT_USER_AGENT.search(user_agent)):
+            return self._reject("bot_user_agent", link_id, user_id, ip, user_agent)
+
+        dedupe_key = self._dedupe_key(link_id, user_id, ip, user_agent)
+        if dedupe_key is not None:
+            # Entries are in arrival order, so expired ones are at the front. A live click's
+            # own time can be up to a window old, so an entry can match for window +
+            # dedupe_window after it arrived
+            while self.recent:
+                oldest = next(iter(self.recent.values()))
+                if now - oldest[2] < self.window + self.dedupe_window:
+                    break
+                self.recent.popitem(last=False)
+            seen = self.recent.get(dedupe_key)
+            if seen is not None and abs(at - seen[1]) < self.dedupe_window:
+                self.stats_counters["duplicate"] += 1
+                return {"action": "duplicate", "reason": "duplicate_click", "click_id": seen[0]}
+
+        if not historical:
+            for scope, key in (("ip", ip), ("user", user_id), ("link", link_id)):
+                if key and self.counters[scope].hit(key, now) > self.limits[scope]:
+                    return self._reject(f"{scope}_velocity", link_id, user_id, ip, user_agent)
+
+        return {"action": "accept", "reason": None, "dedupe_key": dedupe_key, "seen_at": at, "arrived_at": now,
+                "historical": historical}
+
+    def accepted(self, verdict: Dict[str, Any], click_id: str):
+        """Remember a stored click so repeats within the window map back to it"""
+        self.stats_counters["accepted"] += 1
+        # Historical clicks are already outside the live dedupe window
+        if verdict.get("dedupe_key") is not None and not verdict.get("historical"):
+            self.recent[verdict["dedupe_key"]] = (click_id, verdict["seen_at"], verdict.get("arrived_at", time.time()))
+            self.recent.move_to_end(verdict["dedupe_key"])
+            if len(self.recent) > self.max_keys:
+                self.recent.popitem(last=False)
+
+    def _reject(self, reason: str, link_id, user_id, ip, user_agent) -> Dict[str, Any]:
+        self.stats_counters["rejected"] += 1
+        self.rejected_by_reason[reason] = self.rejected_by_reason.get(reason, 0) + 1
+        self.filtered.append({
+            "link_id": link_id, "user_id": user_id, "ip_address": ip, "user_agent": user_agent,
+            "reason": reason, "filtered_at": time.time()
+        })
+        return {"action": "reject", "reason": reason}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats_counters,
+            "rejected_by_reason": dict(self.rejected_by_reason),
+            "tracked_keys": {scope: len(c) for scope, c in self.counters.items()},
+            "dedupe_keys": len(self.recent)
+        }
+
+
+# Global instance
+click_filter = ClickFilter()
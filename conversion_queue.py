@@ -0,0 +1,359 @@
+import asyncio
+import inspect
+import json
+import os
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from structured_logging import get_logger
+
+log = get_logger("conversion_queue")
+
+
+class ConversionQueue:
+    """
+    Durable work queue for conversion postbacks.
+
+    Postbacks are journaled (append + fsync) before they are acknowledged,
+    then processed by a pool of asyncio worker tasks. Journal writes are
+    group-committed by a writer running in the default executor, so one
+    fsync covers every record queued while the previous one was in flight
+    and the event loop never blocks on the disk. Failed jobs are retried
+    with exponential backoff and moved to a dead-letter list once they run
+    out of attempts. On start the journal is replayed so jobs that were
+    accepted but never finished are processed again; the handler must be
+    idempotent (on job["delivery_id"] when the caller supplied one, and on
+    the payload otherwise). The writer also compacts the journal down to
+    its unfinished and dead jobs once compact_after done/dead records have
+    been appended, so its size and replay time stay bounded while running.
+
+    Jobs are only queued when they can be journaled: without a journal, or
+    when the pool is not running (serverless, or no app startup event),
+    submit() processes jobs inline so callers still get a result.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any]], Any],
+        workers: int = 4,
+        max_attempts: int = 5,
+        retry_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        journal_path: Optional[str] = None,
+        dead_letter_limit: int = 1000,
+        drain_timeout: float = 10.0,
+        compact_after: int = 10000
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.journal_path = journal_path
+        self.drain_timeout = drain_timeout
+        self.compact_after = compact_after
+        self.dead_letters = deque(maxlen=dead_letter_limit)
+        self.pending: Dict[str, Dict[str, Any]] = {}  # Accepted, not yet done or dead
+        self.counters = {"enqueued": 0, "processed": 0, "retried": 0, "dead_lettered": 0, "inline": 0, "journal_commits": 0,
+                         "journal_compactions": 0}
+        self.in_flight = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._retry_handles = set()
+        self._journal = None
+        self._journal_buffer: List[Tuple[Dict[str, Any], Optional[asyncio.Future]]] = []
+        # What the journal on disk holds, kept by the writer: job_id -> job
+        self._journaled: Dict[str, "OrderedDict[str, Dict[str, Any]]"] = {"enqueue": OrderedDict(), "dead": OrderedDict()}
+        self._obsolete_records = 0  # done/dead records appended since the last compaction
+        self._journal_wakeup: Optional[asyncio.Event] = None
+        self._journal_task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def depth(self) -> int:
+        """Jobs accepted but not yet finished (ready, retrying or in flight)"""
+        return len(self.pending)
+
+    # Lifecycle
+
+    async def start(self):
+        """Replay the journal and start the worker pool on the running loop"""
+        if self.running or not self.journal_path:
+            return
+        try:
+            recovered = self._recover()
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        except OSError as e:
+            # Never acknowledge postbacks we cannot persist; stay inline instead
+            log.error("conversion_queue.journal_unavailable", journal_path=self.journal_path, error=str(e))
+            return
+        self._closing = False
+        self._journal_wakeup = asyncio.Event()
+        self._journal_task = asyncio.create_task(self._journal_writer(), name="conversion-journal")
+        self._queue = asyncio.Queue()
+        for job in recovered:
+            self.pending[job["job_id"]] = job
+            self._queue.put_nowait(job)
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"conversion-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self):
+        """
+        Drain accepted jobs (up to drain_timeout), then stop the workers and
+        flush the journal; jobs still unfinished stay journaled for the next
+        start.
+        """
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self.drain(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            log.warning("conversion_queue.stopped_with_pending", pending=len(self.pending), journal_path=self.journal_path)
+        for handle in self._retry_handles:
+            handle.cancel()
+        self._retry_handles.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self.pending.clear()
+        self.in_flight = 0
+        self._closing = True
+        self._journal_wakeup.set()
+        await self._journal_task
+        self._journal_task = None
+        self._journal.close()
+        self._journal = None
+
+    async def drain(self):
+        """Wait until every accepted job is done or dead-lettered"""
+        while self.pending:
+            await asyncio.sleep(0.01)
+
+    # Producer side
+
+    async def submit(self, payload: Dict[str, Any], delivery_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Accept a job. Returns {"job_id", "status": "queued"} once its journal
+        record is fsynced, or processes it inline when the pool is not
+        running (handler exceptions propagate to the caller in that case).
+        """
+        job = {
+            "job_id": f"job_{uuid.uuid4().hex[:12]}",
+            "delivery_id": delivery_id,
+            "payload": payload,
+            "attempts": 0,
+            "enqueued_at": datetime.utcnow().isoformat()
+        }
+
+        if not self.running:
+            self.counters["inline"] += 1
+            result = self.handler(job)
+            return {"job_id": job["job_id"], "status": "done", "result": result}
+
+        await self._write_journal({"op": "enqueue", "job": job}, wait=True)
+        if not self.running:
+            # Stopped while the record was being committed; it replays on the next start
+            return {"job_id": job["job_id"], "status": "queued"}
+        self.pending[job["job_id"]] = job
+        self._queue.put_nowait(job)
+        self.counters["enqueued"] += 1
+        return {"job_id": job["job_id"], "status": "queued"}
+
+    def requeue_dead_letters(self) -> int:
+        """Move every dead-lettered job back onto the queue"""
+        if not self.running:
+            return 0
+        count = 0
+        while self.dead_letters:
+            job = self.dead_letters.popleft()
+            job["attempts"] = 0
+            job.pop("error", None)
+            self._write_journal({"op": "enqueue", "job": job})
+            self.pending[job["job_id"]] = job
+            self._queue.put_nowait(job)
+            count += 1
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and throughput counters"""
+        return {
+            "running": self.running,
+            "workers": len(self._tasks),
+            "depth": self.depth,
+            "ready": self._queue.qsize() if self._queue else 0,
+            "retry_scheduled": len(self._retry_handles),
+            "in_flight": self.in_flight,
+            "dead_letters": len(self.dead_letters),
+            **self.counters
+        }
+
+    # Consumer side
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self._queue.get()
+            self.in_flight += 1
+            try:
+                job["attempts"] += 1
+                result = self.handler(job)
+                if inspect.isawaitable(result):
+                    await result
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._handle_failure(job, e)
+            else:
+                self.pending.pop(job["job_id"], None)
+                self.counters["processed"] += 1
+                self._write_journal({"op": "done", "job_id": job["job_id"]})
+            finally:
+                self.in_flight -= 1
+                self._queue.task_done()
+
+    def _handle_failure(self, job: Dict[str, Any], error: Exception):
+        job["error"] = getattr(error, "detail", None) or str(error) or type(error).__name__
+        if job["attempts"] >= self.max_attempts:
+            self.pending.pop(job["job_id"], None)
+            self.dead_letters.append(job)
+            self.counters["dead_lettered"] += 1
+            self._write_journal({"op": "dead", "job": job})
+            log.error("conversion_job.dead_lettered", job_id=job["job_id"], attempts=job["attempts"], error=job["error"])
+            return
+
+        delay = min(self.retry_backoff * (2 ** (job["attempts"] - 1)), self.max_backoff)
+        self.counters["retried"] += 1
+        handle = asyncio.get_running_loop().call_later(delay, self._requeue, job)
+        self._retry_handles.add(handle)
+        job["_retry_handle"] = handle
+
+    def _requeue(self, job: Dict[str, Any]):
+        self._retry_handles.discard(job.pop("_retry_handle", None))
+        if self._queue is not None:
+            self._queue.put_nowait(job)
+
+    # Journal
+
+    def _write_journal(self, record: Dict[str, Any], wait: bool = False) -> Optional[asyncio.Future]:
+        """
+        Buffer a record for the next group commit. With wait=True, returns a
+        future resolved once the record is fsynced; done/dead records are
+        not awaited since losing one only means an idempotent replay.
+        """
+        record = {**record}
+        if "job" in record:
+            record["job"] = {k: v for k, v in record["job"].items() if not k.startswith("_")}
+        future = asyncio.get_running_loop().create_future() if wait else None
+        self._journal_buffer.append((record, future))
+        self._journal_wakeup.set()
+        return future
+
+    async def _journal_writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._journal_wakeup.wait()
+            self._journal_wakeup.clear()
+            batch, self._journal_buffer = self._journal_buffer, []
+            if batch:
+                try:
+                    await loop.run_in_executor(None, self._append, "".join(json.dumps(record) + "\n" for record, _ in batch))
+                except Exception as e:
+                    log.error("conversion_queue.journal_failed", journal_path=self.journal_path, error=str(e))
+                    for _, future in batch:
+                        if future is not None and not future.done():
+                            future.set_exception(e)
+                else:
+                    self.counters["journal_commits"] += 1
+                    for record, future in batch:
+                        self._obsolete_records += self._apply(self._journaled, record)
+                        if future is not None and not future.done():
+                            future.set_result(None)
+                if self._obsolete_records >= self.compact_after:
+                    try:
+                        await loop.run_in_executor(None, self._compact, self._snapshot(self._journaled))
+                    except Exception as e:
+                        # The old journal is still intact; appends carry on and compaction is retried later
+                        log.error("conversion_queue.compaction_failed", journal_path=self.journal_path, error=str(e))
+                    else:
+                        self._obsolete_records = 0
+                        self.counters["journal_compactions"] += 1
+            if self._closing and not self._journal_buffer:
+                return
+
+    def _append(self, data: str):
+        self._journal.write(data)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def _apply(self, state: Dict[str, "OrderedDict[str, Dict[str, Any]]"], record: Dict[str, Any]) -> int:
+        """Fold a journal record into state; returns 1 if it made earlier records obsolete"""
+        if record["op"] == "enqueue":
+            job = record["job"]
+            state["dead"].pop(job["job_id"], None)  # Requeued dead letter
+            state["enqueue"][job["job_id"]] = job
+            return 0
+        if record["op"] == "done":
+            state["enqueue"].pop(record["job_id"], None)
+            return 1
+        if record["op"] == "dead":
+            job = record["job"]
+            state["enqueue"].pop(job["job_id"], None)
+            state["dead"][job["job_id"]] = job
+            while self.dead_letters.maxlen is not None and len(state["dead"]) > self.dead_letters.maxlen:
+                state["dead"].popitem(last=False)
+            return 1
+        return 0
+
+    def _snapshot(self, state: Dict[str, "OrderedDict[str, Dict[str, Any]]"]) -> str:
+        """The compacted journal for state: dead jobs, then unfinished ones"""
+        return "".join(
+            json.dumps({"op": op, "job": job}) + "\n"
+            for op in ("dead", "enqueue") for job in state[op].values()
+        )
+
+    def _compact(self, data: str):
+        """Atomically replace the journal with data (tmp + fsync + rename) and reopen it"""
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+    def _recover(self) -> List[Dict[str, Any]]:
+        """Load unfinished jobs from the journal and compact it"""
+        self._journaled = {"enqueue": OrderedDict(), "dead": OrderedDict()}
+        self._obsolete_records = 0
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return []
+
+        state = {"enqueue": OrderedDict(), "dead": OrderedDict()}
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn write from a crash mid-append
+                self._apply(state, record)
+
+        self._compact(self._snapshot(state))
+        self._journaled = state
+        self.dead_letters.clear()  # The journal is the source of truth
+        self.dead_letters.extend(state["dead"].values())
+        unfinished = state["enqueue"]
+
+        if unfinished:
+            log.info("conversion_queue.recovered", jobs=len(unfinished), journal_path=self.journal_path)
+        return list(unfinished.values())
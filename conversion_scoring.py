@@ -0,0 +1,260 @@
+import hashlib
+import math
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from click_filter import WindowCounters
+
+
+class BloomFilter:
+    """
+    Fixed-size set membership with no false negatives and a false-positive
+    rate of about `error_rate` up to `capacity` items. k bit positions come
+    from one BLAKE2b digest by double hashing.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> bool:
+        """Add an item; returns True if it was (probably) already present"""
+        present = True
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                present = False
+                self.bits[byte] |= 1 << bit
+        if not present:
+            self.count += 1
+        return present
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[p // 8] & (1 << (p % 8)) for p in self._positions(item))
+
+
+class RotatingBloomFilter:
+    """
+    Two-generation bloom filter that keeps its false-positive rate bounded
+    on an endless stream: once the current filter holds `capacity` items it
+    becomes the previous one and a fresh filter takes over. Items are
+    remembered for at least `capacity` further distinct additions.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.current = BloomFilter(capacity, error_rate)
+        self.previous: Optional[BloomFilter] = None
+        self.rotations = 0
+
+    def add(self, item: str) -> bool:
+        """Add an item; returns True if it was (probably) already present"""
+        seen = item in self
+        if self.current.count >= self.capacity:
+            self.previous, self.current = self.current, BloomFilter(self.capacity, self.error_rate)
+            self.rotations += 1
+        # Always (re)write into the current generation so the item outlives the next rotation
+        self.current.add(item)
+        return seen
+
+    def __contains__(self, item: str) -> bool:
+        return item in self.current or (self.previous is not None and item in self.previous)
+
+    @property
+    def count(self) -> int:
+        return self.current.count + (self.previous.count if self.previous is not None else 0)
+
+
+class LinkSaleStats:
+    """Running mean and variance of sale amounts per link (Welford), LRU-bounded"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self.stats: "OrderedDict[str, list]" = OrderedDict()  # link_id -> [n, mean, m2]
+
+    def zscore(self, link_id: str, amount: float) -> Optional[float]:
+        """z-score of amount against the link's history (None until 20 sales)"""
+        state = self.stats.get(link_id)
+        if state is None or state[0] < 20:
+            return None
+        n, mean, m2 = state
+        std = math.sqrt(m2 / (n - 1))
+        return (amount - mean) / std if std > 0 else (0.0 if amount == mean else math.inf)
+
+    def add(self, link_id: str, amount: float):
+        """Fold a sale into the link's running mean and variance"""
+        state = self.stats.get(link_id)
+        if state is None:
+            state = [0, 0.0, 0.0]
+            self.stats[link_id] = state
+            if len(self.stats) > self.max_keys:
+                self.stats.popitem(last=False)
+        else:
+            self.stats.move_to_end(link_id)
+        n, mean, m2 = state
+        n += 1
+        delta = amount - mean
+        mean += delta / n
+        state[:] = [n, mean, m2 + delta * (amount - mean)]
+
+
+class ConversionScorer:
+    """
+    Scores a conversion for fraud before its ledger entry is written.
+
+    Signals, each adding its weight to the score (capped at 1.0):
+    - too_fast / stale_click: click-to-conversion time outside
+      [min_seconds, max_click_age_days]
+    - click_reuse: the click already carries click_reuse_limit conversions
+    - user_velocity / link_velocity: conversions per user or link over the
+      last hour above their limits
+    - sale_outlier: sale amount more than outlier_z standard deviations from
+      the link's running mean
+    - order_reused: the advertiser's order ID was already seen (rotating
+      bloom filter keyed by advertiser_id:order_id), here under another of
+      its offers, since repeats for the same offer never reach scoring
+
+    Every signal is O(1) per conversion with bounded memory. Scores at or
+    over flag_threshold are flagged; at or over hold_threshold the entry is
+    held for review instead of entering the payout queue.
+
+    evaluate() only reads the signals' state; record() adds the conversion
+    to it and is called once the ledger entry is committed, so a write that
+    fails and is retried is not counted against itself.
+    """
+
+    WEIGHTS = {
+        "too_fast": 0.4,
+        "stale_click": 0.3,
+        "click_reuse": 0.3,
+        "user_velocity": 0.3,
+        "link_velocity": 0.2,
+        "sale_outlier": 0.2,
+        "order_reused": 0.6
+    }
+
+    def __init__(
+        self,
+        min_seconds: float = 10.0,
+        max_click_age_days: float = 30.0,
+        click_reuse_limit: int = 3,
+        user_limit_per_hour: int = 10,
+        link_limit_per_hour: int = 500,
+        outlier_z: float = 4.0,
+        flag_threshold: float = 0.5,
+        hold_threshold: float = 0.9,
+        max_keys: int = 100000,
+        order_capacity: int = 1_000_000,
+        history_limit: int = 1000
+    ):
+        self.min_seconds = min_seconds
+        self.max_click_age = max_click_age_days * 86400
+        self.click_reuse_limit = click_reuse_limit
+        self.user_limit = user_limit_per_hour
+        self.link_limit = link_limit_per_hour
+        self.outlier_z = outlier_z
+        self.flag_threshold = flag_threshold
+        self.hold_threshold = hold_threshold
+        self.max_keys = max_keys
+        self.user_counts = WindowCounters(3600, max_keys)
+        self.link_counts = WindowCounters(3600, max_keys)
+        self.click_conversions: "OrderedDict[str, int]" = OrderedDict()
+        self.link_sales = LinkSaleStats(max_keys)
+        self.orders = RotatingBloomFilter(order_capacity)
+        self.flagged = deque(maxlen=history_limit)
+        self.counters = {"scored": 0, "flagged": 0, "held": 0}
+        self.by_reason = {reason: 0 for reason in self.WEIGHTS}
+
+    def evaluate(self, click: Dict[str, Any], link_id: str, order_id: str, sale_amount: float,
+                 now: Optional[datetime] = None, advertiser_id: Optional[str] = None) -> Dict[str, Any]:
+        """{"score", "reasons", "flagged", "hold"} for a conversion attributed to click, without recording it"""
+        now = now or datetime.utcnow()
+        reasons: List[str] = []
+
+        clicked_at = datetime.fromisoformat(click["timestamp"])
+        elapsed = (now - clicked_at).total_seconds()
+        if elapsed < self.min_seconds:
+            reasons.append("too_fast")
+        elif elapsed > self.max_click_age:
+            reasons.append("stale_click")
+
+        if self.click_conversions.get(click["click_id"], 0) >= self.click_reuse_limit:
+            reasons.append("click_reuse")
+
+        timestamp = now.timestamp()
+        user_id = click.get("user_id")
+        if user_id and self.user_counts.peek(user_id, timestamp) > self.user_limit:
+            reasons.append("user_velocity")
+        if self.link_counts.peek(link_id, timestamp) > self.link_limit:
+            reasons.append("link_velocity")
+
+        z = self.link_sales.zscore(link_id, sale_amount)
+        if z is not None and abs(z) > self.outlier_z:
+            reasons.append("sale_outlier")
+
+        if self.order_key(order_id, advertiser_id) in self.orders:
+            reasons.append("order_reused")
+
+        score = min(1.0, round(sum(self.WEIGHTS[r] for r in reasons), 2))
+        return {
+            "score": score,
+            "reasons": reasons,
+            "flagged": score >= self.flag_threshold,
+            "hold": score >= self.hold_threshold
+        }
+
+    def record(self, click: Dict[str, Any], link_id: str, order_id: str, sale_amount: float, verdict: Dict[str, Any],
+               now: Optional[datetime] = None, advertiser_id: Optional[str] = None):
+        """Add a committed conversion and its verdict to the signals and counters"""
+        now = now or datetime.utcnow()
+        click_id = click["click_id"]
+        self.click_conversions[click_id] = self.click_conversions.get(click_id, 0) + 1
+        self.click_conversions.move_to_end(click_id)
+        if len(self.click_conversions) > self.max_keys:
+            self.click_conversions.popitem(last=False)
+
+        timestamp = now.timestamp()
+        if click.get("user_id"):
+            self.user_counts.hit(click["user_id"], timestamp)
+        self.link_counts.hit(link_id, timestamp)
+        self.link_sales.add(link_id, sale_amount)
+        self.orders.add(self.order_key(order_id, advertiser_id))
+
+        self.counters["scored"] += 1
+        for reason in verdict["reasons"]:
+            self.by_reason[reason] += 1
+        if verdict["flagged"]:
+            self.counters["flagged"] += 1
+            self.counters["held"] += verdict["hold"]
+            self.flagged.append({"click_id": click_id, "link_id": link_id, "order_id": order_id,
+                                 "sale_amount": sale_amount, **verdict, "scored_at": now.isoformat()})
+
+    def score(self, click: Dict[str, Any], link_id: str, order_id: str, sale_amount: float,
+              now: Optional[datetime] = None, advertiser_id: Optional[str] = None) -> Dict[str, Any]:
+        """evaluate() then record(), for callers with nothing to commit in between"""
+        verdict = self.evaluate(click, link_id, order_id, sale_amount, now=now, advertiser_id=advertiser_id)
+        self.record(click, link_id, order_id, sale_amount, verdict, now=now, advertiser_id=advertiser_id)
+        return verdict
+
+    @staticmethod
+    def order_key(order_id: str, advertiser_id: Optional[str]) -> str:
+        # Order IDs are only unique per advertiser
+        return f"{advertiser_id or ''}:{order_id}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "by_reason": dict(self.by_reason), "orders_seen": self.orders.count,
+                "order_filter_rotations": self.orders.rotations}
+
+
+# Global instance
+conversion_scorer = ConversionScorer()
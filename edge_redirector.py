@@ -4,11 +4,14 @@ from datetime import datetime
 from typing import Dict, Any, Optional
 from urllib.parse import urlparse, parse_qs, urlencode
 
+from click_filter import click_filter
+
 class EdgeRedirector:
     """Simulates edge redirector for smart links"""
     
-    def __init__(self):
+    def __init__(self, click_filter=click_filter):
         self.redirect_logs = []
+        self.click_filter = click_filter
     
     def parse_smart_link(self, url: str) -> Dict[str, Any]:
         """Parse smart link URL and extract parameters"""
@@ -33,7 +36,12 @@ class EdgeRedirector:
         return f"click_{uuid.uuid4().hex[:12]}"
     
     def log_click(self, smart_link_data: Dict[str, Any], user_agent: str, ip_address: str) -> str:
-        """Log a click and return click ID"""
+        """Log a click and return click ID (the original one for a repeat click)"""
+        link_key = smart_link_data.get('slug') or smart_link_data.get('campaign_id') or ''
+        verdict = self.click_filter.check(link_key, ip=ip_address, user_agent=user_agent)
+        if verdict['action'] == 'duplicate':
+            return verdict['click_id']
+        
         click_id = self.generate_click_id()
         
         log_entry = {
@@ -42,8 +50,11 @@ class EdgeRedirector:
             'smart_link_data': smart_link_data,
             'user_agent': user_agent,
             'ip_address': ip_address,
-            'status': 'tracked'
+            'status': 'tracked' if verdict['action'] == 'accept' else 'filtered',
+            'filter_reason': verdict['reason']
         }
+        if verdict['action'] == 'accept':
+            self.click_filter.accepted(verdict, click_id)
         
         self.redirect_logs.append(log_entry)
         return click_id
@@ -0,0 +1,54 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """Encode the few non-JSON types that show up in our list payloads"""
+    if isinstance(obj, BaseModel):
+        # Models are validated when they are built, so just dump the fields
+        return obj.model_dump()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize content to compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content,
+        default=_default,
+        ensure_ascii=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response that skips FastAPI's jsonable_encoder pass.
+
+    Return an instance directly from a route to bypass response_model
+    re-validation; content must already be plain dicts/lists or validated
+    Pydantic models.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,195 @@
+import bisect
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; fine-grained at the low end where the redirect path sits
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Sampled(Metric):
+    """
+    One number per label set. With `collect`, values are read at scrape time
+    instead (a callable returning a number, or {labelvalues: number}), so
+    counts a component already keeps cost nothing extra on its hot path.
+    """
+
+    def __init__(self, name, help, labelnames=(), collect: Optional[Callable] = None):
+        super().__init__(name, help, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.collect = collect
+
+    def get(self, *labelvalues: str) -> float:
+        return self.samples().get(labelvalues, 0)
+
+    def samples(self) -> Dict[Tuple[str, ...], float]:
+        if self.collect is None:
+            return self.values
+        collected = self.collect()
+        return collected if isinstance(collected, dict) else {(): collected}
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in self.samples().items() if v is not None
+        ]
+
+
+class Counter(Sampled):
+    """Monotonic count per label set; inc() is one dict update"""
+    kind = "counter"
+
+    def inc(self, *labelvalues: str, amount: float = 1):
+        self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+
+class Gauge(Sampled):
+    """Point-in-time value per label set"""
+    kind = "gauge"
+
+    def set(self, value: float, *labelvalues: str):
+        self.values[labelvalues] = value
+
+
+class Histogram(Metric):
+    """Bucketed observations per label set; observe() is a bisect plus two adds"""
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[Tuple[str, ...], list] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *labelvalues: str):
+        series = self.series.get(labelvalues)
+        if series is None:
+            series = self.series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def time(self, *labelvalues: str):
+        return _Timer(self, labelvalues)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labelvalues, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {series[-1]}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
+        self.histogram.observe(self.elapsed, *self.labelvalues)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=(), collect=None) -> Counter:
+        return self.register(Counter(name, help, labelnames, collect))
+
+    def gauge(self, name, help, labelnames=(), collect=None) -> Gauge:
+        return self.register(Gauge(name, help, labelnames, collect))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request into a latency histogram and a
+    request counter, labelled by route template (not raw path, so /r/{click_id}
+    stays one series) and method. Requests refused by the rate limiter before
+    routing are labelled "rate_limited"; other unmatched paths share "unmatched".
+    """
+
+    def __init__(self, app, requests: Counter, latency: Histogram, exclude_paths=("/metrics",)):
+        self.app = app
+        self.requests = requests
+        self.latency = latency
+        self.exclude_paths = tuple(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or ("rate_limited" if scope.get("rate_limited") else "unmatched")
+            self.latency.observe(time.perf_counter() - started, path, scope["method"])
+            self.requests.inc(path, scope["method"], str(status[0]))
+
+
+# Global registry
+registry = Registry()
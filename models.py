@@ -88,8 +88,8 @@ class Conversion(SQLModel, table=True):
     offer_id: str = Field(foreign_key="offer.id")
     tenant_id: str = Field(foreign_key="tenant.id")
     order_id: str
-    sale_amount: float
-    commission_amount: float
+    sale_amount: int  # Integer paise
+    commission_amount: int  # Integer paise
     status: ConversionStatus = ConversionStatus.TRACKED
     created_at: datetime = Field(default_factory=datetime.utcnow)
     confirmed_at: Optional[datetime] = None
@@ -98,7 +98,7 @@ class Conversion(SQLModel, table=True):
 class Payout(SQLModel, table=True):
     id: Optional[str] = Field(default_factory=lambda: f"payout_{uuid.uuid4().hex[:8]}", primary_key=True)
     tenant_id: str = Field(foreign_key="tenant.id")
-    amount: float
+    amount: int  # Integer paise
     method: str  # "gift_card" or "upi"
     status: PayoutStatus = PayoutStatus.PENDING
     reference_id: Optional[str] = None  # GV code or UPI UTR
@@ -111,9 +111,9 @@ class LedgerEntry(SQLModel, table=True):
     conversion_id: Optional[str] = Field(foreign_key="conversion.id", default=None)
     payout_id: Optional[str] = Field(foreign_key="payout.id", default=None)
     type: str  # "commission", "payout", "adjustment"
-    amount: float
-    balance_before: float
-    balance_after: float
+    amount: int  # Integer paise
+    balance_before: int  # Integer paise
+    balance_after: int  # Integer paise
     description: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
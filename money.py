@@ -0,0 +1,74 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Iterable, Union
+
+PAISE_PER_RUPEE = 100
+
+
+def to_units(value: Union[float, int, str, Decimal], scale: int) -> int:
+    """value * scale as an integer, rounding half-up (rupees to paise, percentages to basis points)"""
+    if isinstance(value, float):
+        # repr() gives the shortest string that round-trips, so 0.1 is "0.1"
+        value = repr(value)
+    return int((Decimal(value) * scale).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_paise(rupees: Union[float, int, str, Decimal]) -> int:
+    """Convert a rupee amount to integer paise, rounding half-up"""
+    return to_units(rupees, PAISE_PER_RUPEE)
+
+
+def to_rupees(paise: int) -> float:
+    """Convert integer paise to rupees for API responses"""
+    return paise / PAISE_PER_RUPEE
+
+
+class Money(int):
+    """
+    An amount in integer paise.
+
+    Money is an int, so it is compact, compares and hashes as an int, and can
+    be summed or packed into integer arrays directly. Arithmetic between
+    Money values stays Money; .rupees converts at the API boundary.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_rupees(cls, rupees: Union[float, int, str, Decimal]) -> "Money":
+        return cls(to_paise(rupees))
+
+    @classmethod
+    def total(cls, amounts: Iterable[int]) -> "Money":
+        """Exact sum of paise amounts"""
+        return cls(sum(amounts))
+
+    @property
+    def rupees(self) -> float:
+        return to_rupees(self)
+
+    def __add__(self, other):
+        return Money(int(self) + int(other)) if isinstance(other, int) else NotImplemented
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return Money(int(self) - int(other)) if isinstance(other, int) else NotImplemented
+
+    def __rsub__(self, other):
+        return Money(int(other) - int(self)) if isinstance(other, int) else NotImplemented
+
+    def __neg__(self):
+        return Money(-int(self))
+
+    def __mul__(self, other):
+        # Scaling by a whole number (e.g. a count) keeps paise exact
+        return Money(int(self) * other) if isinstance(other, int) else NotImplemented
+
+    __rmul__ = __mul__
+
+    def __repr__(self):
+        return f"Money({int(self)})"
+
+    def __str__(self):
+        sign = "-" if self < 0 else ""
+        rupees, paise = divmod(abs(int(self)), PAISE_PER_RUPEE)
+        return f"{sign}₹{rupees}.{paise:02d}"
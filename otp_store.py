@@ -0,0 +1,265 @@
+import heapq
+import json
+import math
+import os
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+# Undo an increment, unless the counter has expired meanwhile (DECR would recreate it with no TTL)
+DECR_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('DECR', KEYS[1])
+end
+return 0
+"""
+
+
+class OTPError(Exception):
+    """OTP request refused; status_code and detail map onto the HTTP response"""
+
+    def __init__(self, detail: str, status_code: int = 400, retry_after: Optional[int] = None):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class MemoryOTPBackend:
+    """
+    In-process key/value store with per-key TTL.
+
+    Expiry times go on a min-heap; every write pops whatever has expired off
+    the top, so memory stays bounded by what is live without a sweeper task.
+    Reads also treat expired keys as missing.
+    """
+
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        self.expires: Dict[str, float] = {}
+        self.heap = []
+        self.evicted = 0
+
+    def _purge(self, now: float):
+        while self.heap and self.heap[0][0] <= now:
+            expires_at, key = heapq.heappop(self.heap)
+            # Skip heap entries left behind by a later write to the same key
+            if self.expires.get(key) == expires_at:
+                del self.data[key]
+                del self.expires[key]
+                self.evicted += 1
+
+    def _live(self, key: str, now: float) -> bool:
+        return key in self.data and self.expires[key] > now
+
+    def _put(self, key: str, value: Any, ttl: float, now: float):
+        self._purge(now)
+        expires_at = now + ttl
+        self.data[key] = value
+        self.expires[key] = expires_at
+        heapq.heappush(self.heap, (expires_at, key))
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.data[key] if self._live(key, time.time()) else None
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: float):
+        self._put(key, value, ttl, time.time())
+
+    async def delete(self, key: str):
+        self.data.pop(key, None)
+        self.expires.pop(key, None)
+
+    async def getdel(self, key: str) -> Optional[Any]:
+        """Read and delete a key in one step; only one caller gets the value"""
+        value = await self.get(key)
+        await self.delete(key)
+        return value
+
+    async def incr(self, key: str, ttl: float) -> int:
+        """Increment a counter; the TTL is set when the counter is created"""
+        now = time.time()
+        if self._live(key, now):
+            self.data[key] += 1
+            return self.data[key]
+        self._put(key, 1, ttl, now)
+        return 1
+
+    async def decr(self, key: str) -> int:
+        """Undo an increment; a counter that has expired stays gone"""
+        if not self._live(key, time.time()):
+            return 0
+        self.data[key] -= 1
+        return self.data[key]
+
+    async def ttl(self, key: str) -> int:
+        now = time.time()
+        return math.ceil(self.expires[key] - now) if self._live(key, now) else 0
+
+    def __len__(self):
+        return len(self.data)
+
+
+class RedisOTPBackend:
+    """Shared store for several workers; Redis expires the keys itself"""
+
+    def __init__(self, url: str, prefix: str = "hissaback:otp:"):
+        if redis_asyncio is None:
+            raise RuntimeError("OTP_REDIS_URL is set but the redis package is not installed")
+        self.client = redis_asyncio.Redis.from_url(url)
+        self.prefix = prefix
+        self.evicted = 0  # Redis does not report expiries back
+        self.decr_script = self.client.register_script(DECR_SCRIPT)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = await self.client.get(self.prefix + key)
+        return json.loads(raw) if raw else None
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: float):
+        await self.client.set(self.prefix + key, json.dumps(value), ex=max(1, math.ceil(ttl)))
+
+    async def delete(self, key: str):
+        await self.client.delete(self.prefix + key)
+
+    async def getdel(self, key: str) -> Optional[Any]:
+        """GETDEL: of several workers consuming the same key, only one gets it"""
+        raw = await self.client.getdel(self.prefix + key)
+        return json.loads(raw) if raw else None
+
+    async def incr(self, key: str, ttl: float) -> int:
+        # Create-with-TTL and increment in one MULTI, so no counter is left without an expiry
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(self.prefix + key, 0, ex=max(1, math.ceil(ttl)), nx=True)
+            pipe.incr(self.prefix + key)
+            _, count = await pipe.execute()
+        return count
+
+    async def decr(self, key: str) -> int:
+        return int(await self.decr_script(keys=[self.prefix + key]))
+
+    async def ttl(self, key: str) -> int:
+        return max(0, await self.client.ttl(self.prefix + key))
+
+    def __len__(self):
+        return 0  # Not tracked for a shared store
+
+
+class OTPStore:
+    """
+    One-time passwords that expire, with attempt and rate limits.
+
+    Each request is stored under its request_id for ttl_seconds and then
+    evicted. A code can be checked max_attempts times before the request is
+    thrown away (attempts are counted with an atomic increment before the
+    comparison), and is single-use once it matches: the request is consumed
+    with an atomic get-and-delete, so only one worker can verify it. OTP
+    requests are limited per phone and per client IP over fixed windows. The backend is in-process
+    by default; set OTP_REDIS_URL to share requests and limits across workers.
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        ttl_seconds: int = 300,
+        max_attempts: int = 5,
+        phone_limit: int = 10,
+        ip_limit: int = 100,
+        window_seconds: int = 900
+    ):
+        self.backend = backend if backend is not None else MemoryOTPBackend()
+        self.ttl_seconds = ttl_seconds
+        self.max_attempts = max_attempts
+        self.phone_limit = phone_limit
+        self.ip_limit = ip_limit
+        self.window_seconds = window_seconds
+        self.counters = {"issued": 0, "verified": 0, "failed_attempts": 0, "locked": 0, "rate_limited": 0}
+
+    @classmethod
+    def from_env(cls) -> "OTPStore":
+        url = os.environ.get("OTP_REDIS_URL")
+        return cls(
+            backend=RedisOTPBackend(url) if url else None,
+            ttl_seconds=int(os.environ.get("OTP_TTL_SECONDS", "300")),
+            max_attempts=int(os.environ.get("OTP_MAX_ATTEMPTS", "5")),
+            phone_limit=int(os.environ.get("OTP_PHONE_LIMIT", "10")),
+            ip_limit=int(os.environ.get("OTP_IP_LIMIT", "100")),
+            window_seconds=int(os.environ.get("OTP_RATE_WINDOW_SECONDS", "900"))
+        )
+
+    async def _check_limits(self, limits: Dict[str, int]):
+        """
+        Count the request against every limit, deciding on the counts the
+        atomic increments return, so concurrent requests (across workers too)
+        cannot all slip under a limit. A refused request's increments are
+        undone, so it does not use up the other limits.
+        """
+        counted = []
+        for key, limit in limits.items():
+            count = await self.backend.incr(key, self.window_seconds)
+            counted.append(key)
+            if count > limit:
+                for counted_key in counted:
+                    await self.backend.decr(counted_key)
+                self.counters["rate_limited"] += 1
+                raise OTPError("Too many OTP requests, try again later", status_code=429,
+                               retry_after=await self.backend.ttl(key) or self.window_seconds)
+
+    async def create(self, phone: str, code: str, purpose: str, ip: Optional[str] = None,
+                     request_id: Optional[str] = None, **context) -> Dict[str, Any]:
+        """Store a new OTP request for a phone, or raise OTPError(429) if limited"""
+        limits = {f"rl:phone:{phone}": self.phone_limit}
+        if ip:
+            limits[f"rl:ip:{ip}"] = self.ip_limit
+        await self._check_limits(limits)
+
+        now = time.time()
+        record = {
+            "request_id": request_id or str(uuid.uuid4()),
+            "phone": phone,
+            "otp": code,
+            "purpose": purpose,
+            "created_at": now,
+            "expires_at": now + self.ttl_seconds,
+            **context
+        }
+        await self.backend.set(f"req:{record['request_id']}", record, self.ttl_seconds)
+        self.counters["issued"] += 1
+        return record
+
+    async def verify(self, request_id: str, code: str, purpose: str) -> Dict[str, Any]:
+        """Check a code and consume the request; raise OTPError if it does not match"""
+        key = f"req:{request_id}"
+        record = await self.backend.get(key)
+        if record is None or record["purpose"] != purpose:
+            raise OTPError("Invalid request ID or OTP expired")
+
+        # Counted before comparing, so concurrent guesses cannot exceed max_attempts
+        attempts = await self.backend.incr(f"attempts:{request_id}", max(1, record["expires_at"] - time.time()))
+        if attempts > self.max_attempts:
+            await self.backend.delete(key)
+            raise OTPError("Invalid OTP code; too many attempts, request a new OTP", status_code=429)
+
+        if record["otp"] != code:
+            self.counters["failed_attempts"] += 1
+            if attempts >= self.max_attempts:
+                self.counters["locked"] += 1
+                await self.backend.delete(key)
+                raise OTPError("Invalid OTP code; too many attempts, request a new OTP", status_code=429)
+            raise OTPError("Invalid OTP code")
+
+        if await self.backend.getdel(key) is None:
+            raise OTPError("Invalid request ID or OTP expired")  # Another worker consumed it first
+        await self.backend.delete(f"attempts:{request_id}")
+        self.counters["verified"] += 1
+        return record
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "keys": len(self.backend), "evicted": self.backend.evicted}
+
+
+# Global instance
+otp_store = OTPStore.from_env()
@@ -0,0 +1,220 @@
+import asyncio
+import random
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class PayoutProviderError(Exception):
+    """Provider call failed; retryable errors are tried again with backoff"""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class RateLimitedError(PayoutProviderError):
+    """Provider answered 429; retry_after is the provider's hint in seconds"""
+
+    def __init__(self, message: str = "Rate limited by provider", retry_after: float = 1.0):
+        super().__init__(message, retryable=True)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        """Take a token if one is available, without waiting"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SimulatorPayoutProvider:
+    """Adapts PayoutSimulator to the async provider interface"""
+
+    def __init__(self, simulator, method: str, latency: float = 0.0):
+        self.simulator = simulator
+        self.method = method
+        self.latency = latency
+
+    async def issue(self, amount: float, idempotency_key: str) -> Dict[str, Any]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.simulator.process_payout(amount, self.method)
+
+
+class FakePayoutProvider:
+    """Local stand-in for AGCOD/UPI with fixed latency and a failure rate, for benchmarks"""
+
+    def __init__(self, method: str = "gift_card", latency: float = 0.2, failure_rate: float = 0.0):
+        self.method = method
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+
+    async def issue(self, amount: float, idempotency_key: str) -> Dict[str, Any]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise PayoutProviderError("Provider timeout")
+        return {
+            "status": "completed",
+            "method": self.method,
+            "reference_id": f"FAKE-{uuid.uuid4().hex[:12].upper()}",
+            "amount": amount
+        }
+
+
+class PayoutDispatcher:
+    """
+    Fans payouts out to providers concurrently.
+
+    Each method has a provider, a token-bucket rate limit and a concurrency
+    cap. Calls are retried with exponential backoff (honouring retry_after
+    on rate-limit responses) and deduplicated on an idempotency key, so a
+    payout that already completed is never issued twice.
+    """
+
+    def __init__(self, max_attempts: int = 3, retry_backoff: float = 0.2, max_backoff: float = 5.0, result_cache_size: int = 100000):
+        self.providers: Dict[str, Dict[str, Any]] = {}
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.result_cache_size = result_cache_size
+        self.completed: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.counters = {"dispatched": 0, "completed": 0, "failed": 0, "retried": 0, "deduplicated": 0}
+        self._loop = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def register(self, method: str, provider, rate_per_second: float, burst: Optional[float] = None, max_concurrency: int = 8):
+        """Register the provider and limits used for a payout method"""
+        self.providers[method] = {
+            "provider": provider,
+            "bucket": TokenBucket(rate_per_second, burst),
+            "max_concurrency": max_concurrency
+        }
+
+    def _semaphore(self, method: str) -> asyncio.Semaphore:
+        # Semaphores bind to the loop they first wait on; rebuild them per loop
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphores = {}
+            self._in_flight = {}
+        if method not in self._semaphores:
+            self._semaphores[method] = asyncio.Semaphore(self.providers[method]["max_concurrency"])
+        return self._semaphores[method]
+
+    async def dispatch(self, payouts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Issue a list of payouts concurrently.
+        Each payout is {"method", "amount", "idempotency_key"}; results come
+        back in the same order with status completed/failed.
+        """
+        return await asyncio.gather(*(self.dispatch_one(p) for p in payouts))
+
+    async def dispatch_one(self, payout: Dict[str, Any]) -> Dict[str, Any]:
+        key = payout.get("idempotency_key") or f"payout_{uuid.uuid4().hex}"
+        if key in self.completed:
+            self.counters["deduplicated"] += 1
+            return {**self.completed[key], "deduplicated": True}
+
+        if payout["method"] not in self.providers:
+            raise ValueError(f"Unsupported payout method: {payout['method']}")
+        semaphore = self._semaphore(payout["method"])
+        if key in self._in_flight:
+            self.counters["deduplicated"] += 1
+            return {**(await asyncio.shield(self._in_flight[key])), "deduplicated": True}
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await self._issue(payout, key, semaphore)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            self._in_flight.pop(key, None)
+
+    async def _issue(self, payout: Dict[str, Any], key: str, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        config = self.providers[payout["method"]]
+        self.counters["dispatched"] += 1
+        started = time.perf_counter()
+        error = None
+        attempts = 0
+        while attempts < self.max_attempts:
+            attempts += 1
+            await config["bucket"].acquire()
+            try:
+                async with semaphore:
+                    receipt = await config["provider"].issue(payout["amount"], key)
+            except PayoutProviderError as e:
+                error = e
+                if not e.retryable or attempts >= self.max_attempts:
+                    break
+                self.counters["retried"] += 1
+                delay = min(self.retry_backoff * (2 ** (attempts - 1)), self.max_backoff)
+                await asyncio.sleep(max(delay, getattr(e, "retry_after", 0)))
+                continue
+
+            result = {
+                "idempotency_key": key,
+                "status": "completed",
+                "method": payout["method"],
+                "amount": payout["amount"],
+                "reference_id": receipt["reference_id"],
+                "receipt": receipt.get("receipt"),
+                "attempts": attempts,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 2)
+            }
+            self.counters["completed"] += 1
+            self.completed[key] = result
+            if len(self.completed) > self.result_cache_size:
+                self.completed.popitem(last=False)
+            return result
+
+        self.counters["failed"] += 1
+        return {
+            "idempotency_key": key,
+            "status": "failed",
+            "method": payout["method"],
+            "amount": payout["amount"],
+            "error": str(error),
+            "attempts": attempts,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "providers": sorted(self.providers)}
@@ -1,21 +1,43 @@
+import asyncio
+import math
 import random
 import string
+import time
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import json
 
+from payout_dispatcher import PayoutDispatcher, PayoutProviderError, RateLimitedError, TokenBucket
+from tracing import tracer
+
+@tracer.trace_methods("payout_simulator")
 class PayoutSimulator:
     """Simulates payout processing for demo purposes"""
     
-    def __init__(self):
-        self.gv_codes = []
-        self.upi_utrs = []
+    def __init__(self, history_limit: int = 10000):
+        # Size-capped history (oldest evicted first) with a reference index,
+        # so long-running environments replaying real volumes stay bounded
+        self.history = deque(maxlen=history_limit)
+        self.history_by_reference = {}
+        self.totals = {'gift_card': 0, 'upi': 0}
+    
+    def record(self, entry: Dict[str, Any]):
+        """Append to the capped history, evicting the oldest entry when full"""
+        if len(self.history) == self.history.maxlen:
+            evicted = self.history[0]
+            self.history_by_reference.pop(evicted['reference_id'], None)
+        self.history.append(entry)
+        self.history_by_reference[entry['reference_id']] = entry
+        self.totals[entry['method']] += 1
     
     def generate_gift_card_code(self, amount: float) -> str:
         """Generate a dummy Amazon Gift Card code"""
         # Format: XXXX-XXXX-XXXX-XXXX
         code = '-'.join([''.join(random.choices(string.ascii_uppercase + string.digits, k=4)) for _ in range(4)])
-        self.gv_codes.append({
+        self.record({
+            'reference_id': code,
+            'method': 'gift_card',
             'code': code,
             'amount': amount,
             'generated_at': datetime.utcnow().isoformat(),
@@ -27,7 +49,9 @@ class PayoutSimulator:
         """Generate a dummy UPI UTR number"""
         # Format: UTR + 12 digits
         utr = 'UTR' + ''.join(random.choices(string.digits, k=12))
-        self.upi_utrs.append({
+        self.record({
+            'reference_id': utr,
+            'method': 'upi',
             'utr': utr,
             'amount': amount,
             'generated_at': datetime.utcnow().isoformat(),
@@ -70,13 +94,231 @@ class PayoutSimulator:
         else:
             raise ValueError(f"Unsupported payout method: {method}")
     
-    def get_payout_history(self) -> Dict[str, Any]:
-        """Get payout history for demo"""
+    def get_payout_history(
+        self,
+        method: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        min_amount: Optional[float] = None,
+        max_amount: Optional[float] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Get a page of payout history, newest first.
+        date_from/date_to are ISO dates (YYYY-MM-DD), inclusive.
+        """
+        items = []
+        matched = 0
+        has_more = False
+        for entry in reversed(self.history):
+            day = entry['generated_at'][:10]
+            if date_from and day < date_from:
+                break  # History is in time order, nothing older can match
+            if date_to and day > date_to:
+                continue
+            if method and entry['method'] != method:
+                continue
+            if min_amount is not None and entry['amount'] < min_amount:
+                continue
+            if max_amount is not None and entry['amount'] > max_amount:
+                continue
+            matched += 1
+            if matched <= offset:
+                continue
+            if len(items) == limit:
+                has_more = True
+                break
+            items.append(entry)
+        
         return {
-            'gift_cards': self.gv_codes,
-            'upi_transfers': self.upi_utrs,
-            'total_processed': len(self.gv_codes) + len(self.upi_utrs)
+            'items': items,
+            'count': len(items),
+            'limit': limit,
+            'offset': offset,
+            'has_more': has_more,
+            'retained': len(self.history),
+            'total_processed': sum(self.totals.values()),
+            'totals_by_method': dict(self.totals)
+        }
+    
+    def get_payout(self, reference_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a retained payout by GV code or UTR"""
+        return self.history_by_reference.get(reference_id)
+
+# Load mode: simulated providers with realistic latency, failures and 429s
+
+class LatencyProfile:
+    """
+    Provider latency distribution, in seconds.
+    kind is 'fixed' (a), 'uniform' (a..b) or 'lognormal' (median a, sigma b),
+    written as e.g. 'lognormal:0.2:0.5'.
+    """
+    
+    def __init__(self, kind: str = 'lognormal', a: float = 0.2, b: float = 0.5):
+        if kind not in ('fixed', 'uniform', 'lognormal'):
+            raise ValueError(f"Unsupported latency distribution: {kind}")
+        if kind == 'lognormal' and (a <= 0 or b < 0):
+            raise ValueError("lognormal latency needs a median > 0 and sigma >= 0")
+        if kind != 'lognormal' and (a < 0 or (kind == 'uniform' and b < a)):
+            raise ValueError("latency bounds must be >= 0 and ordered")
+        self.kind = kind
+        self.a = a
+        self.b = b
+    
+    @classmethod
+    def parse(cls, spec: str) -> 'LatencyProfile':
+        kind, *params = spec.split(':')
+        return cls(kind, *(float(p) for p in params))
+    
+    def sample(self) -> float:
+        if self.kind == 'fixed':
+            return self.a
+        if self.kind == 'uniform':
+            return random.uniform(self.a, self.b)
+        return random.lognormvariate(math.log(self.a), self.b)
+
+
+class SimulatedProvider:
+    """
+    Async payout provider backed by a PayoutSimulator.
+    Each call waits a sampled latency, then fails with failure_rate, answers
+    429 with rate_limit_rate or when calls exceed the provider's own
+    capacity (capacity_per_second), and otherwise issues a GV code or UTR.
+    """
+    
+    def __init__(
+        self,
+        simulator: PayoutSimulator,
+        method: str,
+        latency: Optional[LatencyProfile] = None,
+        failure_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        capacity_per_second: Optional[float] = None,
+        retry_after: float = 0.5
+    ):
+        self.simulator = simulator
+        self.method = method
+        self.latency = latency or LatencyProfile()
+        self.failure_rate = failure_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.capacity = TokenBucket(capacity_per_second) if capacity_per_second else None
+        self.retry_after = retry_after
+        self.counters = {'calls': 0, 'issued': 0, 'failed': 0, 'rate_limited': 0}
+    
+    async def issue(self, amount: float, idempotency_key: str) -> Dict[str, Any]:
+        self.counters['calls'] += 1
+        if self.capacity and not self.capacity.try_acquire():
+            self.counters['rate_limited'] += 1
+            raise RateLimitedError(retry_after=self.retry_after)
+        await asyncio.sleep(self.latency.sample())
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            self.counters['rate_limited'] += 1
+            raise RateLimitedError(retry_after=self.retry_after)
+        if roll < self.rate_limit_rate + self.failure_rate:
+            self.counters['failed'] += 1
+            raise PayoutProviderError('Provider timeout')
+        self.counters['issued'] += 1
+        return self.simulator.process_payout(amount, self.method)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+async def run_load(
+    volume: int = 1000,
+    methods: Optional[Dict[str, float]] = None,
+    latency: Optional[LatencyProfile] = None,
+    failure_rate: float = 0.02,
+    rate_limit_rate: float = 0.01,
+    capacity_per_second: Optional[float] = None,
+    dispatch_rate: float = 200,
+    concurrency: int = 64,
+    max_attempts: int = 3,
+    retry_backoff: float = 0.05,
+    amounts: tuple = (10.0, 2000.0)
+) -> Dict[str, Any]:
+    """
+    Push `volume` payouts through a PayoutDispatcher against simulated
+    providers and report throughput, tail latency and outcomes.
+    methods maps payout method to its share of the volume.
+    """
+    methods = methods or {'gift_card': 0.7, 'upi': 0.3}
+    simulator = PayoutSimulator(history_limit=max(volume, 1))
+    dispatcher = PayoutDispatcher(max_attempts=max_attempts, retry_backoff=retry_backoff)
+    providers = {}
+    for method in methods:
+        providers[method] = SimulatedProvider(
+            simulator, method, latency=latency, failure_rate=failure_rate,
+            rate_limit_rate=rate_limit_rate, capacity_per_second=capacity_per_second
+        )
+        dispatcher.register(method, providers[method], rate_per_second=dispatch_rate, max_concurrency=concurrency)
+    
+    names, weights = zip(*methods.items())
+    payouts = [
+        {
+            'method': random.choices(names, weights)[0],
+            'amount': round(random.uniform(*amounts), 2),
+            'idempotency_key': f'load_{i}'
         }
+        for i in range(volume)
+    ]
+    
+    started = time.perf_counter()
+    results = await dispatcher.dispatch(payouts)
+    elapsed = time.perf_counter() - started
+    
+    latencies = sorted(r['latency_ms'] for r in results)
+    completed = [r for r in results if r['status'] == 'completed']
+    return {
+        'volume': volume,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_per_s': round(volume / elapsed, 1) if elapsed else None,
+        'completed': len(completed),
+        'failed': volume - len(completed),
+        'latency_ms': {
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1] if latencies else 0.0
+        },
+        'attempts': sum(r['attempts'] for r in results),
+        'dispatcher': dispatcher.stats(),
+        'providers': {method: dict(p.counters) for method, p in providers.items()}
+    }
 
 # Global instance
-payout_simulator = PayoutSimulator() 
\ No newline at end of file
+payout_simulator = PayoutSimulator()
+
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Payout pipeline load test against simulated providers')
+    parser.add_argument('--volume', type=int, default=1000)
+    parser.add_argument('--latency', default='lognormal:0.2:0.5', help="fixed:A, uniform:A:B or lognormal:MEDIAN:SIGMA (seconds)")
+    parser.add_argument('--failure-rate', type=float, default=0.02)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.01)
+    parser.add_argument('--capacity', type=float, default=None, help='Provider-side requests/s before answering 429')
+    parser.add_argument('--dispatch-rate', type=float, default=200)
+    parser.add_argument('--concurrency', type=int, default=64)
+    args = parser.parse_args()
+    
+    report = asyncio.run(run_load(
+        volume=args.volume,
+        latency=LatencyProfile.parse(args.latency),
+        failure_rate=args.failure_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        capacity_per_second=args.capacity,
+        dispatch_rate=args.dispatch_rate,
+        concurrency=args.concurrency
+    ))
+    print(f"💸 Payout load test: {report['volume']} payouts in {report['elapsed_s']} s ({report['throughput_per_s']}/s)")
+    print(f"  completed {report['completed']}, failed {report['failed']}, attempts {report['attempts']}")
+    print(f"  latency p50 {report['latency_ms']['p50']} ms, p95 {report['latency_ms']['p95']} ms, "
+          f"p99 {report['latency_ms']['p99']} ms, max {report['latency_ms']['max']} ms")
+    print(f"  providers {json.dumps(report['providers'])}") 
\ No newline at end of file
@@ -0,0 +1,177 @@
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+
+class RateLimit:
+    """`rate` requests per second per key, with bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+
+    @classmethod
+    def parse(cls, spec: str) -> "RateLimit":
+        """'rate' or 'rate:burst', e.g. '20:100'"""
+        rate, _, burst = spec.partition(":")
+        return cls(float(rate), float(burst) if burst else None)
+
+    def __repr__(self):
+        return f"RateLimit({self.rate}/s, burst={self.burst})"
+
+
+class MemoryBucketStore:
+    """
+    Token buckets held in-process, one (tokens, updated) pair per key.
+    At most max_keys buckets are kept; the least recently used is dropped
+    first, which only forgets an idle key (its bucket would be full again).
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.evicted = 0
+
+    async def take(self, key: str, limit: RateLimit) -> float:
+        """Take a token; returns 0 when allowed, else seconds until one is available"""
+        now = time.monotonic()
+        state = self.buckets.get(key)
+        if state is None:
+            tokens = limit.burst
+        else:
+            tokens = min(limit.burst, state[0] + (now - state[1]) * limit.rate)
+            self.buckets.move_to_end(key)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / limit.rate
+        self.buckets[key] = (tokens, now)
+        if len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+            self.evicted += 1
+        return wait
+
+    def __len__(self):
+        return len(self.buckets)
+
+
+# Refill and take in one step so workers sharing Redis never race
+TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBucketStore:
+    """Token buckets shared by every worker; idle buckets expire once full"""
+
+    def __init__(self, url: str, prefix: str = "hissaback:rl:"):
+        if redis_asyncio is None:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set but the redis package is not installed")
+        self.client = redis_asyncio.Redis.from_url(url)
+        self.script = self.client.register_script(TAKE_SCRIPT)
+        self.prefix = prefix
+        self.evicted = 0
+
+    async def take(self, key: str, limit: RateLimit) -> float:
+        return float(await self.script(keys=[self.prefix + key], args=[limit.rate, limit.burst, time.time()]))
+
+    def __len__(self):
+        return 0  # Not tracked for a shared store
+
+
+class RateLimiter:
+    """
+    Checks a request against one token bucket per scope it carries
+    (e.g. {"ip": "1.2.3.4", "tenant": "tnt_101"}); scopes without a
+    configured limit are ignored.
+    """
+
+    def __init__(self, limits: Dict[str, RateLimit], store=None):
+        self.limits = limits
+        self.store = store or MemoryBucketStore()
+        self.counters = {"allowed": 0, "limited": 0}
+        self.limited_by_scope = {scope: 0 for scope in limits}
+
+    async def check(self, keys: Dict[str, str]) -> Optional[Tuple[str, float]]:
+        """None if allowed, else (scope, retry_after_seconds) for the first exhausted bucket"""
+        for scope, key in keys.items():
+            limit = self.limits.get(scope)
+            if limit is None or not key:
+                continue
+            wait = await self.store.take(f"{scope}:{key}", limit)
+            if wait > 0:
+                self.counters["limited"] += 1
+                self.limited_by_scope[scope] += 1
+                return scope, wait
+        self.counters["allowed"] += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "limited_by_scope": dict(self.limited_by_scope),
+            "limits": {scope: {"rate": l.rate, "burst": l.burst} for scope, l in self.limits.items()},
+            "buckets": len(self.store),
+            "evicted": self.store.evicted
+        }
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware answering 429 with Retry-After once a request's bucket
+    is empty. key_func(scope) returns the request's {scope_name: key}.
+    Paths starting with an exempt prefix are never limited. Refused requests
+    never reach routing; scope["rate_limited"] records which bucket refused them.
+    """
+
+    def __init__(self, app, limiter: RateLimiter, key_func: Callable[[Dict[str, Any]], Dict[str, str]],
+                 exempt_prefixes=("/health", "/static")):
+        self.app = app
+        self.limiter = limiter
+        self.key_func = key_func
+        self.exempt_prefixes = tuple(exempt_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        denied = await self.limiter.check(self.key_func(scope))
+        if denied is None:
+            await self.app(scope, receive, send)
+            return
+
+        limited_scope, wait = denied
+        scope["rate_limited"] = limited_scope
+        body = json.dumps({"detail": f"Rate limit exceeded ({limited_scope})"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(wait))).encode())
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
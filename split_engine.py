@@ -0,0 +1,119 @@
+from typing import Any, Dict, List, Sequence
+
+from money import PAISE_PER_RUPEE, to_rupees, to_units
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, fall back to integer list arithmetic
+    np = None
+
+# Amounts are computed in integer paise and percentages in basis points, so
+# every split is exact and user_amount + creator_amount == base_commission.
+BASIS_POINTS = 10000
+
+
+def _round_half_up(numerator: int, denominator: int) -> int:
+    """Integer division rounding half away from zero"""
+    sign = -1 if numerator < 0 else 1
+    return sign * ((abs(numerator) * 2 + denominator) // (2 * denominator))
+
+
+class SplitEngine:
+    """
+    Computes commission splits over columns of ledger entries.
+
+    base_commission = sale_amount * base_commission_pct / 100, rounded half-up
+    to the paisa; the user gets (100 - share_pct)% of that, rounded half-up,
+    and the creator gets the remainder. Uses NumPy when installed and plain
+    integer arithmetic otherwise; both give identical results.
+    """
+
+    def __init__(self, use_numpy: bool = True):
+        self.use_numpy = use_numpy and np is not None
+
+    def split(self, sale_amount: float, base_commission_pct: float, share_pct: float) -> Dict[str, float]:
+        """Split a single conversion"""
+        result = self.split_batch([sale_amount], [base_commission_pct], [share_pct])
+        return {column: values[0] for column, values in result.items()}
+
+    def split_batch(
+        self,
+        sale_amounts: Sequence[float],
+        base_commission_pcts: Sequence[float],
+        share_pcts: Sequence[float]
+    ) -> Dict[str, List[float]]:
+        """
+        Split a batch given as equal-length columns.
+        Returns columns base_commission, user_pct, user_amount and
+        creator_amount in rupees, plus the amounts as integer *_paise
+        columns, in input order.
+        """
+        if not len(sale_amounts) == len(base_commission_pcts) == len(share_pcts):
+            raise ValueError("Split columns must have the same length")
+        if self.use_numpy:
+            return self._split_numpy(sale_amounts, base_commission_pcts, share_pcts)
+        return self._split_python(sale_amounts, base_commission_pcts, share_pcts)
+
+    def _split_python(self, sale_amounts, base_commission_pcts, share_pcts) -> Dict[str, List[float]]:
+        sale_paise = [to_units(v, PAISE_PER_RUPEE) for v in sale_amounts]
+        commission_bp = [to_units(v, 100) for v in base_commission_pcts]
+        user_bp = [BASIS_POINTS - to_units(v, 100) for v in share_pcts]
+
+        commission = [_round_half_up(s * c, BASIS_POINTS) for s, c in zip(sale_paise, commission_bp)]
+        user = [_round_half_up(c * u, BASIS_POINTS) for c, u in zip(commission, user_bp)]
+        creator = [c - u for c, u in zip(commission, user)]
+        return {
+            "base_commission": [to_rupees(c) for c in commission],
+            "user_pct": [u / 100 for u in user_bp],
+            "user_amount": [to_rupees(u) for u in user],
+            "creator_amount": [to_rupees(c) for c in creator],
+            "sale_amount_paise": sale_paise,
+            "base_commission_paise": commission,
+            "user_amount_paise": user,
+            "creator_amount_paise": creator
+        }
+
+    def _split_numpy(self, sale_amounts, base_commission_pcts, share_pcts) -> Dict[str, List[float]]:
+        def units(values, scale):
+            # Converted one by one with money's rounding, so both paths and the ledger agree
+            return np.fromiter((to_units(v, scale) for v in values), dtype=np.int64, count=len(values))
+
+        def round_half_up(numerator, denominator):
+            return np.sign(numerator) * ((np.abs(numerator) * 2 + denominator) // (2 * denominator))
+
+        sale_paise = units(sale_amounts, PAISE_PER_RUPEE)
+        commission_bp = units(base_commission_pcts, 100)
+        user_bp = BASIS_POINTS - units(share_pcts, 100)
+
+        commission = round_half_up(sale_paise * commission_bp, BASIS_POINTS)
+        user = round_half_up(commission * user_bp, BASIS_POINTS)
+        creator = commission - user
+        return {
+            "base_commission": (commission / PAISE_PER_RUPEE).tolist(),
+            "user_pct": (user_bp / 100).tolist(),
+            "user_amount": (user / PAISE_PER_RUPEE).tolist(),
+            "creator_amount": (creator / PAISE_PER_RUPEE).tolist(),
+            "sale_amount_paise": sale_paise.tolist(),
+            "base_commission_paise": commission.tolist(),
+            "user_amount_paise": user.tolist(),
+            "creator_amount_paise": creator.tolist()
+        }
+
+    def recalculate(self, entries: List[Dict[str, Any]], base_commission_pcts: Sequence[float], share_pcts: Sequence[float]) -> List[Dict[str, Any]]:
+        """
+        Re-derive splits for ledger entries under new percentages.
+        Returns one row per entry with the current and recalculated amounts.
+        """
+        result = self.split_batch([e["sale_amount"] for e in entries], base_commission_pcts, share_pcts)
+        return [
+            {
+                "ledger_id": entry["ledger_id"],
+                "current_user_amount_paise": entry["user_amount_paise"],
+                "current_creator_amount_paise": entry["creator_amount_paise"],
+                **{column: values[i] for column, values in result.items() if column != "sale_amount_paise"}
+            }
+            for i, entry in enumerate(entries)
+        ]
+
+
+split_engine = SplitEngine()
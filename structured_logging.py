@@ -0,0 +1,222 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+ROOT_LOGGER = "hissaback"
+
+# Fields added to every event logged in the current context (e.g. request_id)
+log_context: ContextVar[Dict[str, Any]] = ContextVar("log_context", default={})
+
+# Per-request events on the hottest paths; warnings and errors are never sampled
+DEFAULT_SAMPLE_RATES = {
+    "click.tracked": 0.01,
+    "click.filtered": 0.1,
+    "landing.served": 0.01
+}
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """"click.tracked=0.01,landing.served=0.1" -> {event: rate}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        event, _, rate = item.partition("=")
+        rates[event.strip()] = max(0.0, min(1.0, float(rate)))
+    return rates
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, event, then the event's fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": getattr(record, "event", None) or record.getMessage()
+        }
+        entry.update(getattr(record, "fields", {}))
+        if getattr(record, "sample_rate", None) is not None:
+            entry["sample_rate"] = record.sample_rate
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable line for local development: time, level, event, key=value fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{k}={v}" for k, v in getattr(record, "fields", {}).items())
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {getattr(record, 'event', None) or record.getMessage()}"
+        line = f"{line} {fields}" if fields else line
+        return f"{line}\n{record.exc_text}" if record.exc_text else line
+
+
+class StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is at emit time (it may be swapped after setup)"""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread without formatting them; when the
+    queue is full the record is dropped and counted rather than blocking
+    the caller.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """
+    Structured logging for the app: records go on a bounded in-memory queue
+    and are formatted and written by a background QueueListener thread, so
+    logging on a request path costs an enqueue. Events listed in
+    sample_rates are kept with that probability at INFO and below.
+    """
+
+    def __init__(
+        self,
+        level: str = "INFO",
+        fmt: str = "json",
+        sample_rates: Optional[Dict[str, float]] = None,
+        queue_size: int = 10000,
+        handler: Optional[logging.Handler] = None,
+        name: str = ROOT_LOGGER
+    ):
+        self.level = logging.getLevelName(level.upper()) if isinstance(level, str) else level
+        self.sample_rates = dict(DEFAULT_SAMPLE_RATES if sample_rates is None else sample_rates)
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.output = handler or StdoutHandler()
+        self.output.setFormatter(JSONFormatter() if fmt == "json" else TextFormatter())
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.logger = logging.getLogger(name)
+        self.counters = {"logged": 0, "sampled_out": 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "LogPipeline":
+        rates = dict(DEFAULT_SAMPLE_RATES)
+        rates.update(parse_sample_rates(os.environ.get("LOG_SAMPLE_RATES", "")))
+        return cls(
+            level=os.environ.get("LOG_LEVEL", "INFO"),
+            fmt=os.environ.get("LOG_FORMAT", "json"),
+            sample_rates=rates,
+            queue_size=int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+        )
+
+    def start(self):
+        """Attach the queue handler and start the writer thread (idempotent)"""
+        with self._lock:
+            if self.listener is not None:
+                return
+            self.logger.setLevel(self.level)
+            self.logger.propagate = False
+            self.logger.handlers = [self.handler]
+            self.listener = logging.handlers.QueueListener(self.queue, self.output, respect_handler_level=True)
+            self.listener.start()
+
+    def stop(self):
+        """Write out everything queued and stop the writer thread"""
+        with self._lock:
+            if self.listener is None:
+                return
+            self.listener.stop()
+            self.listener = None
+            self.logger.removeHandler(self.handler)
+
+    def sampled(self, event: str, level: int) -> Optional[float]:
+        """None to drop the event, otherwise its sample rate (1.0 when unsampled)"""
+        rate = self.sample_rates.get(event) if level < logging.WARNING else None
+        if rate is None:
+            return 1.0
+        if rate < 1.0 and random.random() >= rate:
+            self.counters["sampled_out"] += 1
+            return None
+        return rate
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "dropped": self.handler.dropped,
+            "queued": self.queue.qsize(),
+            "running": self.listener is not None,
+            "sample_rates": dict(self.sample_rates)
+        }
+
+
+class EventLogger:
+    """
+    Logger taking an event name and keyword fields:
+    log.info("click.tracked", click_id=..., link_id=...)
+    """
+
+    def __init__(self, name: str, pipeline: LogPipeline):
+        self.logger = pipeline.logger.getChild(name)
+        self.pipeline = pipeline
+
+    def log(self, level: int, event: str, exc_info=None, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        rate = self.pipeline.sampled(event, level)
+        if rate is None:
+            return
+        self.pipeline.counters["logged"] += 1
+        context = log_context.get()
+        if context:
+            fields = {**context, **fields}
+        extra = {"event": event, "fields": fields, "sample_rate": rate if rate < 1.0 else None}
+        self.logger.log(level, event, extra=extra, exc_info=exc_info)
+
+    def debug(self, event: str, **fields):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event: str, exc_info=None, **fields):
+        self.log(logging.ERROR, event, exc_info=exc_info, **fields)
+
+
+# Global pipeline; started by the first get_logger() call
+log_pipeline = LogPipeline.from_env()
+atexit.register(log_pipeline.stop)
+
+
+def get_logger(name: str) -> EventLogger:
+    log_pipeline.start()
+    return EventLogger(name, log_pipeline)
@@ -0,0 +1,82 @@
+import pytest
+import uuid
+from fastapi.testclient import TestClient
+from app import app, db, api_key_auth
+from auth import token_auth
+from api_keys import APIKeyAuth, APIKeyError, hash_api_key
+
+# Test client
+client = TestClient(app)
+
+def creator_token(tenant_id):
+    return token_auth.issue(tenant_id, role="creator", tenant_id=tenant_id)
+
+class TestAPIKeys:
+    """
+    Test scenarios for partner API-key authentication and metering
+    """
+
+    def setup_method(self):
+        digits = f"{uuid.uuid4().int % 10**8:08d}"
+        signup = client.post("/v1/creators/signup", json={
+            "name": "API Partner",
+            "email": f"partner{digits}@example.com",
+            "phone": f"+9172{digits}"
+        }).json()
+        self.tenant_id = signup["tenant_id"]
+        self.api_key = signup["api_key"]
+        self.creator_headers = {"Authorization": f"Bearer {creator_token(self.tenant_id)}"}
+
+    def test_only_digest_stored(self):
+        """Signup returns the key once; the tenant and index hold only its hash"""
+        assert self.api_key.startswith("pk_live_")
+        assert "api_key" not in db.get_tenant(self.tenant_id)
+        record = db.get_api_key(hash_api_key(self.api_key))
+        assert record["tenant_id"] == self.tenant_id
+        listed = client.get("/v1/creator/api_keys", headers=self.creator_headers).json()["api_keys"]
+        assert [k["key_id"] for k in listed] == [record["key_id"]]
+        assert "key_hash" not in listed[0]
+
+    def test_offers_metered_per_key(self):
+        """Keyed /v1/offers calls are authenticated, counted and served from the LRU"""
+        hits, lookups = api_key_auth.counters["cache_hits"], api_key_auth.counters["lookups"]
+        for _ in range(3):
+            response = client.get("/v1/offers", headers={"X-API-Key": self.api_key})
+            assert response.status_code == 200
+        # One store lookup (by the rate limiter); every later check, its own and auth's, hits the cache
+        assert api_key_auth.counters["lookups"] == lookups + 1
+        assert api_key_auth.counters["cache_hits"] == hits + 5
+        assert self.api_key not in api_key_auth.cache  # Cached by hash, never by the raw key
+        assert hash_api_key(self.api_key) in api_key_auth.cache
+
+        [key] = client.get("/v1/creator/api_keys", headers=self.creator_headers).json()["api_keys"]
+        assert key["usage"]["requests"] == 3
+        assert key["usage"]["by_path"] == {"/v1/offers": 3}
+
+        assert client.get("/v1/offers", headers={"X-API-Key": "pk_live_unknown"}).status_code == 401
+        assert client.get("/v1/offers").status_code == 200  # Anonymous access unless API_KEY_REQUIRED=1
+
+    def test_revoked_key_rejected(self):
+        """Revocation takes effect immediately despite the cache"""
+        assert client.get("/v1/offers", headers={"X-API-Key": self.api_key}).status_code == 200
+        key_id = db.get_api_key(hash_api_key(self.api_key))["key_id"]
+        assert client.delete(f"/v1/creator/api_keys/{key_id}", headers=self.creator_headers).json()["status"] == "revoked"
+        assert client.get("/v1/offers", headers={"X-API-Key": self.api_key}).status_code == 401
+
+        other = {"Authorization": f"Bearer {creator_token('tnt_101')}"}
+        assert client.delete(f"/v1/creator/api_keys/{key_id}", headers=other).status_code == 404
+
+    def test_quota_per_minute(self):
+        """Requests over a key's per-minute quota are refused with Retry-After"""
+        records = {}
+        auth = APIKeyAuth(records.get, quota_per_minute=2)
+        records[hash_api_key("pk_live_quota")] = {"key_id": "key_quota", "tenant_id": "tnt_101", "status": "active"}
+
+        auth.authenticate("pk_live_quota")
+        auth.authenticate("pk_live_quota")
+        with pytest.raises(APIKeyError) as error:
+            auth.authenticate("pk_live_quota")
+        assert error.value.status_code == 429
+        assert 0 < error.value.retry_after <= 60
+        assert auth.key_usage("key_quota")["throttled"] == 1
+        assert auth.counters["lookups"] == 1
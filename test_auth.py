@@ -0,0 +1,107 @@
+import pytest
+import time
+import uuid
+from fastapi.testclient import TestClient
+from jose import jwt
+import app as app_module
+from app import app
+from auth import TokenAuth, AuthError, token_auth, ISSUER, ALGORITHM
+
+# Test client
+client = TestClient(app)
+
+class TestTokenAuth:
+    """
+    Test scenarios for signed creator JWTs
+    """
+
+    def login(self):
+        phone = f"+9170{uuid.uuid4().int % 10**8:08d}"
+        tenant_id = client.post("/v1/creators/signup", json={
+            "name": "Auth Creator",
+            "email": f"auth_{phone[-8:]}@example.com",
+            "phone": phone
+        }).json()["tenant_id"]
+        request_id = client.post("/v1/auth/creator/login", json={"phone": phone}).json()["request_id"]
+        response = client.post("/v1/auth/creator/verify", json={"request_id": request_id, "code": "123456"})
+        assert response.status_code == 200
+        return tenant_id, response.json()["jwt"]
+
+    def test_login_token_authorizes_creator(self):
+        """The JWT from creator login carries the tenant and is accepted without a DB lookup"""
+        tenant_id, token = self.login()
+        claims = token_auth.verify(token)
+        assert claims["tenant_id"] == tenant_id
+        assert claims["role"] == "creator"
+
+        hits = token_auth.counters["cache_hits"]
+        response = client.get("/v1/creator/profile", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        assert response.json()["tenant_id"] == tenant_id
+        assert token_auth.counters["cache_hits"] == hits + 1
+
+    def test_tampered_and_wrong_role_rejected(self):
+        """Altered tokens and non-creator tokens are refused"""
+        _, token = self.login()
+        header, payload, signature = token.split(".")
+        tampered = ".".join([header, payload, signature[:-2] + ("AA" if signature[-2:] != "AA" else "BB")])
+        assert client.get("/v1/creator/balance", headers={"Authorization": f"Bearer {tampered}"}).status_code == 401
+
+        phone_token = token_auth.issue("+919800000000", role="phone_verified")
+        assert client.get("/v1/creator/balance", headers={"Authorization": f"Bearer {phone_token}"}).status_code == 403
+        assert client.get("/v1/creator/balance", headers={"Authorization": token}).status_code == 401
+
+    def test_demo_tokens_refused_by_default(self):
+        """Unsigned demo tokens do not authenticate unless explicitly enabled for development"""
+        for tenant_id in ("tnt_101", "tnt_anything"):
+            response = client.get("/v1/creator/balance", headers={"Authorization": f"Bearer mock_jwt_creator_{tenant_id}"})
+            assert response.status_code == 401
+
+    def test_expired_token_rejected(self):
+        """Expired tokens are refused and cached claims are dropped once they expire"""
+        auth = TokenAuth(keys={"k1": "secret"})
+        with pytest.raises(AuthError):
+            auth.verify(auth.issue("creator", role="creator", tenant_id="tnt_101", ttl_seconds=-10))
+
+        token = auth.issue("creator", role="creator", tenant_id="tnt_101")
+        auth.verify(token)
+        auth.verified[token]["exp"] = time.time() - 1  # Age the cached claims
+        auth.verify(token)
+        assert auth.counters["cache_hits"] == 0
+        assert auth.counters["verified"] == 2
+
+    def test_key_rotation(self):
+        """Tokens signed with a retired kid stop verifying; the new kid signs fresh tokens"""
+        old = TokenAuth(keys={"k1": "one"}, active_kid="k1")
+        token = old.issue("creator", role="creator", tenant_id="tnt_101")
+
+        rotated = TokenAuth(keys={"k1": "one", "k2": "two"}, active_kid="k2")
+        assert rotated.verify(token)["tenant_id"] == "tnt_101"
+        assert jwt.get_unverified_header(rotated.issue("creator", role="creator"))["kid"] == "k2"
+
+        retired = TokenAuth(keys={"k2": "two"})
+        with pytest.raises(AuthError):
+            retired.verify(token)
+        assert retired.counters["rejected"] == 1
+
+    def test_signup_checks_phone_verification(self, monkeypatch):
+        """Signup accepts the phone_verified token only for the phone it was issued to"""
+        def verified(phone):
+            request_id = client.post("/v1/auth/otp/request", json={"phone": phone}).json()["request_id"]
+            return client.post("/v1/auth/otp/verify", json={"request_id": request_id, "code": "123456"}).json()["jwt"]
+
+        def signup(phone, token=None):
+            headers = {"Authorization": f"Bearer {token}"} if token else {}
+            return client.post("/v1/creators/signup", headers=headers, json={
+                "name": "Verified Creator", "email": f"verified_{phone[-8:]}@example.com", "phone": phone
+            })
+
+        phone, other = (f"+9171{uuid.uuid4().int % 10**8:08d}" for _ in range(2))
+        token = verified(phone)
+        assert signup(other, token).status_code == 403
+        assert signup(other, token_auth.issue(other, role="creator", tenant_id="tnt_101")).status_code == 403
+        assert signup(phone, "not-a-token").status_code == 401
+
+        monkeypatch.setattr(app_module, "SIGNUP_PHONE_VERIFICATION_REQUIRED", True)
+        assert signup(other).status_code == 401
+        assert signup(phone, token).status_code == 200
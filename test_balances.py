@@ -0,0 +1,98 @@
+import pytest
+import uuid
+from fastapi.testclient import TestClient
+from app import app, db
+from auth import token_auth
+
+# Test client
+client = TestClient(app)
+
+def creator_token(tenant_id):
+    return token_auth.issue(tenant_id, role="creator", tenant_id=tenant_id)
+
+class TestRunningBalances:
+    """
+    Test scenarios for per-tenant and per-user running balances
+    """
+
+    def setup_method(self):
+        """Create a link with zero cool-off so approved entries can be paid immediately"""
+        self.offer = db.get_offer("1234")
+        self.original_cool_off = self.offer["cool_off_days"]
+        self.offer["cool_off_days"] = 0
+        self.links = {}
+        self.user_id = f"balance_user_{uuid.uuid4().hex[:6]}"
+
+    def teardown_method(self):
+        self.offer["cool_off_days"] = self.original_cool_off
+
+    def link_for(self, tenant_id):
+        if tenant_id in self.links:
+            return self.links[tenant_id]
+        if not any(t["tenant_id"] == tenant_id for t in db.tenants):
+            db.save_tenant({"tenant_id": tenant_id, "name": "Balance Tenant", "default_share_pct": 40.0})
+        campaign = client.post("/v1/campaigns", json={
+            "tenant_id": tenant_id,
+            "name": "Balance Campaign",
+            "share_pct": 40.0
+        }).json()
+        self.links[tenant_id] = client.post("/v1/links", json={
+            "campaign_id": campaign["campaign_id"],
+            "offer_id": "1234"
+        }).json()["link_id"]
+        return self.links[tenant_id]
+
+    def convert(self, status="approved", order_id=None, tenant_id="tnt_101"):
+        click = client.post("/v1/events/click", json={"link_id": self.link_for(tenant_id), "user_id": self.user_id}).json()
+        payload = {
+            "click_id": click["click_id"],
+            "offer_id": "1234",
+            "sale_amount": 1000.0,
+            "order_id": order_id or f"ORD-{uuid.uuid4().hex[:8]}",
+            "status": status
+        }
+        ledger_id = client.post("/v1/events/conversion", json=payload).json()["ledger_id"]
+        return payload, db.get_ledger_entry(ledger_id)
+
+    def test_balances_follow_entry_lifecycle(self):
+        """Balances move as entries are created, rejected and paid"""
+        # A separate tenant keeps rejected entries out of tnt_101's export
+        _, approved = self.convert(tenant_id="tnt_balance_test")
+        pending_payload, pending = self.convert(status="pending", tenant_id="tnt_balance_test")
+
+        balance = client.get(f"/v1/rewards/balance?user_id={self.user_id}").json()
+        assert balance["balance"] == round(approved["user_amount"] + pending["user_amount"], 2)
+        assert balance["pending_payout"] == round(approved["user_amount"], 2)
+
+        client.post("/v1/events/conversion", json={**pending_payload, "status": "rejected"})
+        client.post("/v1/rewards/payout/run")
+
+        balance = client.get(f"/v1/rewards/balance?user_id={self.user_id}").json()
+        assert balance["balance"] == 0
+        assert balance["pending_payout"] == 0
+        assert balance["by_status"]["paid"]["count"] == 1
+        assert balance["by_status"]["rejected"]["count"] == 1
+
+        tenant = db.get_balance("tenant", "tnt_balance_test")
+        assert tenant["balance_paise"] == approved["creator_amount_paise"]
+
+    def test_entries_record_tenant_balance(self):
+        """Each entry carries the tenant balance before and after it"""
+        _, entry = self.convert()
+        assert entry["tenant_id"] == "tnt_101"
+        assert isinstance(entry["balance_after_paise"], int)
+        assert entry["balance_after_paise"] == entry["balance_before_paise"] + entry["creator_amount_paise"]
+
+    def test_rows_match_ledger(self):
+        """Running rows agree with a full re-sum of the ledger"""
+        self.convert()
+        self.convert(status="pending")
+
+        row = db.get_balance("tenant", "tnt_101")
+        tenant_entries = [l for l in db.ledger if l.get("tenant_id") == "tnt_101"]
+        assert row["balance_paise"] == sum(l["creator_amount_paise"] for l in tenant_entries if l["status"] != "rejected")
+        assert row["pending_payout_paise"] == sum(l["user_amount_paise"] for l in tenant_entries if l["status"] in ("queued", "confirmed"))
+
+        response = client.get("/v1/creator/balance", headers={"Authorization": f"Bearer {creator_token('tnt_101')}"})
+        assert response.status_code == 200
+        assert response.json()["pending_payout"] == row["pending_payout_paise"] / 100
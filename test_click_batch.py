@@ -0,0 +1,78 @@
+import pytest
+import json
+from fastapi.testclient import TestClient
+from app import app, db
+
+# Test client
+client = TestClient(app)
+
+class TestClickBatch:
+    """
+    Test scenarios for bulk click ingestion from the edge tier
+    """
+
+    def setup_method(self):
+        """Create a campaign and smart link to click on"""
+        campaign_response = client.post("/v1/campaigns", json={
+            "tenant_id": "tnt_101",
+            "name": "Click Batch Campaign",
+            "share_pct": 50.0
+        })
+        assert campaign_response.status_code == 200
+
+        link_response = client.post("/v1/links", json={
+            "campaign_id": campaign_response.json()["campaign_id"],
+            "offer_id": "1234"
+        })
+        assert link_response.status_code == 200
+        self.link_id = link_response.json()["link_id"]
+
+    def test_json_array_batch(self):
+        """Valid clicks are created and invalid ones rejected per item"""
+        batch = [
+            {"link_id": self.link_id, "user_id": "user_a"},
+            {"link_id": "lnk_missing"},
+            {"link_id": self.link_id, "timestamp": "2024-05-01T10:00:00Z"},
+            {"user_id": "no_link"}
+        ]
+        clicks_before = len(db.clicks)
+
+        response = client.post("/v1/events/clicks:batch", json=batch)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["received"] == 4
+        assert data["created"] == 2
+        assert data["rejected"] == 2
+        assert [r["status"] for r in data["results"]] == ["created", "rejected", "created", "rejected"]
+        assert data["results"][1]["error"] == "Link not found"
+        assert len(db.clicks) == clicks_before + 2
+
+        # Edge-supplied timestamps are kept (normalised to naive UTC)
+        click = next(c for c in db.clicks if c["click_id"] == data["results"][2]["click_id"])
+        assert click["timestamp"] == "2024-05-01T10:00:00"
+
+    def test_ndjson_batch(self):
+        """NDJSON bodies are parsed line by line"""
+        lines = [
+            json.dumps({"link_id": self.link_id, "user_id": f"user_{i}"})
+            for i in range(50)
+        ]
+        body = "\n".join(lines + ["not json"]) + "\n"
+
+        response = client.post(
+            "/v1/events/clicks:batch",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["created"] == 50
+        assert data["rejected"] == 1
+        assert len({r["click_id"] for r in data["results"] if r["click_id"]}) == 50
+
+    def test_non_array_body_rejected(self):
+        """A JSON object body is a client error"""
+        response = client.post("/v1/events/clicks:batch", json={"link_id": self.link_id})
+        assert response.status_code == 400
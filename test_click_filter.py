@@ -0,0 +1,126 @@
+import pytest
+import uuid
+from fastapi.testclient import TestClient
+from app import app, db
+from click_filter import ClickFilter, WindowCounters
+
+# Test client
+client = TestClient(app)
+
+BROWSER_UA = "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 Chrome/124.0 Mobile Safari/537.36"
+
+class TestClickFilter:
+    """
+    Test scenarios for click fraud and bot filtering
+    """
+
+    def setup_method(self):
+        campaign_id = client.post("/v1/campaigns", json={"tenant_id": "tnt_101", "name": "Filter Campaign", "share_pct": 40.0}).json()["campaign_id"]
+        self.link_id = client.post("/v1/links", json={"campaign_id": campaign_id, "offer_id": "1234"}).json()["link_id"]
+
+    def test_bot_user_agents(self):
+        """Known bots and tools are filtered; browsers are not"""
+        click_filter = ClickFilter()
+        for agent in ["Googlebot/2.1 (+http://www.google.com/bot.html)", "curl/8.4.0", "python-requests/2.31",
+                      "Mozilla/5.0 HeadlessChrome/120.0", ""]:
+            assert click_filter.check("lnk", ip="1.2.3.4", user_agent=agent)["action"] == "reject"
+        assert click_filter.check("lnk", ip="1.2.3.4", user_agent=BROWSER_UA)["action"] == "accept"
+        assert click_filter.stats()["rejected_by_reason"] == {"bot_user_agent": 5}
+
+    def test_ip_velocity(self):
+        """An IP over its limit is filtered until the window moves on"""
+        click_filter = ClickFilter(ip_limit=5, dedupe_window=0)
+        verdicts = [click_filter.check(f"lnk_{i}", ip="5.5.5.5", user_agent=BROWSER_UA, now=1000.0 + i)["action"] for i in range(6)]
+        assert verdicts == ["accept"] * 5 + ["reject"]
+        assert click_filter.check("lnk_x", ip="6.6.6.6", user_agent=BROWSER_UA, now=1006.0)["action"] == "accept"
+        assert click_filter.check("lnk_y", ip="5.5.5.5", user_agent=BROWSER_UA, now=1200.0)["action"] == "accept"
+
+    def test_sliding_window_estimate(self):
+        """Counts from the previous window fade out as the current one progresses"""
+        counters = WindowCounters(window=60)
+        for _ in range(10):
+            counters.hit("k", 59.0)
+        assert counters.hit("k", 60.0) == pytest.approx(11)
+        assert counters.hit("k", 90.0) == pytest.approx(2 + 10 * 0.5)
+        assert counters.hit("k", 200.0) == pytest.approx(1)
+
+    def test_bounded_memory(self):
+        """Tracked keys never exceed max_keys"""
+        click_filter = ClickFilter(max_keys=50)
+        for i in range(500):
+            verdict = click_filter.check("lnk", user_id=f"u{i}", ip=f"10.0.{i // 256}.{i % 256}", user_agent=BROWSER_UA)
+            click_filter.accepted(verdict, f"click_{i}")
+        stats = click_filter.stats()
+        assert stats["tracked_keys"]["ip"] == 50
+        assert stats["dedupe_keys"] == 50
+
+    def test_duplicate_click_returns_original(self):
+        """A repeat click maps to the first one and is not stored again"""
+        user_id = f"dup_{uuid.uuid4().hex[:6]}"
+        first = client.post("/v1/events/click", json={"link_id": self.link_id, "user_id": user_id}).json()
+        clicks_before = len(db.clicks)
+        repeat = client.post("/v1/events/click", json={"link_id": self.link_id, "user_id": user_id}).json()
+        assert repeat["status"] == "duplicate"
+        assert repeat["click_id"] == first["click_id"]
+        assert len(db.clicks) == clicks_before
+
+    def test_bot_click_never_stored(self):
+        """Filtered clicks get no click_id, so nothing can be attributed to them"""
+        clicks_before = len(db.clicks)
+        response = client.post("/v1/events/click", json={
+            "link_id": self.link_id, "ip_address": "9.9.9.9", "user_agent": "Scrapy/2.11 (+https://scrapy.org)"
+        }).json()
+        assert response["status"] == "filtered"
+        assert response["click_id"] is None
+        assert len(db.clicks) == clicks_before
+        assert client.get("/v1/admin/click_filter").json()["recent"][-1]["reason"] == "bot_user_agent"
+
+    def test_batch_verdicts(self):
+        """Batches report duplicates (within the batch too) and filtered clicks per item"""
+        user_id = f"batch_{uuid.uuid4().hex[:6]}"
+        response = client.post("/v1/events/clicks:batch", json=[
+            {"link_id": self.link_id, "user_id": user_id, "user_agent": BROWSER_UA, "ip_address": "7.7.7.7"},
+            {"link_id": self.link_id, "user_id": user_id, "user_agent": BROWSER_UA, "ip_address": "7.7.7.7"},
+            {"link_id": self.link_id, "user_agent": "Wget/1.21", "ip_address": "8.8.8.8"}
+        ]).json()
+        assert [r["status"] for r in response["results"]] == ["created", "duplicate", "filtered"]
+        assert response["results"][1]["click_id"] == response["results"][0]["click_id"]
+        assert (response["created"], response["duplicates"], response["filtered"], response["rejected"]) == (1, 1, 1, 1)
+        assert db.get_click(response["results"][0]["click_id"])["ip_address"] == "7.7.7.7"
+
+    def test_backfill_checked_at_click_time(self):
+        """Historical clicks skip velocity limits and only dedupe within the window of their own time"""
+        click_filter = ClickFilter(link_limit=5)
+        now = 10_000_000.0
+        for i in range(50):
+            at = now - 9 * 86400 + i * 3600
+            verdict = click_filter.check("lnk", user_id=f"u{i}", user_agent=BROWSER_UA, now=now, at=at)
+            assert verdict["action"] == "accept"
+            click_filter.accepted(verdict, f"clk_{i}")
+        assert click_filter.check("lnk", user_id="live", user_agent=BROWSER_UA, now=now)["action"] == "accept"
+
+        user_id = f"backfill_{uuid.uuid4().hex[:6]}"
+        response = client.post("/v1/events/clicks:batch", json=[
+            {"link_id": self.link_id, "user_id": user_id, "timestamp": "2024-03-01T10:00:00Z"},
+            {"link_id": self.link_id, "user_id": user_id, "timestamp": "2024-03-01T10:00:10Z"},
+            {"link_id": self.link_id, "user_id": user_id, "timestamp": "2024-03-02T10:00:00Z"}
+        ]).json()
+        assert [r["status"] for r in response["results"]] == ["created", "duplicate", "created"]
+
+    def test_backdated_click_expires_by_arrival(self):
+        """A live click timed before newer entries still dedupes and expires on arrival order"""
+        click_filter = ClickFilter(window=60, dedupe_window=30)
+        now = 10_000_000.0
+        first = click_filter.check("lnk", user_id="late", user_agent=BROWSER_UA, now=now, at=now - 55)
+        click_filter.accepted(first, "clk_late")
+        fresh = click_filter.check("lnk", user_id="fresh", user_agent=BROWSER_UA, now=now + 1)
+        click_filter.accepted(fresh, "clk_fresh")
+
+        # Within the dedupe window of its own time, though that time is well behind the clock
+        repeat = click_filter.check("lnk", user_id="late", user_agent=BROWSER_UA, now=now + 2, at=now - 40)
+        assert repeat["action"] == "duplicate"
+        assert repeat["click_id"] == "clk_late"
+
+        # Once both have aged out nothing is left behind the newer entry
+        click_filter.check("lnk", user_id="other", user_agent=BROWSER_UA, now=now + 200)
+        assert len(click_filter.recent) == 0
@@ -0,0 +1,142 @@
+import pytest
+import uuid
+from fastapi.testclient import TestClient
+from app import app, db
+
+# Test client
+client = TestClient(app)
+
+class TestConversionIngestion:
+    """
+    Test scenarios for batch conversion postbacks and idempotent ledger writes
+    """
+
+    def setup_method(self):
+        """Create a campaign, link and a few clicks to convert"""
+        campaign_response = client.post("/v1/campaigns", json={
+            "tenant_id": "tnt_101",
+            "name": "Conversion Batch Campaign",
+            "share_pct": 40.0
+        })
+        assert campaign_response.status_code == 200
+
+        link_response = client.post("/v1/links", json={
+            "campaign_id": campaign_response.json()["campaign_id"],
+            "offer_id": "1234"
+        })
+        assert link_response.status_code == 200
+        link_id = link_response.json()["link_id"]
+
+        batch_response = client.post("/v1/events/clicks:batch", json=[
+            {"link_id": link_id, "user_id": f"conv_user_{i}"} for i in range(3)
+        ])
+        assert batch_response.status_code == 200
+        self.click_ids = [r["click_id"] for r in batch_response.json()["results"]]
+
+    def conversion(self, click_id, order_id=None, status="approved"):
+        return {
+            "click_id": click_id,
+            "offer_id": "1234",
+            "sale_amount": 1000.0,
+            "order_id": order_id or f"ORD-{uuid.uuid4().hex[:8]}",
+            "status": status
+        }
+
+    def test_order_replay_creates_single_ledger_entry(self):
+        """Retried postbacks for the same order return the original ledger entry"""
+        payload = self.conversion(self.click_ids[0])
+        ledger_before = len(db.ledger)
+
+        first = client.post("/v1/events/conversion", json=payload)
+        second = client.post("/v1/events/conversion", json=payload)
+
+        assert first.status_code == 200
+        assert second.status_code == 200
+        assert first.json()["duplicate"] is False
+        assert second.json()["duplicate"] is True
+        assert second.json()["ledger_id"] == first.json()["ledger_id"]
+        assert len(db.ledger) == ledger_before + 1
+
+    def test_delivery_id_replay(self):
+        """Webhook redeliveries with the same delivery ID are dropped"""
+        payload = self.conversion(self.click_ids[1])
+        headers = {"X-Webhook-Delivery-Id": f"dlv_{uuid.uuid4().hex[:8]}"}
+
+        first = client.post("/v1/webhooks/conversion", json=payload, headers=headers)
+        # Same delivery, different order: still treated as a replay
+        replay = client.post("/v1/webhooks/conversion", json={**payload, "order_id": "ORD-OTHER"}, headers=headers)
+
+        assert first.status_code == 200
+        assert replay.status_code == 200
+        assert replay.json()["duplicate"] is True
+        assert replay.json()["ledger_id"] == first.json()["ledger_id"]
+        assert db.get_ledger_entry_for_order("1234", "ORD-OTHER") is None
+
+    def test_delivery_ids_are_bounded(self, monkeypatch):
+        """Only caller-supplied delivery IDs are remembered, least recently seen evicted first"""
+        monkeypatch.setattr(db, "webhook_delivery_limit", 2)
+        remembered = len(db.webhook_deliveries)
+        client.post("/v1/webhooks/conversion", json=self.conversion(self.click_ids[0]))
+        assert len(db.webhook_deliveries) == remembered
+
+        delivery_ids = [f"dlv_{uuid.uuid4().hex[:8]}" for _ in range(3)]
+        for delivery_id, click_id in zip(delivery_ids, self.click_ids):
+            client.post("/v1/webhooks/conversion", json=self.conversion(click_id), headers={"X-Webhook-Delivery-Id": delivery_id})
+        assert list(db.webhook_deliveries) == delivery_ids[1:]
+
+    def test_status_update_for_existing_order(self):
+        """A later postback with a new status updates the entry in place"""
+        payload = self.conversion(self.click_ids[2], status="pending")
+        first = client.post("/v1/events/conversion", json=payload)
+        client.post("/v1/events/conversion", json={**payload, "status": "approved"})
+
+        entry = db.get_ledger_entry_for_order("1234", payload["order_id"])
+        assert entry["ledger_id"] == first.json()["ledger_id"]
+        assert entry["status"] == "queued"
+
+    def test_batch_with_duplicates_and_rejections(self):
+        """Batch results report created, duplicate and rejected items in order"""
+        repeated = self.conversion(self.click_ids[0])
+        batch = [
+            repeated,
+            self.conversion(self.click_ids[1]),
+            repeated,
+            self.conversion("click_does_not_exist"),
+            {"click_id": self.click_ids[2]}
+        ]
+        ledger_before = len(db.ledger)
+
+        response = client.post("/v1/events/conversions:batch", json=batch)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [r["status"] for r in data["results"]] == ["ok", "ok", "duplicate", "rejected", "rejected"]
+        assert data["created"] == 2
+        assert data["duplicates"] == 1
+        assert data["rejected"] == 2
+        assert data["results"][3]["error"] == "Click not found"
+        assert len(db.ledger) == ledger_before + 2
+
+        # Replaying the whole batch has no further ledger effect
+        replay = client.post("/v1/events/conversions:batch", json=batch)
+        assert replay.json()["created"] == 0
+        assert len(db.ledger) == ledger_before + 2
+
+    def test_failing_item_reported_without_failing_batch(self):
+        """An unexpected error on one item is reported in its result; the other items are still written"""
+        broken = db.get_click(self.click_ids[1])
+        original = broken["timestamp"]
+        broken["timestamp"] = "not-a-timestamp"
+        try:
+            response = client.post("/v1/events/conversions:batch", json=[
+                self.conversion(self.click_ids[0]), self.conversion(self.click_ids[1]), self.conversion(self.click_ids[2])
+            ])
+        finally:
+            broken["timestamp"] = original
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [r["status"] for r in data["results"]] == ["ok", "failed", "ok"]
+        assert data["created"] == 2
+        assert data["failed"] == 1
+        assert data["results"][1]["error"]
@@ -0,0 +1,208 @@
+import pytest
+import asyncio
+import json
+import time
+import uuid
+from fastapi.testclient import TestClient
+from app import app, db
+from conversion_queue import ConversionQueue
+
+class TestConversionQueue:
+    """
+    Test scenarios for the asynchronous conversion queue and worker pool
+    """
+
+    def test_postback_acknowledged_then_processed(self):
+        """With the worker pool running, postbacks return 202 and land in the ledger"""
+        with TestClient(app) as client:
+            campaign = client.post("/v1/campaigns", json={
+                "tenant_id": "tnt_101",
+                "name": "Queue Campaign",
+                "share_pct": 40.0
+            }).json()
+            link = client.post("/v1/links", json={"campaign_id": campaign["campaign_id"], "offer_id": "1234"}).json()
+            click = client.post("/v1/events/click", json={"link_id": link["link_id"], "user_id": "queue_user"}).json()
+
+            order_id = f"ORD-{uuid.uuid4().hex[:8]}"
+            response = client.post("/v1/webhooks/conversion", json={
+                "click_id": click["click_id"],
+                "offer_id": "1234",
+                "sale_amount": 500.0,
+                "order_id": order_id,
+                "status": "approved"
+            })
+
+            assert response.status_code == 202
+            assert response.json()["status"] == "accepted"
+            assert "job_id" in response.json()
+
+            deadline = time.time() + 5
+            while db.get_ledger_entry_for_order("1234", order_id) is None and time.time() < deadline:
+                time.sleep(0.01)
+            assert db.get_ledger_entry_for_order("1234", order_id) is not None
+
+            # Batched postbacks go through the same queue
+            batch_orders = [f"ORD-{uuid.uuid4().hex[:8]}" for _ in range(2)]
+            batch = client.post("/v1/events/conversions:batch", json=[
+                {"click_id": click["click_id"], "offer_id": "1234", "sale_amount": 500.0, "order_id": o, "status": "approved"}
+                for o in batch_orders
+            ]).json()
+            assert [r["status"] for r in batch["results"]] == ["queued", "queued"]
+            assert batch["queued"] == 2
+            deadline = time.time() + 5
+            while any(db.get_ledger_entry_for_order("1234", o) is None for o in batch_orders) and time.time() < deadline:
+                time.sleep(0.01)
+            assert all(db.get_ledger_entry_for_order("1234", o) is not None for o in batch_orders)
+
+            stats = client.get("/v1/admin/conversion_queue").json()["stats"]
+            assert stats["running"] is True
+            assert stats["processed"] >= 1
+
+    def test_retry_then_success(self, tmp_path):
+        """Transient handler failures are retried with backoff"""
+        calls = []
+
+        def flaky(job):
+            calls.append(job["job_id"])
+            if len(calls) < 3:
+                raise RuntimeError("Click not found yet")
+
+        async def scenario():
+            queue = ConversionQueue(flaky, workers=2, retry_backoff=0.001, journal_path=str(tmp_path / "queue.jsonl"))
+            await queue.start()
+            await queue.submit({"order_id": "A"})
+            await asyncio.wait_for(queue.drain(), timeout=5)
+            stats = queue.stats()
+            await queue.stop()
+            return stats
+
+        stats = asyncio.run(scenario())
+        assert len(calls) == 3
+        assert stats["processed"] == 1
+        assert stats["retried"] == 2
+        assert stats["dead_letters"] == 0
+
+    def test_dead_letter_after_max_attempts(self, tmp_path):
+        """Jobs that keep failing move to the dead-letter list"""
+        def broken(job):
+            raise ValueError("Offer not found")
+
+        async def scenario():
+            queue = ConversionQueue(broken, max_attempts=3, retry_backoff=0.001, journal_path=str(tmp_path / "queue.jsonl"))
+            await queue.start()
+            await queue.submit({"order_id": "B"})
+            await asyncio.wait_for(queue.drain(), timeout=5)
+            dead = list(queue.dead_letters)
+            await queue.stop()
+            return dead
+
+        dead = asyncio.run(scenario())
+        assert len(dead) == 1
+        assert dead[0]["attempts"] == 3
+        assert dead[0]["error"] == "Offer not found"
+
+    def test_journal_replay_on_start(self, tmp_path):
+        """Jobs journaled but never finished are processed on the next start"""
+        journal = tmp_path / "queue.jsonl"
+        job = {"job_id": "job_1", "delivery_id": "job_1", "payload": {"order_id": "C"}, "attempts": 0}
+        done = {"job_id": "job_2", "delivery_id": "job_2", "payload": {"order_id": "D"}, "attempts": 0}
+        journal.write_text("\n".join([
+            json.dumps({"op": "enqueue", "job": job}),
+            json.dumps({"op": "enqueue", "job": done}),
+            json.dumps({"op": "done", "job_id": "job_2"}),
+            '{"op": "enq'  # Torn write
+        ]) + "\n")
+        handled = []
+
+        async def scenario():
+            queue = ConversionQueue(lambda j: handled.append(j["payload"]["order_id"]), journal_path=str(journal))
+            await queue.start()
+            await asyncio.wait_for(queue.drain(), timeout=5)
+            await queue.stop()
+
+        asyncio.run(scenario())
+        assert handled == ["C"]
+
+    def test_inline_when_pool_not_running(self):
+        """Without a running pool, submit processes the job immediately"""
+        queue = ConversionQueue(lambda job: {"status": "ok", "ledger_id": "led_x"})
+        job = asyncio.run(queue.submit({"order_id": "E"}))
+        assert job["status"] == "done"
+        assert job["result"]["ledger_id"] == "led_x"
+
+    def test_inline_without_journal(self):
+        """Without a journal the pool never starts, so nothing is acknowledged undurably"""
+        async def scenario():
+            queue = ConversionQueue(lambda job: {"status": "ok", "ledger_id": "led_y"})
+            await queue.start()
+            job = await queue.submit({"order_id": "F"})
+            running = queue.running
+            await queue.stop()
+            return running, job
+
+        running, job = asyncio.run(scenario())
+        assert running is False
+        assert job["status"] == "done"
+
+    def test_stop_drains_and_keeps_unfinished_jobs(self, tmp_path):
+        """stop() waits for accepted jobs; ones still unfinished at the timeout replay on the next start"""
+        journal = str(tmp_path / "queue.jsonl")
+        handled = []
+
+        async def slow(job):
+            if job["payload"]["order_id"] == "H":
+                await asyncio.sleep(10)
+            handled.append(job["payload"]["order_id"])
+
+        async def first_run():
+            queue = ConversionQueue(slow, workers=2, journal_path=journal, drain_timeout=0.2)
+            await queue.start()
+            await asyncio.gather(*(queue.submit({"order_id": o}) for o in ("G", "H")))
+            commits = queue.counters["journal_commits"]
+            await queue.stop()
+            return commits
+
+        async def second_run():
+            queue = ConversionQueue(lambda j: handled.append(j["payload"]["order_id"]), journal_path=journal)
+            await queue.start()
+            await asyncio.wait_for(queue.drain(), timeout=5)
+            await queue.stop()
+
+        assert asyncio.run(first_run()) == 1  # Both enqueue records share one fsync
+        assert handled == ["G"]
+        asyncio.run(second_run())
+        assert handled == ["G", "H"]
+
+    def test_journal_compacted_while_running(self, tmp_path):
+        """Finished jobs are compacted out of the journal while running; dead letters survive a restart"""
+        journal = str(tmp_path / "queue.jsonl")
+        handled = []
+
+        def handler(job):
+            if job["payload"]["order_id"] == "BAD":
+                raise ValueError("Offer not found")
+            handled.append(job["payload"]["order_id"])
+
+        async def first_run():
+            queue = ConversionQueue(handler, max_attempts=1, compact_after=10, journal_path=journal)
+            await queue.start()
+            for i in range(25):
+                await queue.submit({"order_id": f"OK-{i}"})
+            await queue.submit({"order_id": "BAD"})
+            await asyncio.wait_for(queue.drain(), timeout=5)
+            await queue.stop()
+            return queue.counters["journal_compactions"]
+
+        async def second_run():
+            queue = ConversionQueue(handler, journal_path=journal)
+            await queue.start()
+            await asyncio.wait_for(queue.drain(), timeout=5)
+            dead = [job["payload"]["order_id"] for job in queue.dead_letters]
+            await queue.stop()
+            return dead
+
+        assert asyncio.run(first_run()) >= 2
+        with open(journal, encoding="utf-8") as f:
+            assert len(f.readlines()) < 26  # 52 records were appended in all
+        assert asyncio.run(second_run()) == ["BAD"]
+        assert len(handled) == 25  # Nothing finished is replayed
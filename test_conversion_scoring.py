@@ -0,0 +1,129 @@
+import pytest
+import uuid
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from app import app, db
+from conversion_scoring import ConversionScorer, BloomFilter, RotatingBloomFilter
+
+# Test client
+client = TestClient(app)
+
+NOW = datetime(2025, 1, 1, 12, 0, 0)
+
+def click_at(seconds_ago, click_id="click_x", user_id="user_x"):
+    return {"click_id": click_id, "user_id": user_id, "timestamp": (NOW - timedelta(seconds=seconds_ago)).isoformat()}
+
+class TestConversionScoring:
+    """
+    Test scenarios for conversion fraud scoring
+    """
+
+    def test_clean_conversion(self):
+        """A conversion minutes after its click scores zero"""
+        verdict = ConversionScorer().score(click_at(600), "lnk", "ORD-1", 999.0, now=NOW)
+        assert verdict == {"score": 0.0, "reasons": [], "flagged": False, "hold": False}
+
+    def test_timing_signals(self):
+        """Conversions seconds after the click, or from clicks past the attribution window, are flagged"""
+        scorer = ConversionScorer()
+        assert scorer.score(click_at(2, "c1"), "lnk", "ORD-1", 100.0, now=NOW)["reasons"] == ["too_fast"]
+        assert scorer.score(click_at(40 * 86400, "c2"), "lnk", "ORD-2", 100.0, now=NOW)["reasons"] == ["stale_click"]
+
+    def test_velocity_and_reuse(self):
+        """Repeated conversions on one click by one user add up to a flag"""
+        scorer = ConversionScorer(click_reuse_limit=2, user_limit_per_hour=3)
+        verdicts = [scorer.score(click_at(60), "lnk", f"ORD-{i}", 100.0, now=NOW + timedelta(seconds=i)) for i in range(5)]
+        assert verdicts[1]["reasons"] == []
+        assert verdicts[2]["reasons"] == ["click_reuse"]
+        assert verdicts[4]["reasons"] == ["click_reuse", "user_velocity"]
+        assert verdicts[4]["flagged"] and not verdicts[4]["hold"]
+        assert scorer.stats()["flagged"] == 2
+
+    def test_sale_outlier(self):
+        """A sale far outside the link's usual amounts is flagged"""
+        scorer = ConversionScorer()
+        for i in range(30):
+            scorer.score(click_at(600, f"c{i}", f"u{i}"), "lnk", f"ORD-{i}", 1000.0 + (i % 5) * 10, now=NOW)
+        assert scorer.score(click_at(600, "cz", "uz"), "lnk", "ORD-z", 90000.0, now=NOW)["reasons"] == ["sale_outlier"]
+
+    def test_bloom_filter(self):
+        """Seen order IDs are always recognised; unseen ones rarely collide"""
+        bloom = BloomFilter(capacity=10000, error_rate=0.01)
+        assert sum(bloom.add(f"ORD-{i}") for i in range(10000)) < 100
+        assert all(f"ORD-{i}" in bloom for i in range(10000))
+        false_positives = sum(f"NEW-{i}" in bloom for i in range(10000))
+        assert false_positives < 300
+
+    def test_rotating_bloom_filter(self):
+        """A full filter rotates: recent items are still recognised and old ones age out"""
+        bloom = RotatingBloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(2500):
+            bloom.add(f"ORD-{i}")
+        assert bloom.rotations == 2
+        assert all(f"ORD-{i}" in bloom for i in range(1500, 2500))
+        assert sum(f"ORD-{i}" in bloom for i in range(1000)) < 50
+
+    def test_reused_order_held_for_review(self):
+        """An order ID reported again under another of the advertiser's offers is held and can be reviewed"""
+        campaign_id = client.post("/v1/campaigns", json={"tenant_id": "tnt_101", "name": "Scoring Campaign", "share_pct": 40.0}).json()["campaign_id"]
+        link_id = client.post("/v1/links", json={"campaign_id": campaign_id, "offer_id": "1234"}).json()["link_id"]
+        order_id = f"ORD-{uuid.uuid4().hex[:8]}"
+        other_offer = f"sister_{uuid.uuid4().hex[:6]}"
+        db.upsert_offer({**db.get_offer("1234"), "offer_id": other_offer})
+        tenant_balance = db.get_balance("tenant", "tnt_101")["balance_paise"]
+
+        ledger_ids = []
+        for offer_id in ("1234", other_offer):
+            click = client.post("/v1/events/click", json={"link_id": link_id, "user_id": f"scoring_{offer_id}"}).json()
+            ledger_ids.append(client.post("/v1/events/conversion", json={
+                "click_id": click["click_id"], "offer_id": offer_id, "sale_amount": 1000.0,
+                "order_id": order_id, "status": "approved"
+            }).json()["ledger_id"])
+
+        first, second = (db.get_ledger_entry(l) for l in ledger_ids)
+        assert first["status"] == "queued"
+        assert second["status"] == "review"
+        assert set(second["fraud_reasons"]) == {"too_fast", "order_reused"}
+        # Held entries do not count towards balances until approved
+        assert db.get_balance("tenant", "tnt_101")["balance_paise"] == tenant_balance + first["creator_amount_paise"]
+
+        response = client.post(f"/v1/admin/conversions/{second['ledger_id']}/review?approve=true")
+        assert response.json()["status"] == "queued"
+        assert second["status"] == "queued"
+        assert db.get_balance("tenant", "tnt_101")["balance_paise"] == tenant_balance + first["creator_amount_paise"] + second["creator_amount_paise"]
+        assert client.post(f"/v1/admin/conversions/{second['ledger_id']}/review?approve=true").status_code == 404
+
+    def test_order_ids_scoped_per_advertiser(self):
+        """The same order ID from two advertisers is not a reuse"""
+        scorer = ConversionScorer()
+        assert scorer.score(click_at(600, "c1", "u1"), "lnk", "ORD-1", 500.0, now=NOW, advertiser_id="adv_a")["reasons"] == []
+        assert scorer.score(click_at(600, "c2", "u2"), "lnk", "ORD-1", 500.0, now=NOW, advertiser_id="adv_b")["reasons"] == []
+        assert scorer.score(click_at(600, "c3", "u3"), "lnk", "ORD-1", 500.0, now=NOW, advertiser_id="adv_a")["reasons"] == ["order_reused"]
+
+    def test_failed_write_not_scored_against_its_retry(self, monkeypatch):
+        """A conversion whose ledger write fails is not recorded, so its retry scores clean"""
+        campaign_id = client.post("/v1/campaigns", json={"tenant_id": "tnt_101", "name": "Retry Campaign", "share_pct": 40.0}).json()["campaign_id"]
+        link_id = client.post("/v1/links", json={"campaign_id": campaign_id, "offer_id": "1234"}).json()["link_id"]
+        click = client.post("/v1/events/click", json={"link_id": link_id, "user_id": f"retry_{uuid.uuid4().hex[:6]}"}).json()
+        conversion = {"click_id": click["click_id"], "offer_id": "1234", "sale_amount": 1000.0,
+                      "order_id": f"ORD-{uuid.uuid4().hex[:8]}", "status": "approved"}
+
+        def failing_write(ledger_data):
+            raise RuntimeError("ledger unavailable")
+        with monkeypatch.context() as m:
+            m.setattr(db, "create_ledger_entry", failing_write)
+            with pytest.raises(RuntimeError):
+                client.post("/v1/events/conversion", json=conversion)
+
+        entry = db.get_ledger_entry(client.post("/v1/events/conversion", json=conversion).json()["ledger_id"])
+        assert "order_reused" not in entry["fraud_reasons"]
+
+    def test_evaluate_is_read_only(self):
+        """evaluate() leaves the signals untouched until record() is called"""
+        scorer = ConversionScorer()
+        click = click_at(600)
+        first = scorer.evaluate(click, "lnk", "ORD-1", 500.0, now=NOW, advertiser_id="adv_a")
+        assert scorer.evaluate(click, "lnk", "ORD-1", 500.0, now=NOW, advertiser_id="adv_a") == first
+        assert scorer.stats()["scored"] == 0
+        scorer.record(click, "lnk", "ORD-1", 500.0, first, now=NOW, advertiser_id="adv_a")
+        assert scorer.evaluate(click, "lnk", "ORD-1", 500.0, now=NOW, advertiser_id="adv_a")["reasons"] == ["order_reused"]
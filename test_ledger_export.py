@@ -0,0 +1,112 @@
+import pytest
+import csv
+import io
+import json
+import uuid
+from fastapi.testclient import TestClient
+from app import app, db
+from auth import token_auth
+
+# Test client
+client = TestClient(app)
+
+def creator_token(tenant_id):
+    return token_auth.issue(tenant_id, role="creator", tenant_id=tenant_id)
+
+CREATOR_HEADERS = {"Authorization": f"Bearer {creator_token('tnt_101')}"}
+
+class TestLedgerExport:
+    """
+    Test scenarios for the streaming creator ledger export
+    """
+
+    def setup_method(self):
+        """Create a campaign, link and two conversions for tnt_101"""
+        campaign_response = client.post("/v1/campaigns", json={
+            "tenant_id": "tnt_101",
+            "name": "Export Test Campaign",
+            "share_pct": 40.0
+        })
+        assert campaign_response.status_code == 200
+        self.campaign_id = campaign_response.json()["campaign_id"]
+
+        link_response = client.post("/v1/links", json={"campaign_id": self.campaign_id, "offer_id": "1234"})
+        assert link_response.status_code == 200
+        self.link_id = link_response.json()["link_id"]
+
+        self.order_ids = []
+        for sale_amount in [1000.0, 2500.0]:
+            click_response = client.post("/v1/events/click", json={"link_id": self.link_id, "user_id": "export_user"})
+            assert click_response.status_code == 200
+            order_id = f"ORD-{uuid.uuid4().hex[:8]}"
+            conversion_response = client.post("/v1/events/conversion", json={
+                "click_id": click_response.json()["click_id"],
+                "offer_id": "1234",
+                "sale_amount": sale_amount,
+                "order_id": order_id,
+                "status": "approved"
+            })
+            assert conversion_response.status_code == 200
+            self.order_ids.append(order_id)
+
+    def test_csv_export_streams_rows_with_running_balance(self):
+        """CSV export includes every tenant row with a cumulative balance"""
+        response = client.get("/v1/creator/ledger/export", headers=CREATOR_HEADERS)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert "attachment" in response.headers["content-disposition"]
+
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        ours = [r for r in rows if r["Order Id"] in self.order_ids]
+        assert len(ours) == 2
+
+        # Balance is the running sum of amounts across the whole export
+        running = 0.0
+        for row in rows:
+            running += float(row["Amount"])
+            assert float(row["Balance"]) == pytest.approx(running, abs=0.01)
+
+    def test_ndjson_export(self):
+        """NDJSON export emits one JSON object per line"""
+        response = client.get("/v1/creator/ledger/export?format=ndjson", headers=CREATOR_HEADERS)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        ours = [r for r in rows if r["order_id"] in self.order_ids]
+        assert len(ours) == 2
+        assert all(r["type"] == "Commission" for r in ours)
+
+    def test_date_range_filter_keeps_opening_balance(self):
+        """Rows outside the range are skipped but still count towards the balance"""
+        first = next(l for l in db.ledger if l["order_id"] == self.order_ids[0])
+        first["created_at"] = "2020-01-01T00:00:00"
+
+        response = client.get(
+            "/v1/creator/ledger/export?format=ndjson&start_date=2021-01-01",
+            headers=CREATOR_HEADERS
+        )
+        assert response.status_code == 200
+
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        order_ids = [r["order_id"] for r in rows]
+        assert self.order_ids[0] not in order_ids
+        assert self.order_ids[1] in order_ids
+        # The skipped 2020 row is part of the opening balance
+        second = next(r for r in rows if r["order_id"] == self.order_ids[1])
+        assert second["balance"] - second["amount"] >= round(first["creator_amount"], 2)
+
+    def test_invalid_format_rejected(self):
+        """Unknown export formats return 400"""
+        response = client.get("/v1/creator/ledger/export?format=xml", headers=CREATOR_HEADERS)
+        assert response.status_code == 400
+
+    def test_invalid_date_range_rejected(self):
+        """start_date after end_date returns 400"""
+        response = client.get(
+            "/v1/creator/ledger/export?start_date=2024-02-01&end_date=2024-01-01",
+            headers=CREATOR_HEADERS
+        )
+        assert response.status_code == 400
@@ -0,0 +1,116 @@
+import pytest
+import uuid
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app import app, db
+from metrics import Registry, MetricsMiddleware
+from rate_limiter import RateLimit, RateLimiter, RateLimitMiddleware
+
+# Test client
+client = TestClient(app)
+
+def scrape():
+    """Parse the /metrics page into {series: value}"""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = {}
+    for line in response.text.splitlines():
+        if line and not line.startswith("#"):
+            series, value = line.rsplit(" ", 1)
+            samples[series] = float(value)
+    return samples
+
+class TestMetrics:
+    """
+    Test scenarios for the Prometheus metrics endpoint
+    """
+
+    def test_exposition_format(self):
+        """Counters, gauges and histograms render in the text format"""
+        registry = Registry()
+        requests = registry.counter("requests_total", "Requests", ("route",))
+        depth = registry.gauge("depth", "Depth", collect=lambda: 7)
+        latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        requests.inc('/a"b')
+        requests.inc('/a"b', amount=2)
+        for value in (0.05, 0.5, 5.0):
+            latency.observe(value)
+
+        lines = registry.render().splitlines()
+        assert "# TYPE requests_total counter" in lines
+        assert 'requests_total{route="/a\\"b"} 3' in lines
+        assert "depth 7" in lines
+        assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+        assert 'latency_seconds_bucket{le="1.0"} 2' in lines
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+        assert "latency_seconds_count 3" in lines
+        assert depth.get() == 7
+        with pytest.raises(ValueError):
+            registry.counter("depth", "Duplicate")
+
+    def test_route_latency_uses_route_template(self):
+        """Requests are labelled by route template, not raw path"""
+        before = scrape().get('http_requests_total{route="/r/{click_id}",method="GET",status="302"}', 0)
+        for i in range(3):
+            client.get(f"/r/click_{i}", follow_redirects=False)
+        client.get("/no/such/path")
+
+        samples = scrape()
+        assert samples['http_requests_total{route="/r/{click_id}",method="GET",status="302"}'] == before + 3
+        assert samples['http_request_duration_seconds_count{route="/r/{click_id}",method="GET"}'] >= 3
+        assert samples['http_requests_total{route="unmatched",method="GET",status="404"}'] >= 1
+        assert not any("/metrics" in series for series in samples)
+
+    def test_rate_limited_requests_labelled(self):
+        """429s from the rate limiter are counted as rate_limited, not unmatched"""
+        registry = Registry()
+        requests = registry.counter("requests_total", "Requests", ("route", "method", "status"))
+        latency = registry.histogram("latency_seconds", "Latency", ("route", "method"))
+        inner = FastAPI()
+
+        @inner.get("/ping")
+        async def ping():
+            return {"ok": True}
+
+        inner.add_middleware(RateLimitMiddleware, limiter=RateLimiter({"ip": RateLimit(1, 1)}), key_func=lambda scope: {"ip": "a"})
+        inner.add_middleware(MetricsMiddleware, requests=requests, latency=latency)
+        limited = TestClient(inner)
+        assert [limited.get("/ping").status_code for _ in range(2)] == [200, 429]
+
+        lines = registry.render().splitlines()
+        assert 'requests_total{route="/ping",method="GET",status="200"} 1' in lines
+        assert 'requests_total{route="rate_limited",method="GET",status="429"} 1' in lines
+
+    def test_business_counters(self):
+        """Clicks and conversions are counted by outcome"""
+        campaign_id = client.post("/v1/campaigns", json={"tenant_id": "tnt_101", "name": "Metrics Campaign", "share_pct": 40.0}).json()["campaign_id"]
+        link_id = client.post("/v1/links", json={"campaign_id": campaign_id, "offer_id": "1234"}).json()["link_id"]
+        before = scrape()
+
+        user_id = f"metrics_{uuid.uuid4().hex[:6]}"
+        click = client.post("/v1/events/click", json={"link_id": link_id, "user_id": user_id}).json()
+        client.post("/v1/events/click", json={"link_id": link_id, "user_id": user_id})
+        client.post("/v1/events/click", json={"link_id": link_id, "user_agent": "curl/8.4.0", "ip_address": "3.3.3.3"})
+        conversion = {"click_id": click["click_id"], "offer_id": "1234", "sale_amount": 500.0,
+                      "order_id": f"ORD-{uuid.uuid4().hex[:8]}", "status": "approved"}
+        client.post("/v1/events/conversion", json=conversion)
+        client.post("/v1/events/conversion", json=conversion)
+
+        after = scrape()
+        for series in ('clicks_total{result="tracked"}', 'clicks_total{result="duplicate"}',
+                       'clicks_total{result="filtered"}', 'conversions_total{result="created"}',
+                       'conversions_total{result="duplicate"}'):
+            assert after[series] == before.get(series, 0) + 1, series
+        assert after['store_size{table="clicks"}'] == len(db.clicks)
+        assert 'queue_depth{queue="conversions"}' in after
+
+    def test_trackier_sync_metrics(self):
+        """A catalogue sync reports its duration and offer count"""
+        result = client.post("/v1/sync/offers").json()
+        assert result["duration_seconds"] > 0
+
+        samples = scrape()
+        assert samples["trackier_sync_offers_count"] == result["offers_processed"]
+        assert samples["trackier_sync_duration_seconds_count"] >= 1
+        assert samples['trackier_syncs_total{status="success"}'] >= 1
@@ -0,0 +1,33 @@
+import pytest
+from money import Money, to_paise, to_rupees
+
+class TestMoney:
+    """
+    Test scenarios for the integer-paise money type
+    """
+
+    def test_to_paise_rounds_half_up(self):
+        """Rupee amounts convert exactly, rounding half a paisa up"""
+        assert to_paise(0.1) == 10
+        assert to_paise(1234.56) == 123456
+        assert to_paise(0.005) == 1
+        assert to_paise("19.994") == 1999
+        assert to_paise(-0.005) == -1
+        assert to_rupees(123456) == 1234.56
+
+    def test_sums_are_exact(self):
+        """Summing many amounts in paise has no float drift"""
+        total = Money.total(Money.from_rupees(0.1) for _ in range(1000))
+        assert total == 10000
+        assert total.rupees == 100.0
+        assert sum([0.1] * 1000) != 100.0  # The float sum drifts
+
+    def test_arithmetic_stays_money(self):
+        """Money arithmetic keeps the type and formats as rupees"""
+        price = Money.from_rupees(19.99)
+        assert isinstance(price + 1, Money)
+        assert isinstance(0 + price, Money)
+        assert isinstance(price * 3, Money)
+        assert str(price * 3) == "₹59.97"
+        assert str(-price) == "-₹19.99"
+        assert repr(price - Money(99)) == "Money(1900)"
@@ -51,7 +51,8 @@ class TestCreatorOnboarding:
             "brand_name": "Test Brand"
         }
         
-        signup_response = client.post("/v1/creators/signup", json=signup_request)
+        signup_response = client.post("/v1/creators/signup", json=signup_request,
+                                      headers={"Authorization": f"Bearer {verify_data['jwt']}"})
         assert signup_response.status_code == 200
         
         # Validate response structure
@@ -0,0 +1,157 @@
+import pytest
+import asyncio
+import time
+import uuid
+from fastapi.testclient import TestClient
+from app import app
+from otp_store import OTPStore, OTPError, MemoryOTPBackend
+
+# Test client
+client = TestClient(app)
+
+class YieldingBackend(MemoryOTPBackend):
+    """Memory backend that yields on every call, like a network store shared by several workers"""
+
+    async def get(self, key):
+        await asyncio.sleep(0)
+        return await super().get(key)
+
+    async def incr(self, key, ttl):
+        await asyncio.sleep(0)
+        return await super().incr(key, ttl)
+
+    async def decr(self, key):
+        await asyncio.sleep(0)
+        return await super().decr(key)
+
+class TestOTPStore:
+    """
+    Test scenarios for expiring, rate-limited OTP requests
+    """
+
+    def test_expired_requests_evicted(self):
+        """Requests past their TTL are unreadable and dropped on the next write"""
+        store = OTPStore(ttl_seconds=1)
+        backend = store.backend
+
+        async def scenario():
+            old = await store.create("+919000000001", "123456", purpose="signup")
+            for key in list(backend.expires):
+                backend.expires[key] = time.time() - 1  # Age everything written so far
+            backend.heap = [(backend.expires[k], k) for k in backend.expires]
+            with pytest.raises(OTPError) as error:
+                await store.verify(old["request_id"], "123456", purpose="signup")
+            assert "expired" in error.value.detail
+            await store.create("+919000000002", "123456", purpose="signup")
+
+        asyncio.run(scenario())
+        assert backend.evicted == 2  # The request and its phone counter
+        assert len(backend) == 2
+
+    def test_code_is_single_use(self):
+        """A matched code consumes the request"""
+        store = OTPStore()
+
+        async def scenario():
+            record = await store.create("+919000000003", "123456", purpose="signup")
+            assert (await store.verify(record["request_id"], "123456", purpose="signup"))["phone"] == "+919000000003"
+            with pytest.raises(OTPError):
+                await store.verify(record["request_id"], "123456", purpose="signup")
+
+        asyncio.run(scenario())
+
+    def test_purpose_must_match(self):
+        """A request made for one flow cannot be verified through another"""
+        store = OTPStore()
+
+        async def scenario():
+            record = await store.create("+919000000004", "123456", purpose="enduser")
+            with pytest.raises(OTPError):
+                await store.verify(record["request_id"], "123456", purpose="creator_login")
+
+        asyncio.run(scenario())
+
+    def test_attempts_lock_request(self):
+        """Too many wrong codes throw the request away"""
+        store = OTPStore(max_attempts=3)
+
+        async def scenario():
+            record = await store.create("+919000000005", "123456", purpose="signup")
+            for _ in range(2):
+                with pytest.raises(OTPError) as error:
+                    await store.verify(record["request_id"], "000000", purpose="signup")
+                assert error.value.status_code == 400
+            with pytest.raises(OTPError) as error:
+                await store.verify(record["request_id"], "000000", purpose="signup")
+            assert error.value.status_code == 429
+            with pytest.raises(OTPError):
+                await store.verify(record["request_id"], "123456", purpose="signup")
+
+        asyncio.run(scenario())
+        assert store.counters["locked"] == 1
+
+    def test_phone_rate_limit_endpoint(self):
+        """Requests beyond the per-phone limit get 429 with Retry-After"""
+        phone = f"+9171{uuid.uuid4().int % 10**8:08d}"
+        for _ in range(10):
+            assert client.post("/v1/auth/otp/request", json={"phone": phone}).status_code == 200
+
+        response = client.post("/v1/auth/otp/request", json={"phone": phone})
+        assert response.status_code == 429
+        assert 0 < int(response.headers["Retry-After"]) <= 900
+        assert client.get("/v1/admin/otp").json()["rate_limited"] >= 1
+
+    def test_ip_rate_limit(self):
+        """Requests beyond the per-IP limit are refused across phones"""
+        store = OTPStore(ip_limit=2)
+
+        async def scenario():
+            for i in range(2):
+                await store.create(f"+91900000001{i}", "123456", purpose="signup", ip="10.0.0.1")
+            with pytest.raises(OTPError) as error:
+                await store.create("+919000000019", "123456", purpose="signup", ip="10.0.0.1")
+            assert error.value.status_code == 429
+            await store.create("+919000000019", "123456", purpose="signup", ip="10.0.0.2")
+
+        asyncio.run(scenario())
+
+    def test_refused_request_not_counted(self):
+        """A request refused by one limit does not use up the other"""
+        store = OTPStore(phone_limit=1, ip_limit=5)
+
+        async def scenario():
+            await store.create("+919000000020", "123456", purpose="signup", ip="10.0.0.3")
+            for _ in range(3):
+                with pytest.raises(OTPError):
+                    await store.create("+919000000020", "123456", purpose="signup", ip="10.0.0.3")
+            assert await store.backend.get("rl:ip:10.0.0.3") == 1
+
+        asyncio.run(scenario())
+
+    def test_concurrent_requests_respect_limit(self):
+        """Requests racing on one phone cannot all pass the limit before any is counted"""
+        store = OTPStore(backend=YieldingBackend(), phone_limit=3)
+
+        async def scenario():
+            return await asyncio.gather(
+                *(store.create("+919000000022", "123456", purpose="signup") for _ in range(10)),
+                return_exceptions=True
+            )
+
+        results = asyncio.run(scenario())
+        assert sum(not isinstance(r, OTPError) for r in results) == 3
+        assert asyncio.run(store.backend.get("rl:phone:+919000000022")) == 3
+
+    def test_concurrent_verifies_consume_once(self):
+        """Of several verifies racing on one code, exactly one succeeds"""
+        store = OTPStore()
+
+        async def scenario():
+            record = await store.create("+919000000021", "123456", purpose="signup")
+            return await asyncio.gather(
+                *(store.verify(record["request_id"], "123456", purpose="signup") for _ in range(3)),
+                return_exceptions=True
+            )
+
+        results = asyncio.run(scenario())
+        assert sum(not isinstance(r, OTPError) for r in results) == 1
@@ -0,0 +1,110 @@
+import pytest
+import asyncio
+import time
+from payout_dispatcher import PayoutDispatcher, PayoutProviderError, RateLimitedError, FakePayoutProvider
+
+class CountingProvider:
+    """Fake provider that tracks peak concurrency and can fail on demand"""
+
+    def __init__(self, latency=0.01, failures=None):
+        self.latency = latency
+        self.failures = list(failures or [])
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+
+    async def issue(self, amount, idempotency_key):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.latency)
+            if self.failures:
+                raise self.failures.pop(0)
+            return {"reference_id": f"REF-{self.calls}", "receipt": {"amount": amount}}
+        finally:
+            self.active -= 1
+
+
+def make_dispatcher(provider, rate=1000, burst=None, concurrency=8, **kwargs):
+    dispatcher = PayoutDispatcher(retry_backoff=0.001, **kwargs)
+    dispatcher.register("gift_card", provider, rate_per_second=rate, burst=burst, max_concurrency=concurrency)
+    return dispatcher
+
+class TestPayoutDispatcher:
+    """
+    Test scenarios for concurrent, rate-limited payout dispatch
+    """
+
+    def test_concurrency_cap(self):
+        """No more than max_concurrency provider calls run at once"""
+        provider = CountingProvider(latency=0.02)
+        dispatcher = make_dispatcher(provider, concurrency=3)
+
+        results = asyncio.run(dispatcher.dispatch([
+            {"method": "gift_card", "amount": 100.0, "idempotency_key": f"k{i}"} for i in range(12)
+        ]))
+
+        assert all(r["status"] == "completed" for r in results)
+        assert provider.peak == 3
+
+    def test_rate_limit(self):
+        """The token bucket spaces calls out to the configured rate"""
+        provider = CountingProvider(latency=0)
+        dispatcher = make_dispatcher(provider, rate=20, burst=1)
+
+        start = time.perf_counter()
+        asyncio.run(dispatcher.dispatch([
+            {"method": "gift_card", "amount": 10.0, "idempotency_key": f"r{i}"} for i in range(6)
+        ]))
+
+        # First call uses the burst token, the other five wait 50ms each
+        assert time.perf_counter() - start >= 0.2
+
+    def test_retry_then_success(self):
+        """Retryable errors, including rate limits, are retried"""
+        provider = CountingProvider(failures=[PayoutProviderError("timeout"), RateLimitedError(retry_after=0.001)])
+        dispatcher = make_dispatcher(provider)
+
+        [result] = asyncio.run(dispatcher.dispatch([{"method": "gift_card", "amount": 50.0, "idempotency_key": "retry"}]))
+
+        assert result["status"] == "completed"
+        assert result["attempts"] == 3
+        assert dispatcher.counters["retried"] == 2
+
+    def test_non_retryable_failure(self):
+        """Non-retryable errors fail after one attempt"""
+        provider = CountingProvider(failures=[PayoutProviderError("invalid VPA", retryable=False)])
+        dispatcher = make_dispatcher(provider)
+
+        [result] = asyncio.run(dispatcher.dispatch([{"method": "gift_card", "amount": 50.0, "idempotency_key": "bad"}]))
+
+        assert result["status"] == "failed"
+        assert result["attempts"] == 1
+        assert result["error"] == "invalid VPA"
+
+    def test_idempotency_key_issues_once(self):
+        """The same key is issued once, whether repeated concurrently or later"""
+        provider = CountingProvider()
+        dispatcher = make_dispatcher(provider)
+        payout = {"method": "gift_card", "amount": 75.0, "idempotency_key": "same"}
+
+        first, second = asyncio.run(dispatcher.dispatch([payout, payout]))
+        [third] = asyncio.run(dispatcher.dispatch([payout]))
+
+        assert provider.calls == 1
+        assert first["reference_id"] == second["reference_id"] == third["reference_id"]
+        assert third["deduplicated"] is True
+
+    def test_unknown_method(self):
+        """Unregistered methods are rejected"""
+        dispatcher = make_dispatcher(FakePayoutProvider(latency=0))
+        with pytest.raises(ValueError):
+            asyncio.run(dispatcher.dispatch([{"method": "paypal", "amount": 1.0}]))
+
+    def test_non_positive_rate_rejected(self):
+        """A zero or negative rate is refused at registration rather than dividing by zero later"""
+        dispatcher = PayoutDispatcher()
+        for rate in (0, -1):
+            with pytest.raises(ValueError):
+                dispatcher.register("upi", FakePayoutProvider(latency=0), rate_per_second=rate)
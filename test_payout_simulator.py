@@ -0,0 +1,114 @@
+import pytest
+import asyncio
+from fastapi.testclient import TestClient
+from app import app, payout_simulator
+from payout_dispatcher import RateLimitedError
+from payout_simulator import PayoutSimulator, LatencyProfile, SimulatedProvider, run_load
+
+# Test client
+client = TestClient(app)
+
+class TestPayoutHistory:
+    """
+    Test scenarios for the bounded, queryable payout simulator history
+    """
+
+    def test_history_is_capped(self):
+        """Oldest entries are evicted from the history and the reference index"""
+        simulator = PayoutSimulator(history_limit=3)
+        references = [simulator.process_payout(100.0, "upi")["reference_id"] for _ in range(5)]
+
+        assert len(simulator.history) == 3
+        assert simulator.get_payout(references[0]) is None
+        assert simulator.get_payout(references[-1])["amount"] == 100.0
+
+        history = simulator.get_payout_history()
+        assert history["retained"] == 3
+        assert history["total_processed"] == 5
+        assert history["totals_by_method"] == {"gift_card": 0, "upi": 5}
+
+    def test_filters_and_pagination(self):
+        """Filters apply before paging and results come back newest first"""
+        simulator = PayoutSimulator()
+        for amount in [50.0, 150.0, 250.0]:
+            simulator.process_payout(amount, "gift_card")
+            simulator.process_payout(amount, "upi")
+
+        first = simulator.get_payout_history(method="upi", min_amount=100.0, limit=1)
+        assert [e["amount"] for e in first["items"]] == [250.0]
+        assert first["has_more"] is True
+
+        second = simulator.get_payout_history(method="upi", min_amount=100.0, limit=1, offset=1)
+        assert [e["amount"] for e in second["items"]] == [150.0]
+        assert second["has_more"] is False
+
+        assert simulator.get_payout_history(date_from="2999-01-01")["count"] == 0
+
+    def test_history_endpoint(self):
+        """The admin endpoint pages results and looks up single payouts"""
+        receipt = payout_simulator.process_payout(123.0, "gift_card")
+
+        response = client.get("/v1/admin/payout_history?method=gift_card&min_amount=123&max_amount=123&limit=5")
+        assert response.status_code == 200
+        assert receipt["reference_id"] in [e["reference_id"] for e in response.json()["items"]]
+
+        entry = client.get(f"/v1/admin/payout_history/{receipt['reference_id']}").json()
+        assert entry["code"] == receipt["reference_id"]
+
+        assert client.get("/v1/admin/payout_history?limit=0").status_code == 400
+        assert client.get("/v1/admin/payout_history/UNKNOWN").status_code == 404
+
+class TestPayoutLoadMode:
+    """
+    Test scenarios for the payout simulator load mode
+    """
+
+    def test_load_run_reports_outcomes(self):
+        """Failures and 429s are retried and counted; latency percentiles are reported"""
+        report = asyncio.run(run_load(
+            volume=200,
+            latency=LatencyProfile("fixed", 0.001),
+            failure_rate=0.1,
+            rate_limit_rate=0.1,
+            retry_backoff=0.001,
+            max_attempts=5
+        ))
+
+        assert report["completed"] + report["failed"] == 200
+        assert report["attempts"] > 200
+        calls = sum(p["calls"] for p in report["providers"].values())
+        assert calls == report["attempts"]
+        assert sum(p["rate_limited"] for p in report["providers"].values()) > 0
+        assert report["latency_ms"]["p50"] <= report["latency_ms"]["p99"] <= report["latency_ms"]["max"]
+
+    def test_provider_capacity_answers_429(self):
+        """Calls beyond the provider's capacity are rate limited"""
+        provider = SimulatedProvider(PayoutSimulator(), "upi", latency=LatencyProfile("fixed", 0), capacity_per_second=1)
+
+        async def burst():
+            await provider.issue(10.0, "a")
+            await provider.issue(10.0, "b")
+
+        with pytest.raises(RateLimitedError):
+            asyncio.run(burst())
+
+    def test_latency_profiles(self):
+        """Latency specs parse and unknown distributions are rejected"""
+        assert LatencyProfile.parse("fixed:0.25").sample() == 0.25
+        assert 0.1 <= LatencyProfile.parse("uniform:0.1:0.2").sample() <= 0.2
+        with pytest.raises(ValueError):
+            LatencyProfile("pareto")
+        with pytest.raises(ValueError):
+            LatencyProfile.parse("lognormal:0:0.5")
+
+    def test_load_test_endpoint(self):
+        """The admin endpoint runs a small load test"""
+        response = client.post("/v1/admin/payout_load_test?volume=20&latency=fixed:0.001&failure_rate=0&rate_limit_rate=0")
+        assert response.status_code == 200
+        assert response.json()["completed"] == 20
+        assert client.post("/v1/admin/payout_load_test?latency=bogus").status_code == 400
+
+    def test_load_test_rejects_non_positive_parameters(self):
+        """Settings that would hang or crash the run are rejected up front"""
+        for query in ("concurrency=0", "dispatch_rate=0", "capacity_per_second=-1", "latency=lognormal:0:0.5", "failure_rate=2"):
+            assert client.post(f"/v1/admin/payout_load_test?volume=5&{query}").status_code == 400
@@ -0,0 +1,177 @@
+import pytest
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from app import app, db, payout_run_service
+
+# Test client
+client = TestClient(app)
+
+class TestPayoutRun:
+    """
+    Test scenarios for Block 6: payout runs over the ledger
+    """
+
+    def setup_method(self):
+        """Create a link and zero cool-off on the test offer so entries are due immediately"""
+        self.offer = db.get_offer("1234")
+        self.original_cool_off = self.offer["cool_off_days"]
+        self.offer["cool_off_days"] = 0
+
+        campaign = client.post("/v1/campaigns", json={
+            "tenant_id": "tnt_101",
+            "name": "Payout Campaign",
+            "share_pct": 40.0
+        }).json()
+        self.link_id = client.post("/v1/links", json={
+            "campaign_id": campaign["campaign_id"],
+            "offer_id": "1234"
+        }).json()["link_id"]
+        self.user_id = f"payout_user_{uuid.uuid4().hex[:6]}"
+
+    def teardown_method(self):
+        self.offer["cool_off_days"] = self.original_cool_off
+
+    def convert(self, status="approved", sale_amount=1000.0, order_id=None, user_id=None):
+        click = client.post("/v1/events/click", json={"link_id": self.link_id, "user_id": user_id or self.user_id}).json()
+        payload = {
+            "click_id": click["click_id"],
+            "offer_id": "1234",
+            "sale_amount": sale_amount,
+            "order_id": order_id or f"ORD-{uuid.uuid4().hex[:8]}",
+            "status": status
+        }
+        response = client.post("/v1/events/conversion", json=payload)
+        assert response.status_code == 200
+        return payload, response.json()["ledger_id"]
+
+    def test_due_entries_paid_once(self):
+        """Queued entries past cool-off are paid in one payout per user, exactly once"""
+        self.convert()
+        self.convert()
+
+        response = client.post("/v1/rewards/payout/run")
+        assert response.status_code == 200
+        assert self.user_id in response.json()["users_paid"]
+
+        payouts = client.get(f"/v1/rewards/user?user_id={self.user_id}").json()["payouts"]
+        assert len(payouts) == 1
+        assert len(payouts[0]["ledger_ids"]) == 2
+        assert all(l["status"] == "paid" for l in db.ledger if l["ledger_id"] in payouts[0]["ledger_ids"])
+
+        # Nothing left to pay on the next run
+        rerun = client.post("/v1/rewards/payout/run").json()
+        assert self.user_id not in rerun["users_paid"]
+
+    def test_pending_entry_indexed_once_approved(self):
+        """Pending conversions are skipped until a postback approves them"""
+        payload, ledger_id = self.convert(status="pending")
+
+        first = client.post("/v1/rewards/payout/run").json()
+        assert self.user_id not in first["users_paid"]
+
+        client.post("/v1/events/conversion", json={**payload, "status": "approved"})
+        second = client.post("/v1/rewards/payout/run").json()
+        assert self.user_id in second["users_paid"]
+
+    def test_cooling_off_entries_not_popped(self):
+        """Entries still in cool-off stay in the index for a later run"""
+        self.offer["cool_off_days"] = 30
+        _, ledger_id = self.convert()
+
+        response = client.post("/v1/rewards/payout/run").json()
+        assert self.user_id not in response["users_paid"]
+        assert ledger_id in db.payout_heap_ids
+        assert datetime.fromisoformat(response["next_eligible_at"]) > datetime.utcnow()
+
+    def test_small_amounts_not_indexed(self):
+        """Entries below the minimum payout are never indexed"""
+        _, ledger_id = self.convert(sale_amount=10.0)
+        assert ledger_id not in db.payout_heap_ids
+
+    def test_chunked_run_resumes_from_checkpoint(self):
+        """A partially processed run keeps its entries reserved until resumed"""
+        users = [f"{self.user_id}_{i}" for i in range(3)]
+        ledger_ids = [self.convert(user_id=u)[1] for u in users]
+
+        response = client.post("/v1/rewards/payout/run?chunk_size=1&max_chunks=1").json()
+        run_id = response["run_id"]
+        assert response["status"] == "running"
+        assert response["chunks_done"] == 1
+        assert response["chunks_total"] >= 3
+
+        # Entries in unprocessed chunks are reserved, not picked up by a new run
+        reserved = [db.get_ledger_entry(lid) for lid in ledger_ids if db.get_ledger_entry(lid)["status"] == "queued"]
+        assert reserved and all(l["payout_run_id"] == run_id for l in reserved)
+        other_run = client.post("/v1/rewards/payout/run").json()
+        assert not set(other_run["users_paid"]) & set(users)
+
+        progress = client.get(f"/v1/rewards/payout/runs/{run_id}").json()
+        assert [c["status"] for c in progress["chunks"]].count("done") == 1
+
+        resumed = client.post(f"/v1/rewards/payout/runs/{run_id}/resume").json()
+        assert resumed["status"] == "completed"
+        assert set(users) <= set(resumed["users_paid"])
+
+        # Every paid entry records the payout it belongs to
+        for lid in ledger_ids:
+            entry = db.get_ledger_entry(lid)
+            assert entry["status"] == "paid"
+            payout = next(p for p in db.payouts if p["payout_id"] == entry["payout_id"])
+            assert payout["run_id"] == run_id
+            assert lid in payout["ledger_ids"]
+
+    def test_workers_claim_distinct_chunks(self):
+        """Workers pulling chunks from the same run never share one"""
+        for i in range(2):
+            self.convert(user_id=f"{self.user_id}_w{i}")
+        run_id = client.post("/v1/rewards/payout/run?chunk_size=1&max_chunks=0").json()["run_id"]
+
+        claimed = []
+        while True:
+            response = client.post(f"/v1/rewards/payout/runs/{run_id}/chunks/next?worker_id=w{len(claimed)}").json()
+            if response["chunk"] is None:
+                break
+            assert response["chunk"]["status"] == "done"
+            claimed.append(response["chunk"]["chunk_id"])
+
+        assert len(claimed) == len(set(claimed)) >= 2
+        assert client.get(f"/v1/rewards/payout/runs/{run_id}").json()["status"] == "completed"
+
+    def test_empty_runs_not_kept_and_completed_runs_pruned(self, monkeypatch):
+        """Runs with nothing due are not stored, and only the newest completed runs are kept"""
+        client.post("/v1/rewards/payout/run")
+        empty = client.post("/v1/rewards/payout/run").json()
+        assert empty["chunks_total"] == 0
+        assert client.get(f"/v1/rewards/payout/runs/{empty['run_id']}").status_code == 404
+
+        monkeypatch.setattr(db, "payout_run_retention", 1)
+        run_ids = []
+        for i in range(2):
+            self.convert(user_id=f"{self.user_id}_r{i}")
+            run_ids.append(client.post("/v1/rewards/payout/run").json()["run_id"])
+        assert run_ids[0] not in db.payout_runs
+        assert run_ids[1] in db.payout_runs
+
+    def test_expired_lease_checkpointed_once(self):
+        """When a lease expires mid-chunk, only the new holder checkpoints and payouts are not duplicated"""
+        _, ledger_id = self.convert()
+        run = payout_run_service.create_run(chunk_size=100)
+        payouts_before = len(db.payouts)
+
+        async def scenario():
+            stale = payout_run_service.claim_chunk(run, "w1")
+            first = asyncio.create_task(payout_run_service.process_chunk(run, stale))
+            await asyncio.sleep(0)  # w1 is now waiting on the provider
+            stale["claimed_at"] = (datetime.utcnow() - timedelta(seconds=payout_run_service.CHUNK_LEASE_SECONDS + 1)).isoformat()
+            current = payout_run_service.claim_chunk(run, "w2")
+            assert current is stale and current["claimed_by"] == "w2"
+            await payout_run_service.process_chunk(run, current)
+            await first
+
+        asyncio.run(scenario())
+        assert run["chunks_done"] == run["chunks_total"] == 1
+        assert run["status"] == "completed"
+        assert db.get_ledger_entry(ledger_id)["status"] == "paid"
+        assert len(db.payouts) == payouts_before + 1
@@ -0,0 +1,114 @@
+import pytest
+import asyncio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import app as app_module
+from app import app, rate_limit_keys, api_key_auth
+from auth import token_auth
+from rate_limiter import RateLimit, RateLimiter, RateLimitMiddleware, MemoryBucketStore
+
+# Test client
+client = TestClient(app)
+
+def creator_token(tenant_id):
+    return token_auth.issue(tenant_id, role="creator", tenant_id=tenant_id)
+
+def limited_app(limits, key_func):
+    """Tiny app behind the middleware so tight limits don't affect the main app"""
+    inner = FastAPI()
+
+    @inner.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @inner.get("/health")
+    async def health():
+        return {"ok": True}
+
+    limiter = RateLimiter(limits)
+    inner.add_middleware(RateLimitMiddleware, limiter=limiter, key_func=key_func)
+    return TestClient(inner), limiter
+
+class TestRateLimiter:
+    """
+    Test scenarios for the token-bucket rate limit middleware
+    """
+
+    def test_burst_then_429(self):
+        """A key gets its burst, then 429 with Retry-After; other keys are unaffected"""
+        test_client, limiter = limited_app({"ip": RateLimit(0.5, 3)}, lambda scope: {"ip": dict(scope["headers"]).get(b"x-ip", b"").decode()})
+
+        for _ in range(3):
+            assert test_client.get("/ping", headers={"X-IP": "1.1.1.1"}).status_code == 200
+        response = test_client.get("/ping", headers={"X-IP": "1.1.1.1"})
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "2"
+        assert "ip" in response.json()["detail"]
+
+        assert test_client.get("/ping", headers={"X-IP": "2.2.2.2"}).status_code == 200
+        assert test_client.get("/health", headers={"X-IP": "1.1.1.1"}).status_code == 200  # Exempt
+        assert limiter.stats()["limited_by_scope"]["ip"] == 1
+
+    def test_any_exhausted_scope_limits(self):
+        """A tenant's bucket limits it across IPs"""
+        test_client, _ = limited_app(
+            {"ip": RateLimit(100, 100), "tenant": RateLimit(1, 2)},
+            lambda scope: {"ip": dict(scope["headers"]).get(b"x-ip", b"").decode(), "tenant": "tnt_busy"}
+        )
+        assert test_client.get("/ping", headers={"X-IP": "1.1.1.1"}).status_code == 200
+        assert test_client.get("/ping", headers={"X-IP": "2.2.2.2"}).status_code == 200
+        response = test_client.get("/ping", headers={"X-IP": "3.3.3.3"})
+        assert response.status_code == 429
+        assert "tenant" in response.json()["detail"]
+
+    def test_buckets_bounded(self):
+        """The memory store keeps at most max_keys buckets, dropping the least recent"""
+        store = MemoryBucketStore(max_keys=100)
+        limit = RateLimit(1, 1)
+
+        async def scenario():
+            for i in range(1000):
+                await store.take(f"ip:{i}", limit)
+            return await store.take("ip:999", limit)
+
+        assert asyncio.run(scenario()) > 0  # Recent key kept its state
+        assert len(store) == 100
+        assert store.evicted == 900
+
+    def test_request_keys(self):
+        """Requests are keyed by IP, plus API key and its tenant, or the creator's tenant"""
+        api_key = client.post("/v1/creator/api_keys", headers={"Authorization": f"Bearer {creator_token('tnt_101')}"}).json()["api_key"]
+        scope = {"type": "http", "client": ("10.0.0.9", 1234), "headers": [(b"x-api-key", api_key.encode())]}
+        keys = rate_limit_keys(scope)
+        assert keys["ip"] == "10.0.0.9"
+        assert keys["tenant"] == "tnt_101"
+        assert api_key not in keys["api_key"]
+        lookups = api_key_auth.counters["lookups"]
+        rate_limit_keys(scope)
+        assert api_key_auth.counters["lookups"] == lookups  # Served from the auth cache
+
+        scope = {"type": "http", "client": ("10.0.0.9", 1234), "headers": [(b"authorization", f"Bearer {creator_token('tnt_101')}".encode())]}
+        assert rate_limit_keys(scope)["tenant"] == "tnt_101"
+        assert scope["state"]["creator_tenant_id"] == "tnt_101"
+
+        assert client.get("/v1/admin/rate_limits").json()["allowed"] > 0
+
+    def test_untrusted_identities_not_used(self, monkeypatch):
+        """Unknown API keys and demo tokens get no buckets of their own"""
+        monkeypatch.setattr(app_module, "ALLOW_DEMO_TOKENS", True)
+        scope = {"type": "http", "client": ("10.0.0.9", 1234), "headers": [
+            (b"x-api-key", b"pk_live_unknown"), (b"authorization", b"Bearer mock_jwt_creator_tnt_101")
+        ]}
+        assert rate_limit_keys(scope) == {"ip": "10.0.0.9"}
+
+    def test_forwarded_for_from_trusted_proxies(self, monkeypatch):
+        """X-Forwarded-For is only followed through trusted proxies, from the nearest hop"""
+        monkeypatch.setattr(app_module, "TRUSTED_PROXIES", [app_module.ipaddress.ip_network("10.0.0.0/8")])
+        def ip(peer, forwarded):
+            return rate_limit_keys({"type": "http", "client": (peer, 1234), "headers": [(b"x-forwarded-for", forwarded.encode())]})["ip"]
+
+        assert ip("10.0.0.1", "1.1.1.1, 203.0.113.7, 10.0.0.5") == "203.0.113.7"
+        assert ip("198.51.100.2", "203.0.113.7") == "198.51.100.2"
+        assert ip("10.0.0.1", "10.0.0.2") == "10.0.0.2"
+        monkeypatch.setattr(app_module, "TRUST_FORWARDED_FOR", True)
+        assert ip("198.51.100.2", "1.1.1.1, 203.0.113.7") == "1.1.1.1"
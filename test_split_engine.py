@@ -0,0 +1,136 @@
+import pytest
+import uuid
+from fastapi.testclient import TestClient
+from app import app, db
+from auth import token_auth
+from money import to_paise
+from split_engine import SplitEngine, np
+
+# Test client
+client = TestClient(app)
+
+def creator_token(tenant_id):
+    return token_auth.issue(tenant_id, role="creator", tenant_id=tenant_id)
+
+CREATOR_HEADERS = {"Authorization": f"Bearer {creator_token('tnt_101')}"}
+
+class TestSplitEngine:
+    """
+    Test scenarios for batch commission splits and what-if recalculation
+    """
+
+    def test_split_rounds_to_paise(self):
+        """Splits round half-up to the paisa and always add up"""
+        split = SplitEngine(use_numpy=False).split(999.99, 4.5, 40.0)
+
+        # 4.5% of 999.99 is 44.99955 -> 45.00; the user's 60% is 27.00
+        assert split["base_commission"] == 45.0
+        assert split["user_pct"] == 60.0
+        assert split["user_amount"] == 27.0
+        assert split["creator_amount"] == 18.0
+
+    def test_batch_parts_sum_to_commission(self):
+        """user_amount + creator_amount equals base_commission to the paisa"""
+        sales = [0.01, 1.05, 333.33, 1234.56, 99999.99]
+        result = SplitEngine(use_numpy=False).split_batch(sales, [7.5] * 5, [33.3] * 5)
+
+        for base, user, creator in zip(result["base_commission"], result["user_amount"], result["creator_amount"]):
+            assert round(user * 100) + round(creator * 100) == round(base * 100)
+
+    def test_sale_amounts_converted_like_the_ledger(self):
+        """Sale amounts become paise with the same rounding as money.to_paise"""
+        sales = [0.004999, 10.004999, 1.005, 0.285]
+        result = SplitEngine(use_numpy=False).split_batch(sales, [100.0] * 4, [0.0] * 4)
+        assert [round(base * 100) for base in result["base_commission"]] == [to_paise(s) for s in sales]
+
+    @pytest.mark.skipif(np is None, reason="numpy not installed")
+    def test_numpy_matches_python(self):
+        """The NumPy path gives the same splits as the pure-Python one"""
+        sales = [i * 13.37 for i in range(1, 500)]
+        pcts = [(i % 20) + 0.25 for i in range(1, 500)]
+        shares = [10 + (i % 80) for i in range(1, 500)]
+        assert SplitEngine(use_numpy=True).split_batch(sales, pcts, shares) == SplitEngine(use_numpy=False).split_batch(sales, pcts, shares)
+
+    def test_mismatched_columns(self):
+        """Columns of different lengths are rejected"""
+        with pytest.raises(ValueError):
+            SplitEngine().split_batch([100.0], [5.0, 6.0], [40.0])
+
+    def test_what_if_then_recalculate(self):
+        """What-if previews without changing entries; recalculate applies and moves balances"""
+        campaign_id = client.post("/v1/campaigns", json={
+            "tenant_id": "tnt_101",
+            "name": "Split Campaign",
+            "share_pct": 40.0
+        }).json()["campaign_id"]
+        link_id = client.post("/v1/links", json={"campaign_id": campaign_id, "offer_id": "1234"}).json()["link_id"]
+        ledger_ids = []
+        for _ in range(3):
+            click = client.post("/v1/events/click", json={"link_id": link_id, "user_id": "split_user"}).json()
+            ledger_ids.append(client.post("/v1/events/conversion", json={
+                "click_id": click["click_id"],
+                "offer_id": "1234",
+                "sale_amount": 1000.0,
+                "order_id": f"ORD-{uuid.uuid4().hex[:8]}",
+                "status": "pending"
+            }).json()["ledger_id"])
+        entry = db.get_ledger_entry(ledger_ids[0])
+        user_amount = entry["user_amount"]
+
+        preview = client.post("/v1/creator/splits/what_if", headers=CREATOR_HEADERS, json={
+            "campaign_id": campaign_id,
+            "share_pct": 20.0,
+            "include_entries": True
+        }).json()
+        assert preview["applied"] is False
+        assert preview["entries"] == 3
+        assert preview["delta"]["user_amount"] > 0
+        assert preview["delta"]["user_amount"] == -preview["delta"]["creator_amount"]
+        assert entry["user_amount"] == user_amount
+
+        tenant_balance = db.get_balance("tenant", "tnt_101")["balance_paise"]
+        applied = client.post("/v1/creator/splits/recalculate", headers=CREATOR_HEADERS, json={
+            "campaign_id": campaign_id,
+            "share_pct": 20.0
+        }).json()
+        assert applied["applied"] is True
+        assert entry["user_pct"] == 80.0
+        assert entry["user_amount_paise"] == round(entry["base_commission_paise"] * 0.8)
+        assert db.get_campaign(campaign_id)["share_pct"] == 20.0
+        assert db.get_balance("tenant", "tnt_101")["balance_paise"] == tenant_balance + round(applied["delta"]["creator_amount"] * 100)
+
+    def test_recalculate_lifts_entry_over_payout_minimum(self):
+        """An entry raised over the payout minimum by a recalculation becomes payable"""
+        campaign_id = client.post("/v1/campaigns", json={
+            "tenant_id": "tnt_101",
+            "name": "Minimum Campaign",
+            "share_pct": 90.0
+        }).json()["campaign_id"]
+        link_id = client.post("/v1/links", json={"campaign_id": campaign_id, "offer_id": "1234"}).json()["link_id"]
+        click = client.post("/v1/events/click", json={"link_id": link_id, "user_id": "minimum_user"}).json()
+        ledger_id = client.post("/v1/events/conversion", json={
+            "click_id": click["click_id"],
+            "offer_id": "1234",
+            "sale_amount": 1000.0,
+            "order_id": f"ORD-{uuid.uuid4().hex[:8]}",
+            "status": "approved"
+        }).json()["ledger_id"]
+        entry = db.get_ledger_entry(ledger_id)
+        assert entry["status"] == "queued"
+        assert entry["user_amount_paise"] < db.MIN_PAYOUT_PAISE
+        assert ledger_id not in db.payout_heap_ids
+
+        client.post("/v1/creator/splits/recalculate", headers=CREATOR_HEADERS, json={
+            "campaign_id": campaign_id,
+            "share_pct": 10.0
+        })
+        assert entry["user_amount_paise"] >= db.MIN_PAYOUT_PAISE
+        assert ledger_id in db.payout_heap_ids
+
+    def test_creator_cannot_change_commission(self):
+        """Offer commission revisions are admin-only"""
+        response = client.post("/v1/creator/splits/recalculate", headers=CREATOR_HEADERS, json={
+            "offer_id": "1234",
+            "base_commission_pct": 50.0
+        })
+        assert response.status_code == 400
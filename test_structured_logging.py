@@ -0,0 +1,94 @@
+import io
+import json
+import logging
+import random
+import pytest
+from fastapi.testclient import TestClient
+import app as app_module
+from app import app
+from structured_logging import LogPipeline, EventLogger, parse_sample_rates, log_pipeline
+
+# Test client
+client = TestClient(app)
+
+def make_pipeline(name, **kwargs):
+    stream = io.StringIO()
+    pipeline = LogPipeline(handler=logging.StreamHandler(stream), name=f"test_{name}", **kwargs)
+    return pipeline, stream
+
+def lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+class TestStructuredLogging:
+    """
+    Test scenarios for the queued JSON logging pipeline
+    """
+
+    def test_json_events(self):
+        """Events are written as one JSON object per line with their fields"""
+        pipeline, stream = make_pipeline("json")
+        pipeline.start()
+        log = EventLogger("clicks", pipeline)
+        log.info("click.batch", created=3, link_id="lnk_1")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            log.error("click.failed", exc_info=True, link_id="lnk_1")
+        pipeline.stop()
+
+        first, second = lines(stream)
+        assert first["event"] == "click.batch"
+        assert first["logger"] == "test_json.clicks"
+        assert (first["level"], first["created"], first["link_id"]) == ("info", 3, "lnk_1")
+        assert second["level"] == "error"
+        assert "ValueError: boom" in second["exc"]
+
+    def test_sampling(self):
+        """Sampled events are kept at their rate and carry it; warnings are never sampled"""
+        random.seed(7)
+        pipeline, stream = make_pipeline("sampling", sample_rates={"click.tracked": 0.1})
+        pipeline.start()
+        log = EventLogger("clicks", pipeline)
+        for _ in range(1000):
+            log.info("click.tracked")
+            log.warning("click.tracked")
+        log.info("click.other")
+        pipeline.stop()
+
+        records = lines(stream)
+        sampled = [r for r in records if r["level"] == "info" and r["event"] == "click.tracked"]
+        assert 50 < len(sampled) < 150
+        assert all(r["sample_rate"] == 0.1 for r in sampled)
+        assert sum(r["level"] == "warning" for r in records) == 1000
+        assert pipeline.stats()["sampled_out"] == 1000 - len(sampled)
+        assert parse_sample_rates("a=0.5, b=2") == {"a": 0.5, "b": 1.0}
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """With no writer draining the queue, extra records are dropped and counted"""
+        pipeline, stream = make_pipeline("full", queue_size=10)
+        log = EventLogger("clicks", pipeline)
+        pipeline.logger.handlers = [pipeline.handler]
+        pipeline.logger.propagate = False
+        pipeline.logger.setLevel(logging.INFO)
+        for i in range(25):
+            log.info("click.batch", index=i)
+        assert pipeline.stats()["dropped"] == 15
+        assert pipeline.stats()["queued"] == 10
+
+    def test_app_logs_through_pipeline(self):
+        """App handlers log through the shared queued pipeline"""
+        assert log_pipeline.stats()["running"]
+        logged = log_pipeline.counters["logged"]
+        campaign = client.post("/v1/campaigns", json={"tenant_id": "tnt_101", "name": "Logging Campaign", "share_pct": 40.0})
+        assert campaign.status_code == 200
+        assert log_pipeline.counters["logged"] > logged
+        assert "log_records_dropped_total" in client.get("/metrics").text
+
+    def test_otp_events_mask_phone(self, monkeypatch):
+        """otp.sent carries a masked phone number and never the code"""
+        events = []
+        monkeypatch.setattr(app_module.log, "info", lambda event, **fields: events.append((event, fields)))
+        assert client.post("/v1/auth/otp/request", json={"phone": "+919812345678"}).status_code == 200
+        [(event, fields)] = [e for e in events if e[0] == "otp.sent"]
+        assert fields["phone"] == "+********5678"
+        assert "123456" not in json.dumps(fields)
@@ -0,0 +1,66 @@
+import pytest
+import uuid
+from fastapi.testclient import TestClient
+from app import app, db, normalize_phone
+from auth import token_auth
+
+# Test client
+client = TestClient(app)
+
+def creator_token(tenant_id):
+    return token_auth.issue(tenant_id, role="creator", tenant_id=tenant_id)
+
+class TestTenantIndex:
+    """
+    Test scenarios for the unique phone and email indexes on tenants
+    """
+
+    def setup_method(self):
+        digits = f"{uuid.uuid4().int % 10**8:08d}"
+        self.national = f"98{digits}"
+        self.email = f"Index.{digits}@Example.com"
+
+    def signup(self, phone, email):
+        return client.post("/v1/creators/signup", json={"name": "Index Creator", "email": email, "phone": phone})
+
+    def test_normalize_phone(self):
+        """Common Indian formats all normalize to E.164"""
+        for phone in ["+91 98765-43210", "09876543210", "9876543210", "0091 9876543210", "(+91) 98765 43210"]:
+            assert normalize_phone(phone) == "+919876543210"
+        with pytest.raises(ValueError):
+            normalize_phone("12345")
+
+    def test_duplicate_phone_in_other_format_rejected(self):
+        """A phone already on file is rejected whatever its formatting"""
+        response = self.signup(f"+91 {self.national[:5]} {self.national[5:]}", self.email)
+        assert response.status_code == 200
+        tenant = db.get_tenant(response.json()["tenant_id"])
+        assert tenant["phone"] == f"+91{self.national}"
+        assert tenant["email"] == self.email.lower()
+
+        duplicate = self.signup(f"0{self.national}", f"other.{self.email}")
+        assert duplicate.status_code == 400
+        assert "phone number" in duplicate.json()["detail"]
+
+    def test_duplicate_email_rejected(self):
+        """Emails are unique regardless of case"""
+        assert self.signup(self.national, self.email).status_code == 200
+        duplicate = self.signup(f"97{self.national[2:]}", self.email.upper())
+        assert duplicate.status_code == 400
+        assert "email" in duplicate.json()["detail"]
+
+    def test_login_by_any_format(self):
+        """Creator login finds the tenant through the phone index"""
+        tenant_id = self.signup(self.national, self.email).json()["tenant_id"]
+        assert db.find_tenant_by_phone(f"+91-{self.national}")["tenant_id"] == tenant_id
+        assert client.post("/v1/auth/creator/login", json={"phone": f"0{self.national}"}).status_code == 200
+
+    def test_profile_update_moves_index(self):
+        """Changing a creator's phone frees the old number and claims the new one"""
+        tenant_id = self.signup(self.national, self.email).json()["tenant_id"]
+        new_phone = f"96{self.national[2:]}"
+        response = client.put("/v1/creator/profile", headers={"Authorization": f"Bearer {creator_token(tenant_id)}"},
+                              json={"phone": new_phone})
+        assert response.status_code == 200
+        assert db.find_tenant_by_phone(self.national) is None
+        assert db.find_tenant_by_phone(new_phone)["tenant_id"] == tenant_id
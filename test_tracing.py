@@ -0,0 +1,93 @@
+import asyncio
+import json
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from app import app
+from tracing import Tracer, FileSpanExporter, tracer
+
+# Test client
+client = TestClient(app)
+
+def make_conversion():
+    campaign_id = client.post("/v1/campaigns", json={"tenant_id": "tnt_101", "name": "Tracing Campaign", "share_pct": 40.0}).json()["campaign_id"]
+    link_id = client.post("/v1/links", json={"campaign_id": campaign_id, "offer_id": "1234"}).json()["link_id"]
+    click = client.post("/v1/events/click", json={"link_id": link_id, "user_id": f"trace_{uuid.uuid4().hex[:6]}"}).json()
+    return {"click_id": click["click_id"], "offer_id": "1234", "sale_amount": 800.0,
+            "order_id": f"ORD-{uuid.uuid4().hex[:8]}", "status": "approved"}
+
+class TestTracing:
+    """
+    Test scenarios for per-request tracing
+    """
+
+    def test_nested_spans_and_totals(self):
+        """Spans nest under the active span and are totalled per name"""
+        local = Tracer(slow_ms=0, top_n=2, max_spans=3)
+
+        @local.traced("db.get")
+        def get():
+            return 1
+
+        @local.traced("trackier.fetch")
+        async def fetch():
+            await asyncio.sleep(0.01)
+            return get()
+
+        assert get() == 1  # No active trace: plain call
+        with local.trace("GET /x", request_id="req-1") as trace:
+            asyncio.run(fetch())
+            for _ in range(4):
+                get()
+
+        assert trace.request_id == "req-1"
+        assert trace.totals["db.get"][0] == 5
+        assert (len(trace.spans), trace.dropped) == (3, 3)
+        inner, fetch_span = trace.spans[:2]
+        assert fetch_span.parent_id == trace.root.span_id
+        assert inner.parent_id == fetch_span.span_id
+        slow = local.slow[-1]
+        assert slow["top_spans"][0]["name"] == "trackier.fetch"
+        assert slow["spans"] == 6
+
+    def test_request_id_propagation(self):
+        """X-Request-ID is echoed back, or generated when absent"""
+        response = client.get("/v1/offers", headers={"X-Request-ID": "abc-123"})
+        assert response.headers["x-request-id"] == "abc-123"
+        generated = client.get("/v1/offers").headers["x-request-id"]
+        assert len(generated) == 32
+        assert client.get("/v1/offers", headers={"X-Request-ID": "bad id\n"}).headers["x-request-id"] != "bad id\n"
+
+    def test_conversion_spans(self, monkeypatch):
+        """A conversion request records DB lookups, scoring and the split under its route"""
+        conversion = make_conversion()
+        monkeypatch.setattr(tracer, "slow_ms", 0)
+        monkeypatch.setattr(tracer, "top_n", 50)
+        response = client.post("/v1/events/conversion", json=conversion, headers={"X-Request-ID": "conv-trace"})
+        assert response.status_code == 200
+
+        slow = client.get("/v1/admin/traces/slow").json()["slow"]
+        entry = next(e for e in reversed(slow) if e["request_id"] == "conv-trace")
+        assert entry["name"] == "POST /v1/events/conversion"
+        assert entry["status_code"] == 200
+        traced = {s["name"] for s in entry["top_spans"]}
+        assert {"db.get_click", "db.get_link", "db.create_ledger_entry", "split_engine.split", "conversion_scorer.score"} <= traced
+
+    def test_file_exporter_writes_otlp(self, tmp_path):
+        """Finished traces are appended as OTLP/JSON, continuing an incoming traceparent"""
+        path = tmp_path / "traces.jsonl"
+        local = Tracer(exporter=FileSpanExporter(str(path)))
+        parent = "00-" + "a" * 32 + "-" + "b" * 16 + "-01"
+        with local.trace("POST /v1/sync/offers", traceparent=parent):
+            with local.span("trackier.get_campaigns", offers=3):
+                pass
+        local.exporter.flush()
+
+        payload = json.loads(path.read_text().splitlines()[0])
+        spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        root, child = spans
+        assert root["traceId"] == child["traceId"] == "a" * 32
+        assert root["parentSpanId"] == "b" * 16
+        assert child["parentSpanId"] == root["spanId"]
+        assert child["attributes"] == [{"key": "offers", "value": {"intValue": "3"}}]
+        assert local.exporter.stats()["exported"] == 1
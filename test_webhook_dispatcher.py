@@ -0,0 +1,199 @@
+import pytest
+import asyncio
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from fastapi.testclient import TestClient
+import app as app_module
+import webhook_dispatcher as webhook_module
+from app import app, db, webhook_dispatcher, payout_run_service
+from auth import token_auth
+from webhook_dispatcher import WebhookDispatcher, SIGNATURE_HEADER, sign_payload, verify_signature, is_public_address
+
+# Test client
+client = TestClient(app)
+
+def creator_token(tenant_id):
+    return token_auth.issue(tenant_id, role="creator", tenant_id=tenant_id)
+
+CREATOR_HEADERS = {"Authorization": f"Bearer {creator_token('tnt_101')}"}
+
+class LocalReceiver:
+    """Local HTTP endpoint that records webhook batches and replies with scripted status codes"""
+
+    def __init__(self, responses=None):
+        self.requests = []
+        self.responses = list(responses or [])
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                receiver.requests.append({"headers": dict(self.headers), "body": body})
+                status = receiver.responses.pop(0) if receiver.responses else 200
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/hooks"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def events(self):
+        return [e for r in self.requests for e in json.loads(r["body"])["events"]]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestWebhookDispatcher:
+    """
+    Test scenarios for batched, signed payout status webhooks
+    """
+
+    def setup_method(self):
+        self.receiver = LocalReceiver()
+
+    def teardown_method(self):
+        self.receiver.close()
+        db.webhook_subscriptions.pop("tnt_101", None)
+        db.webhook_subscriptions.pop("tnt_shared", None)
+
+    def test_events_batched_and_signed(self):
+        """Events for a destination are posted in batches with a verifiable signature"""
+        dispatcher = WebhookDispatcher(batch_size=3)
+        for i in range(7):
+            dispatcher.publish(self.receiver.url, "secret", {"n": i})
+
+        deliveries = asyncio.run(dispatcher.flush())
+
+        assert [d["events"] for d in deliveries] == [3, 3, 1]
+        assert all(d["status"] == "delivered" for d in deliveries)
+        assert sorted(e["n"] for e in self.receiver.events()) == list(range(7))
+        request = self.receiver.requests[0]
+        assert verify_signature("secret", request["body"], request["headers"][SIGNATURE_HEADER])
+        assert not verify_signature("other", request["body"], request["headers"][SIGNATURE_HEADER])
+
+    def test_retry_then_success(self):
+        """5xx and 429 responses are retried with backoff"""
+        self.receiver.responses = [500, 429]
+        dispatcher = WebhookDispatcher(retry_backoff=0.001)
+        dispatcher.publish(self.receiver.url, "secret", {"n": 1})
+
+        [delivery] = asyncio.run(dispatcher.flush())
+
+        assert delivery["status"] == "delivered"
+        assert delivery["attempts"] == 3
+        assert dispatcher.counters["retried"] == 2
+        assert dispatcher.stats()["latency_ms"]["p50"] is not None
+
+    def test_client_error_not_retried(self):
+        """Other 4xx responses fail at once and are dead-lettered"""
+        self.receiver.responses = [410]
+        dispatcher = WebhookDispatcher(retry_backoff=0.001)
+        dispatcher.publish(self.receiver.url, "secret", {"n": 1})
+
+        [delivery] = asyncio.run(dispatcher.flush())
+
+        assert delivery["status"] == "failed"
+        assert delivery["attempts"] == 1
+        assert len(dispatcher.dead_letters) == 1
+
+    def test_stale_signature_rejected(self):
+        """Signatures outside the tolerance window do not verify"""
+        header = sign_payload("secret", b"{}", timestamp=1)
+        assert not verify_signature("secret", b"{}", header)
+
+    def test_private_destinations_rejected(self):
+        """Subscriptions and deliveries to non-public or plain-http endpoints are refused"""
+        for url in (self.receiver.url, "https://127.0.0.1/hooks", "https://169.254.169.254/latest", "https://10.0.0.5/hooks", "ftp://example.com/"):
+            response = client.post("/v1/creator/webhooks", headers=CREATOR_HEADERS, json={"url": url})
+            assert response.status_code == 400
+        assert not is_public_address("::ffff:192.168.1.1")
+        assert is_public_address("8.8.8.8")
+
+        dispatcher = WebhookDispatcher(allow_private=False)
+        dispatcher.publish(self.receiver.url, "secret", {"n": 1})
+        [delivery] = asyncio.run(dispatcher.flush())
+        assert delivery["status"] == "failed"
+        assert delivery["attempts"] == 0
+        assert self.receiver.requests == []
+
+    def test_rebinding_host_refused_at_connect(self, monkeypatch):
+        """A host that passed the check but resolves to a private address when connecting is refused"""
+        async def passes(url, allow_private=False):
+            return None
+        monkeypatch.setattr(webhook_module, "check_destination", passes)
+        port = self.receiver.server.server_address[1]
+        dispatcher = WebhookDispatcher(allow_private=False, max_attempts=3)
+        dispatcher.publish(f"https://localhost:{port}/hooks", "secret", {"n": 1})
+        [delivery] = asyncio.run(dispatcher.flush())
+        assert delivery["status"] == "failed"
+        assert delivery["attempts"] == 1
+        assert "private" in delivery["error"]
+        assert self.receiver.requests == []
+
+    def test_shared_receiver_url_kept_per_subscription(self, monkeypatch):
+        """Two tenants subscribed to one URL get separate batches, each signed with its own secret"""
+        monkeypatch.setattr(app_module, "WEBHOOK_ALLOW_PRIVATE_URLS", True)
+        secrets = {}
+        for tenant_id in ("tnt_101", "tnt_shared"):
+            headers = {"Authorization": f"Bearer {creator_token(tenant_id)}"}
+            secrets[tenant_id] = client.post("/v1/creator/webhooks", headers=headers, json={"url": self.receiver.url}).json()["secret"]
+
+        dispatcher = WebhookDispatcher()
+        monkeypatch.setattr(payout_run_service, "webhooks", dispatcher)
+        payout_run_service.notify("payout.completed", "shared_user", [
+            {"tenant_id": "tnt_101", "ledger_id": "led_a"}, {"tenant_id": "tnt_shared", "ledger_id": "led_b"}
+        ], {"payout_id": "pay_shared"})
+        asyncio.run(dispatcher.flush())
+
+        assert len(self.receiver.requests) == 2
+        for request in self.receiver.requests:
+            [event] = json.loads(request["body"])["events"]
+            assert verify_signature(secrets[event["tenant_id"]], request["body"], request["headers"][SIGNATURE_HEADER])
+
+    def test_payout_run_notifies_subscribers(self, monkeypatch):
+        """A payout run delivers payout.completed events to the creator's endpoint once the response is sent"""
+        monkeypatch.setattr(app_module, "WEBHOOK_ALLOW_PRIVATE_URLS", True)
+        monkeypatch.setattr(webhook_dispatcher, "allow_private", True)
+        subscription = client.post("/v1/creator/webhooks", headers=CREATOR_HEADERS, json={"url": self.receiver.url}).json()
+        assert subscription["secret"].startswith("whsec_")
+        listed = client.get("/v1/creator/webhooks", headers=CREATOR_HEADERS).json()["subscriptions"]
+        assert all("secret" not in s for s in listed)
+
+        offer = db.get_offer("1234")
+        original_cool_off = offer["cool_off_days"]
+        offer["cool_off_days"] = 0
+        try:
+            campaign_id = client.post("/v1/campaigns", json={"tenant_id": "tnt_101", "name": "Webhook Campaign", "share_pct": 40.0}).json()["campaign_id"]
+            link_id = client.post("/v1/links", json={"campaign_id": campaign_id, "offer_id": "1234"}).json()["link_id"]
+            user_id = f"webhook_user_{uuid.uuid4().hex[:6]}"
+            click = client.post("/v1/events/click", json={"link_id": link_id, "user_id": user_id}).json()
+            client.post("/v1/events/conversion", json={
+                "click_id": click["click_id"],
+                "offer_id": "1234",
+                "sale_amount": 1000.0,
+                "order_id": f"ORD-{uuid.uuid4().hex[:8]}",
+                "status": "approved"
+            })
+            client.post("/v1/rewards/payout/run")
+        finally:
+            offer["cool_off_days"] = original_cool_off
+
+        [event] = [e for e in self.receiver.events() if e["user_id"] == user_id]
+        assert event["type"] == "payout.completed"
+        assert event["tenant_id"] == "tnt_101"
+        request = self.receiver.requests[-1]
+        assert verify_signature(subscription["secret"], request["body"], request["headers"][SIGNATURE_HEADER])
+
+        # Re-sending a payout's status goes through the same pipeline
+        response = client.post(f"/v1/webhooks/payout_status?payout_id={event['payout_id']}").json()
+        assert response["status"] == "sent"
+        assert self.receiver.events()[-1]["payout_id"] == event["payout_id"]
+        assert client.post("/v1/webhooks/payout_status?payout_id=missing").status_code == 404
@@ -0,0 +1,431 @@
+import abc
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import requests
+
+from structured_logging import get_logger, log_context
+
+log = get_logger("tracing")
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+REQUEST_ID = re.compile(r"^[\w.:-]{1,128}$")
+
+
+def new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    """A timed operation inside a trace; times are Unix epoch nanoseconds"""
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = new_id(64)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.end_ns = 0
+        self.start_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+
+class Trace:
+    """
+    Spans of one request. Up to max_spans are kept individually; time per
+    span name is always totalled, so loops over thousands of lookups still
+    show up in the slow-request summary.
+    """
+
+    def __init__(self, name: str, trace_id: str, request_id: str, parent_id: Optional[str],
+                 attributes: Dict[str, Any], max_spans: int):
+        self.trace_id = trace_id
+        self.request_id = request_id
+        self.root = Span(name, parent_id, attributes)
+        self.spans: List[Span] = []
+        self.totals: Dict[str, list] = {}  # name -> [count, total_ns]
+        self.child_ns = 0  # time in the root's direct children
+        self.dropped = 0
+        self.max_spans = max_spans
+
+    def record(self, span: Span):
+        duration = span.end_ns - span.start_ns
+        total = self.totals.get(span.name)
+        if total is None:
+            self.totals[span.name] = [1, duration]
+        else:
+            total[0] += 1
+            total[1] += duration
+        if span.parent_id == self.root.span_id:
+            self.child_ns += duration
+        if len(self.spans) < self.max_spans:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+    def top_spans(self, n: int) -> List[Dict[str, Any]]:
+        """Span names by total time, longest first"""
+        ranked = sorted(self.totals.items(), key=lambda kv: kv[1][1], reverse=True)[:n]
+        return [{"name": name, "count": count, "total_ms": round(ns / 1e6, 3)} for name, (count, ns) in ranked]
+
+
+# (trace, active span) for the running request, if it is being traced
+_current: ContextVar[Optional[Tuple[Trace, Span]]] = ContextVar("current_span", default=None)
+
+
+class _SpanScope:
+    __slots__ = ("trace", "span", "token")
+
+    def __init__(self, trace: Trace, span: Span):
+        self.trace = trace
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self.token = _current.set((self.trace, self.span))
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.end_ns = time.time_ns()
+        if exc_type is not None:
+            self.span.error = exc_type.__name__
+        _current.reset(self.token)
+        self.trace.record(self.span)
+        return False
+
+
+class _NoopScope:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SCOPE = _NoopScope()
+
+
+class _TraceScope:
+    def __init__(self, tracer: "Tracer", trace: Trace):
+        self.tracer = tracer
+        self.trace = trace
+
+    def __enter__(self) -> Trace:
+        self.token = _current.set((self.trace, self.trace.root))
+        self.log_token = log_context.set({"request_id": self.trace.request_id, "trace_id": self.trace.trace_id})
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        root = self.trace.root
+        root.end_ns = time.time_ns()
+        if exc_type is not None:
+            root.error = exc_type.__name__
+        try:
+            self.tracer.finish(self.trace)
+        finally:
+            log_context.reset(self.log_token)
+            _current.reset(self.token)
+        return False
+
+
+def otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def value(v):
+        if isinstance(v, bool):
+            return {"boolValue": v}
+        if isinstance(v, int):
+            return {"intValue": str(v)}
+        if isinstance(v, float):
+            return {"doubleValue": v}
+        return {"stringValue": str(v)}
+    return [{"key": k, "value": value(v)} for k, v in attributes.items()]
+
+
+def otlp_payload(trace: Trace, service_name: str) -> Dict[str, Any]:
+    """A trace as an OTLP/JSON ExportTraceServiceRequest"""
+    def span_json(span: Span, kind: int) -> Dict[str, Any]:
+        data = {
+            "traceId": trace.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": kind,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": otlp_attributes(span.attributes),
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 0}
+        }
+        if span.parent_id:
+            data["parentSpanId"] = span.parent_id
+        return data
+
+    root_attributes = {**trace.root.attributes, "request.id": trace.request_id, "trace.spans_dropped": trace.dropped}
+    root = span_json(trace.root, 2)  # SERVER
+    root["attributes"] = otlp_attributes(root_attributes)
+    return {"resourceSpans": [{
+        "resource": {"attributes": otlp_attributes({"service.name": service_name})},
+        "scopeSpans": [{
+            "scope": {"name": "hissaback.tracing"},
+            "spans": [root] + [span_json(s, 1) for s in trace.spans]  # INTERNAL
+        }]
+    }]}
+
+
+class BackgroundExporter(abc.ABC):
+    """
+    Ships finished traces from a worker thread, so building and writing
+    the payload never runs on the event loop. Traces are dropped (and
+    counted) when the queue is full.
+    """
+
+    def __init__(self, service_name: str = "hissaback", queue_size: int = 1000):
+        self.service_name = service_name
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.counters = {"exported": 0, "dropped": 0, "failed": 0}
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, trace: Trace):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+        try:
+            self.queue.put_nowait(trace)
+        except queue.Full:
+            self.counters["dropped"] += 1
+
+    def flush(self):
+        """Block until every submitted trace has been handled"""
+        if self._thread is not None:
+            self.queue.join()
+
+    def _run(self):
+        while True:
+            trace = self.queue.get()
+            try:
+                self.write(otlp_payload(trace, self.service_name))
+                self.counters["exported"] += 1
+            except Exception as e:
+                self.counters["failed"] += 1
+                log.warning("trace.export_failed", exporter=type(self).__name__, error=str(e))
+            finally:
+                self.queue.task_done()
+
+    @abc.abstractmethod
+    def write(self, payload: Dict[str, Any]):
+        """Send one OTLP/JSON request; runs on the worker thread"""
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "queued": self.queue.qsize()}
+
+
+class FileSpanExporter(BackgroundExporter):
+    """Appends one OTLP/JSON request per line to a local collector file"""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._file = None
+
+    def write(self, payload: Dict[str, Any]):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(payload, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+
+class OTLPHTTPExporter(BackgroundExporter):
+    """POSTs OTLP/JSON to a collector's /v1/traces endpoint"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def write(self, payload: Dict[str, Any]):
+        requests.post(self.endpoint, json=payload, timeout=self.timeout).raise_for_status()
+
+
+class Tracer:
+    """
+    Per-request tracing. A trace is opened per request (TracingMiddleware)
+    and spans nest under whatever span is active in the current context;
+    outside a traced request span() and traced functions do nothing beyond
+    one context variable read.
+
+    Requests slower than slow_ms are logged with their top span names by
+    total time and kept in `slow`. Finished traces go to the exporter:
+    slow ones always, others at sample_rate.
+    """
+
+    def __init__(
+        self,
+        exporter: Optional[BackgroundExporter] = None,
+        slow_ms: float = 500.0,
+        top_n: int = 5,
+        max_spans: int = 1000,
+        sample_rate: float = 1.0,
+        history_limit: int = 100
+    ):
+        self.exporter = exporter
+        self.slow_ms = slow_ms
+        self.top_n = top_n
+        self.max_spans = max_spans
+        self.sample_rate = sample_rate
+        self.slow = deque(maxlen=history_limit)
+        self.counters = {"traces": 0, "spans": 0, "spans_dropped": 0, "slow": 0}
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        exporter = None
+        if os.environ.get("TRACE_OTLP_ENDPOINT"):
+            exporter = OTLPHTTPExporter(os.environ["TRACE_OTLP_ENDPOINT"])
+        elif os.environ.get("TRACE_FILE"):
+            exporter = FileSpanExporter(os.environ["TRACE_FILE"])
+        return cls(
+            exporter=exporter,
+            slow_ms=float(os.environ.get("TRACE_SLOW_MS", "500")),
+            top_n=int(os.environ.get("TRACE_SLOW_TOP", "5")),
+            max_spans=int(os.environ.get("TRACE_MAX_SPANS", "1000")),
+            sample_rate=float(os.environ.get("TRACE_SAMPLE_RATE", "1.0"))
+        )
+
+    def trace(self, name: str, request_id: Optional[str] = None, traceparent: Optional[str] = None,
+              **attributes) -> _TraceScope:
+        """Open a request's trace; continues a W3C traceparent when one is given"""
+        match = TRACEPARENT.match(traceparent or "")
+        trace_id, parent_id = (match.group(1), match.group(2)) if match else (new_id(128), None)
+        if not request_id or not REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        return _TraceScope(self, Trace(name, trace_id, request_id, parent_id, attributes, self.max_spans))
+
+    def span(self, name: str, **attributes):
+        """Time a block as a child of the active span"""
+        current = _current.get()
+        if current is None:
+            return NOOP_SCOPE
+        trace, parent = current
+        return _SpanScope(trace, Span(name, parent.span_id, attributes))
+
+    def traced(self, name: Optional[str] = None):
+        """Decorator timing each call of a function or coroutine function"""
+        def decorate(fn):
+            span_name = name or fn.__qualname__
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    if _current.get() is None:
+                        return await fn(*args, **kwargs)
+                    with self.span(span_name):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if _current.get() is None:
+                    return fn(*args, **kwargs)
+                with self.span(span_name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def trace_methods(self, prefix: str, methods: Optional[Sequence[str]] = None):
+        """Class decorator tracing public methods (or just `methods`) as prefix.method"""
+        def decorate(cls):
+            for attr, fn in list(vars(cls).items()):
+                if methods is not None and attr not in methods:
+                    continue
+                if attr.startswith("_") or not inspect.isfunction(fn) or inspect.isgeneratorfunction(fn):
+                    continue
+                setattr(cls, attr, self.traced(f"{prefix}.{attr}")(fn))
+            return cls
+        return decorate
+
+    def finish(self, trace: Trace):
+        root = trace.root
+        self.counters["traces"] += 1
+        self.counters["spans"] += len(trace.spans)
+        self.counters["spans_dropped"] += trace.dropped
+        slow = root.duration_ms >= self.slow_ms
+        if slow:
+            entry = {
+                "request_id": trace.request_id,
+                "trace_id": trace.trace_id,
+                "name": root.name,
+                "status_code": root.attributes.get("http.status_code"),
+                "duration_ms": round(root.duration_ms, 3),
+                "untraced_ms": round((root.end_ns - root.start_ns - trace.child_ns) / 1e6, 3),
+                "spans": len(trace.spans) + trace.dropped,
+                "top_spans": trace.top_spans(self.top_n),
+                "finished_at": datetime.utcnow().isoformat()
+            }
+            self.slow.append(entry)
+            self.counters["slow"] += 1
+            log.warning("request.slow", **{k: v for k, v in entry.items() if k not in ("request_id", "trace_id", "finished_at")})
+        if self.exporter is not None and (slow or random.random() < self.sample_rate):
+            self.exporter.submit(trace)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "slow_ms": self.slow_ms,
+            "exporter": self.exporter.stats() if self.exporter else None
+        }
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a trace per HTTP request. The request ID comes
+    from X-Request-ID (or is generated), is echoed on the response and is
+    added to every log event of the request; a W3C traceparent header
+    continues the caller's trace.
+    """
+
+    def __init__(self, app, tracer: Tracer, exclude_prefixes=("/static", "/metrics")):
+        self.app = app
+        self.tracer = tracer
+        self.exclude_prefixes = tuple(exclude_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")
+        traceparent = headers.get(b"traceparent", b"").decode("latin-1")
+        method = scope["method"]
+        with self.tracer.trace(f"{method} {scope['path']}", request_id, traceparent,
+                               **{"http.method": method, "http.target": scope["path"]}) as trace:
+            async def send_with_request_id(message):
+                if message["type"] == "http.response.start":
+                    trace.root.attributes["http.status_code"] = message["status"]
+                    message = {**message, "headers": [*message.get("headers", []), (b"x-request-id", trace.request_id.encode())]}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_request_id)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    trace.root.name = f"{method} {route}"
+                    trace.root.attributes["http.route"] = route
+
+
+# Global instance
+tracer = Tracer.from_env()
@@ -0,0 +1,323 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import socket
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpcore
+import httpx
+
+SIGNATURE_HEADER = "X-Hissaback-Signature"
+DELIVERY_HEADER = "X-Hissaback-Delivery"
+
+
+def sign_payload(secret: str, body: bytes, timestamp: Optional[int] = None) -> str:
+    """Signature header value: t=<unix ts>,v1=<hex HMAC-SHA256 of "<t>.<body>">"""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def verify_signature(secret: str, body: bytes, header: str, tolerance: int = 300) -> bool:
+    """Check a signature header, rejecting stale timestamps (for receivers)"""
+    try:
+        parts = dict(p.split("=", 1) for p in header.split(","))
+        timestamp = int(parts["t"])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(sign_payload(secret, body, timestamp), header)
+
+
+class DestinationError(ValueError):
+    """A webhook URL the dispatcher must not call"""
+
+
+def is_public_address(address: str) -> bool:
+    """False for loopback, private, link-local, reserved and multicast addresses"""
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def check_destination(url: str, allow_private: bool = False):
+    """
+    Raise DestinationError unless url is https and its host resolves only to
+    public addresses. allow_private (local development) also permits plain
+    http and private hosts.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("https", "http") or not parts.hostname:
+        raise DestinationError("Webhook URL must be http(s) with a host")
+    if allow_private:
+        return
+    if parts.scheme != "https":
+        raise DestinationError("Webhook URL must use https")
+    await resolve_public(parts.hostname, parts.port or 443)
+
+
+async def resolve_public(host: str, port: int) -> List[str]:
+    """The host's addresses, or DestinationError if any of them is not public"""
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        raise DestinationError("Webhook host does not resolve")
+    addresses = [info[4][0] for info in infos]
+    if not addresses or not all(is_public_address(address) for address in addresses):
+        raise DestinationError("Webhook host resolves to a private or reserved address")
+    return addresses
+
+
+class PublicAddressBackend(httpcore.AsyncNetworkBackend):
+    """
+    Network backend that resolves each host itself and connects only to an
+    address it has just checked, so a host that re-resolves to a private
+    address after check_destination (DNS rebinding) is still refused. TLS
+    SNI and certificate checks keep using the hostname.
+    """
+
+    def __init__(self):
+        self.backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        addresses = await resolve_public(host, port)
+        return await self.backend.connect_tcp(addresses[0], port, timeout=timeout,
+                                              local_address=local_address, socket_options=socket_options)
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        raise DestinationError("Webhooks are not delivered over unix sockets")
+
+    async def sleep(self, seconds):
+        await self.backend.sleep(seconds)
+
+
+class PublicAddressTransport(httpx.AsyncHTTPTransport):
+    """httpx transport whose connections go through PublicAddressBackend"""
+
+    def __init__(self, limits: httpx.Limits):
+        super().__init__(limits=limits)
+        # httpx 0.25 does not take a network backend, so rebuild its pool with ours
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=self._pool._ssl_context,
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            network_backend=PublicAddressBackend()
+        )
+
+
+class WebhookDispatcher:
+    """
+    Batched, signed outbound webhooks.
+
+    Events are buffered per destination and posted as one batch once
+    batch_size events are waiting or flush_interval has passed. Deliveries
+    share a pooled HTTP client, are capped at max_concurrency in flight, and
+    are retried with exponential backoff on network errors, 5xx and 429
+    (honouring Retry-After); other 4xx fail at once. Every attempt's outcome
+    and latency is recorded. Unless allow_private is set, each destination
+    is re-resolved before delivery and private addresses fail at once, and
+    connections are only opened to addresses checked at connect time.
+
+    Buffers are per subscription (or per URL and secret when no subscription
+    is given), so subscribers sharing a receiver URL never share a batch or
+    a signature.
+
+    When the flusher is not running, call flush() to deliver what is buffered.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 50,
+        flush_interval: float = 0.5,
+        max_concurrency: int = 8,
+        max_attempts: int = 5,
+        retry_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        timeout: float = 5.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        history_limit: int = 1000,
+        allow_private: bool = True
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.transport = transport
+        self.allow_private = allow_private
+        self.buffers: Dict[Any, Dict[str, Any]] = {}  # subscription -> {"url", "secret", "events"}
+        self.deliveries = deque(maxlen=history_limit)
+        self.dead_letters = deque(maxlen=history_limit)
+        self.counters = {"published": 0, "batches": 0, "delivered": 0, "retried": 0, "failed": 0}
+        self._loop = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._sending = set()
+
+    @property
+    def running(self) -> bool:
+        return self._flusher is not None
+
+    @property
+    def pending(self) -> int:
+        return sum(len(b["events"]) for b in self.buffers.values())
+
+    # Lifecycle
+
+    async def start(self):
+        if not self.running:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        """Stop the flusher, deliver what is buffered and close the client"""
+        if self._flusher:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def _resources(self):
+        # The client and semaphore bind to the loop they are used on; rebuild them per loop
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            old = self._client
+            self._loop = loop
+            limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+            transport = self.transport
+            if transport is None and not self.allow_private:
+                transport = PublicAddressTransport(limits)
+            self._client = httpx.AsyncClient(timeout=self.timeout, transport=transport, limits=limits)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            if old is not None:
+                try:
+                    await old.aclose()
+                except Exception:
+                    pass  # Its loop is gone; the pooled connections die with it
+        return self._client, self._semaphore
+
+    # Publishing
+
+    def publish(self, url: str, secret: str, event: Dict[str, Any], subscription_id: Optional[str] = None):
+        """Buffer an event for a subscription; a full batch is sent right away when running"""
+        key = subscription_id or (url, secret)
+        buffer = self.buffers.setdefault(key, {"url": url, "secret": secret, "subscription_id": subscription_id, "events": []})
+        buffer["events"].append(event)
+        self.counters["published"] += 1
+        if self.running and len(buffer["events"]) >= self.batch_size:
+            task = asyncio.get_running_loop().create_task(self._send_batches(key))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def flush(self) -> List[Dict[str, Any]]:
+        """Deliver every buffered batch now and return their delivery records"""
+        results = await asyncio.gather(*(self._send_batches(key) for key in list(self.buffers)))
+        return [record for batch in results for record in batch]
+
+    async def _send_batches(self, key) -> List[Dict[str, Any]]:
+        buffer = self.buffers.pop(key, None)
+        if not buffer or not buffer["events"]:
+            return []
+        events = buffer["events"]
+        batches = [events[i:i + self.batch_size] for i in range(0, len(events), self.batch_size)]
+        return list(await asyncio.gather(*(self._deliver(buffer, batch) for batch in batches)))
+
+    async def _deliver(self, buffer: Dict[str, Any], events: List[Dict[str, Any]]) -> Dict[str, Any]:
+        client, semaphore = await self._resources()
+        url, secret = buffer["url"], buffer["secret"]
+        delivery_id = f"whd_{uuid.uuid4().hex[:12]}"
+        body = json.dumps({"delivery_id": delivery_id, "events": events}, separators=(",", ":")).encode()
+        self.counters["batches"] += 1
+        started = time.perf_counter()
+        record = {"delivery_id": delivery_id, "url": url, "subscription_id": buffer["subscription_id"],
+                  "events": len(events), "attempts": 0}
+
+        try:
+            await check_destination(url, self.allow_private)
+        except DestinationError as e:
+            record.update(status="failed", status_code=None, error=str(e))
+            return self._finish(record, body, started)
+
+        while True:
+            record["attempts"] += 1
+            retry_after = None
+            attempt_started = time.perf_counter()
+            try:
+                async with semaphore:
+                    response = await client.post(url, content=body, headers={
+                        "Content-Type": "application/json",
+                        DELIVERY_HEADER: delivery_id,
+                        SIGNATURE_HEADER: sign_payload(secret, body)
+                    })
+                record["status_code"] = response.status_code
+                record["error"] = None
+                if response.status_code < 300:
+                    record["status"] = "delivered"
+                    break
+                retryable = response.status_code >= 500 or response.status_code == 429
+                if response.status_code == 429:
+                    try:
+                        retry_after = float(response.headers.get("Retry-After", ""))
+                    except ValueError:
+                        retry_after = None
+            except DestinationError as e:
+                record.update(status_code=None, error=str(e))
+                retryable = False
+            except httpx.HTTPError as e:
+                record["status_code"] = None
+                record["error"] = str(e) or type(e).__name__
+                retryable = True
+            finally:
+                record["last_attempt_ms"] = round((time.perf_counter() - attempt_started) * 1000, 2)
+
+            if not retryable or record["attempts"] >= self.max_attempts:
+                record["status"] = "failed"
+                break
+            self.counters["retried"] += 1
+            delay = min(self.retry_backoff * (2 ** (record["attempts"] - 1)), self.max_backoff)
+            await asyncio.sleep(max(delay, retry_after or 0))
+
+        return self._finish(record, body, started)
+
+    def _finish(self, record: Dict[str, Any], body: bytes, started: float) -> Dict[str, Any]:
+        record["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        record["finished_at"] = time.time()
+        self.deliveries.append(record)
+        if record["status"] == "delivered":
+            self.counters["delivered"] += 1
+        else:
+            self.counters["failed"] += 1
+            self.dead_letters.append({**record, "payload": body.decode()})
+        return record
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(d["latency_ms"] for d in self.deliveries if d["status"] == "delivered")
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] if latencies else None
+
+        return {
+            **self.counters,
+            "running": self.running,
+            "pending_events": self.pending,
+            "dead_letters": len(self.dead_letters),
+            "latency_ms": {"p50": pct(50), "p95": pct(95), "p99": pct(99)}
+        }